@@ -0,0 +1,112 @@
+# admission.py
+"""
+Controle de admissão para chamadas a serviços externos (Jira).
+
+Cada chamada entra por `async with controller.slot("endpoint")`: ela aguarda em fila
+até haver vaga no limite do endpoint e no limite global, compartilhado por todos os
+endpoints. Assim um /approve grande não dispara requisições ilimitadas em paralelo
+no mesmo cliente e o total fica abaixo do rate limit do Jira.
+
+Métricas por endpoint: em execução, na fila, pico da fila, admitidos e tempo de
+espera (média, p50, p99 e máximo sobre as últimas amostras).
+"""
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+import numpy as np
+
+# Amostras de tempo de espera guardadas por endpoint para os percentis
+WAIT_SAMPLES = 1000
+
+
+def parse_limits(spec: str) -> Dict[str, int]:
+    """Converte "approve=4,sprint_issues=4" em {"approve": 4, "sprint_issues": 4}."""
+    limites = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            nome, valor = item.split("=", 1)
+            limites[nome.strip()] = int(valor)
+    return limites
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.admitted = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+
+    def as_dict(self) -> dict:
+        waits = list(self.waits)
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "wait_avg_ms": round(1000 * self.wait_total / self.admitted, 2) if self.admitted else 0.0,
+            "wait_p50_ms": round(1000 * float(np.percentile(waits, 50)), 2) if waits else 0.0,
+            "wait_p99_ms": round(1000 * float(np.percentile(waits, 99)), 2) if waits else 0.0,
+            "wait_max_ms": round(1000 * self.wait_max, 2),
+        }
+
+
+class AdmissionController:
+    def __init__(self, global_limit: int, endpoint_limits: Optional[Dict[str, int]] = None, default_limit: Optional[int] = None):
+        self.global_limit = global_limit
+        self.endpoint_limits = dict(endpoint_limits or {})
+        self.default_limit = default_limit or global_limit
+        self._global = asyncio.Semaphore(global_limit)
+        self._endpoints: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, _EndpointStats] = {}
+
+    def _endpoint(self, nome: str):
+        if nome not in self._endpoints:
+            self._endpoints[nome] = asyncio.Semaphore(self.endpoint_limits.get(nome, self.default_limit))
+            self._stats[nome] = _EndpointStats()
+        return self._endpoints[nome], self._stats[nome]
+
+    @asynccontextmanager
+    async def slot(self, endpoint: str):
+        sem, stats = self._endpoint(endpoint)
+        inicio = time.perf_counter()
+        stats.queued += 1
+        stats.max_queued = max(stats.max_queued, stats.queued)
+        try:
+            # Ordem fixa (endpoint -> global) evita deadlock entre endpoints
+            await sem.acquire()
+            try:
+                await self._global.acquire()
+            except BaseException:
+                sem.release()
+                raise
+        finally:
+            stats.queued -= 1
+
+        espera = time.perf_counter() - inicio
+        stats.admitted += 1
+        stats.wait_total += espera
+        stats.wait_max = max(stats.wait_max, espera)
+        stats.waits.append(espera)
+        stats.in_flight += 1
+        try:
+            yield
+        finally:
+            stats.in_flight -= 1
+            self._global.release()
+            sem.release()
+
+    def stats(self) -> dict:
+        return {
+            "global_limit": self.global_limit,
+            "global_in_flight": sum(s.in_flight for s in self._stats.values()),
+            "endpoints": {
+                nome: {"limit": self.endpoint_limits.get(nome, self.default_limit), **stats.as_dict()}
+                for nome, stats in self._stats.items()
+            },
+        }
@@ -1,93 +1,273 @@
 import os
+import sys
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
 from dotenv import load_dotenv
 from langchain_community.document_loaders import (
-    PyPDFDirectoryLoader,  # Carregador de PDF
-    DirectoryLoader,       # Carregador de diretório genérico
+    PyPDFLoader,           # Carregador de PDF
     TextLoader             # Carregador de .txt
 )
 from langchain_community.document_loaders.markdown import UnstructuredMarkdownLoader # Carregador de .md
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 
+# Permite importar os módulos da raiz do back-end (ex.: rag_cache) ao rodar `python app/ingest.py`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from rag_cache import invalidate_index
+from embedding_cache import build_embeddings
+from lexical_index import LexicalIndex, index_path
+
 print("Carregando configurações...")
 load_dotenv()
 
 PATH_DOCUMENTOS = "documentos"
 PATH_VECTOR_DB = "chroma_db"
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+
+# Manifesto com (mtime, size, sha256, ids dos chunks) de cada arquivo já ingerido
+PATH_MANIFEST = os.path.join(PATH_VECTOR_DB, "ingest_manifest.json")
+
+# Pipeline: processos que carregam/dividem, arquivos em voo e chunks por lote de embeddings
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", str(2 * INGEST_WORKERS)))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+
+LOADERS = {
+    ".pdf": lambda p: PyPDFLoader(p),
+    ".md": lambda p: UnstructuredMarkdownLoader(p),
+    ".txt": lambda p: TextLoader(p, encoding="utf-8"),
+}
+
+
+def listar_arquivos(path):
+    """Lista os documentos suportados (.pdf, .md, .txt) da pasta, em ordem estável."""
+    return sorted(
+        p for p in Path(path).rglob("*")
+        if p.is_file() and p.suffix.lower() in LOADERS
+    )
+
+
+def hash_arquivo(path) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def carregar_manifesto() -> dict | None:
+    if not os.path.exists(PATH_MANIFEST):
+        return None
+    with open(PATH_MANIFEST, encoding="utf-8") as f:
+        return json.load(f)
 
-def carregar_documentos(path):
+
+def salvar_manifesto(manifesto: dict):
+    os.makedirs(PATH_VECTOR_DB, exist_ok=True)
+    tmp = PATH_MANIFEST + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, PATH_MANIFEST)
+
+
+def descartar_indice_lexico():
     """
-    Carrega todos os documentos (.pdf, .md, .txt) da pasta de documentos.
+    Remove o índice BM25 em disco antes de mexer no VectorDB. Se a ingestão for
+    interrompida, a próxima execução o reconstrói a partir dos chunks já gravados.
     """
-    print("Carregando documentos de diferentes tipos...")
-    
-    # 1. Carregar PDFs
-    loader_pdf = PyPDFDirectoryLoader(path, glob="**/*.pdf")
-    docs_pdf = loader_pdf.load()
-    print(f"Encontrados {len(docs_pdf)} documentos PDF.")
-
-    # 2. Carregar Markdowns (.md)
-    loader_md = DirectoryLoader(
-        path,
-        glob="**/*.md",
-        loader_cls=UnstructuredMarkdownLoader,
-        show_progress=True
-    )
-    docs_md = loader_md.load()
-    print(f"Encontrados {len(docs_md)} documentos Markdown.")
-
-    # 3. Carregar Textos (.txt)
-    loader_txt = DirectoryLoader(
-        path,
-        glob="**/*.txt",
-        loader_cls=TextLoader,
-        loader_kwargs={"encoding": "utf-8"},
-        show_progress=True
-    )
-    docs_txt = loader_txt.load()
-    print(f"Encontrados {len(docs_txt)} documentos .txt.")
+    if os.path.exists(index_path(PATH_VECTOR_DB)):
+        os.remove(index_path(PATH_VECTOR_DB))
+
+
+def carregar_arquivo(path):
+    """Carrega um único documento com o loader adequado à extensão."""
+    return LOADERS[Path(path).suffix.lower()](str(path)).load()
+
+
+def ids_dos_chunks(rel_path: str, chunks) -> list[str]:
+    """IDs determinísticos: o mesmo arquivo com o mesmo conteúdo gera sempre os mesmos IDs."""
+    return [
+        hashlib.sha256(f"{rel_path}\0{i}\0{chunk.page_content}".encode("utf-8")).hexdigest()
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def processar_arquivo(path: str, rel_path: str, sha_anterior: str | None):
+    """
+    Executado nos processos do pool: calcula o hash e, se o conteúdo mudou, carrega e
+    divide o arquivo. Retorna (rel_path, sha256, chunks, ids); chunks é None quando o
+    conteúdo é idêntico ao do manifesto.
+    """
+    sha = hash_arquivo(path)
+    if sha == sha_anterior:
+        return rel_path, sha, None, None
+    chunks = _get_splitter().split_documents(carregar_arquivo(path))
+    return rel_path, sha, chunks, ids_dos_chunks(rel_path, chunks)
+
 
-    # Combinar todas as listas de documentos
-    return docs_pdf + docs_md + docs_txt
+_splitter = None
 
-def main():
+def _get_splitter():
+    global _splitter
+    if _splitter is None:
+        _splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1000,
+            chunk_overlap=200
+        )
+    return _splitter
+
+
+def produzir_chunks(candidatos, manifesto):
+    """
+    Distribui os arquivos candidatos entre INGEST_WORKERS processos, mantendo no máximo
+    INGEST_MAX_PENDING arquivos em voo (fila limitada), e devolve os resultados conforme
+    ficam prontos.
+    """
+    with ProcessPoolExecutor(max_workers=INGEST_WORKERS) as pool:
+        pendentes = set()
+        fila = iter(candidatos)
+        while True:
+            for arquivo, rel_path in fila:
+                anterior = manifesto.get(rel_path)
+                pendentes.add(pool.submit(
+                    processar_arquivo, str(arquivo), rel_path, anterior["sha256"] if anterior else None
+                ))
+                if len(pendentes) >= INGEST_MAX_PENDING:
+                    break
+            if not pendentes:
+                return
+            prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                yield futuro.result()
+
+
+def main(full: bool = False):
     print("Iniciando processo de ingestão...")
 
-    # --- 1. Carregar Documentos (Load) ---
-    documentos = carregar_documentos(PATH_DOCUMENTOS)
-    
-    if not documentos:
+    arquivos = listar_arquivos(PATH_DOCUMENTOS)
+    if not arquivos:
         print("Nenhum documento encontrado. Verifique a pasta 'documentos'.")
         return
 
-    print(f"Total de {len(documentos)} documentos carregados de todas as fontes.")
-
-    # --- 2. Dividir Documentos (Split) ---
-    print("Dividindo documentos em 'chunks'...")
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200
-    )
-    chunks = text_splitter.split_documents(documentos)
-    print(f"Documentos divididos em {len(chunks)} chunks.")
-
-    # --- 3. Criar Embeddings (Embed) ---
     print("Configurando modelo de embeddings...")
-    embeddings_model = HuggingFaceEmbeddings(
-        model_name="all-MiniLM-L6-v2",
-        model_kwargs={'device': 'cpu'}
+    # Chunks já vistos (mesmo texto + modelo) saem do cache persistente sem rodar o modelo
+    # EMBEDDINGS_BACKEND/EMBEDDINGS_ONNX_QUANTIZATION valem aqui também: os vetores precisam ser compatíveis com as consultas
+    embeddings_model = build_embeddings(EMBEDDING_MODEL_NAME, device="cpu")
+    vector_db = Chroma(
+        persist_directory=PATH_VECTOR_DB,
+        embedding_function=embeddings_model
     )
 
-    # --- 4. Armazenar Vetores (Store) ---
-    print(f"Salvando embeddings no VectorDB em: {PATH_VECTOR_DB}")
-    vector_db = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings_model,
-        persist_directory=PATH_VECTOR_DB
-    )
+    manifesto = carregar_manifesto()
+    if full or manifesto is None:
+        # Sem manifesto não há como saber quais vetores existentes são duplicados: reconstrói
+        print("Reconstrução completa: limpando a coleção do VectorDB.")
+        vector_db.reset_collection()
+        manifesto = {}
+        indice = LexicalIndex()
+        # O manifesto e o índice BM25 antigos descrevem a coleção apagada: se a execução
+        # parar no meio, a próxima não pode tomar os arquivos como já ingeridos
+        salvar_manifesto(manifesto)
+        descartar_indice_lexico()
+        invalidate_index(PATH_VECTOR_DB)
+    elif os.path.exists(index_path(PATH_VECTOR_DB)):
+        indice = LexicalIndex.load(index_path(PATH_VECTOR_DB))
+    else:
+        # VectorDB anterior ao índice BM25: monta o índice a partir dos chunks já gravados
+        print("Construindo índice BM25 a partir do VectorDB existente...")
+        existentes = vector_db.get(include=["documents", "metadatas"])
+        indice = LexicalIndex()
+        indice.add(existentes["ids"], existentes["documents"], existentes["metadatas"])
+
+    # --- 1. Detectar candidatos (mtime/size; o hash é calculado nos workers) ---
+    vistos = set()
+    candidatos = []
+    stats = {}
+    for arquivo in arquivos:
+        rel_path = arquivo.relative_to(PATH_DOCUMENTOS).as_posix()
+        vistos.add(rel_path)
+        stat = arquivo.stat()
+        stats[rel_path] = stat
+        anterior = manifesto.get(rel_path)
+        if anterior and anterior["mtime"] == stat.st_mtime and anterior["size"] == stat.st_size:
+            continue
+        candidatos.append((arquivo, rel_path))
+
+    if candidatos or any(p not in vistos for p in manifesto):
+        descartar_indice_lexico()
+
+    atualizados = 0
+    # Chunks aguardando o próximo lote de embeddings e arquivos que dependem desse lote
+    lote_docs, lote_ids, arquivos_no_lote = [], [], []
+
+    def finalizar_lote():
+        nonlocal atualizados
+        # --- 3. Embed + upsert do lote e remoção dos chunks que deixaram de existir ---
+        if lote_docs:
+            vector_db.add_documents(documents=lote_docs, ids=lote_ids)
+            indice.add(lote_ids, [d.page_content for d in lote_docs], [d.metadata for d in lote_docs])
+        for rel_path, sha, ids in arquivos_no_lote:
+            anterior = manifesto.get(rel_path)
+            obsoletos = set(anterior["chunk_ids"]) - set(ids) if anterior else set()
+            if obsoletos:
+                vector_db.delete(ids=list(obsoletos))
+                indice.remove(list(obsoletos))
+            manifesto[rel_path] = {
+                "mtime": stats[rel_path].st_mtime,
+                "size": stats[rel_path].st_size,
+                "sha256": sha,
+                "chunk_ids": ids,
+            }
+            atualizados += 1
+        lote_docs.clear()
+        lote_ids.clear()
+        arquivos_no_lote.clear()
+        # Execução interrompida retoma a partir daqui (o VectorDB já tem os chunks do lote)
+        salvar_manifesto(manifesto)
+
+    # --- 2. Carregar e dividir em paralelo (Load + Split) ---
+    for rel_path, sha, chunks, ids in produzir_chunks(candidatos, manifesto):
+        if chunks is None:
+            # Só o mtime mudou: conteúdo idêntico, nada a reprocessar
+            manifesto[rel_path].update(mtime=stats[rel_path].st_mtime, size=stats[rel_path].st_size)
+            continue
+        print(f"Processado {rel_path}: {len(chunks)} chunks.")
+        for i in range(0, len(chunks), INGEST_BATCH_SIZE):
+            lote_docs.extend(chunks[i:i + INGEST_BATCH_SIZE])
+            lote_ids.extend(ids[i:i + INGEST_BATCH_SIZE])
+            if len(lote_docs) >= INGEST_BATCH_SIZE:
+                finalizar_lote()
+        arquivos_no_lote.append((rel_path, sha, ids))
+    finalizar_lote()
+
+    # --- 4. Remover chunks de arquivos apagados ---
+    removidos = [p for p in manifesto if p not in vistos]
+    for rel_path in removidos:
+        print(f"Removendo chunks de {rel_path} (arquivo apagado)...")
+        ids = manifesto.pop(rel_path)["chunk_ids"]
+        if ids:
+            vector_db.delete(ids=ids)
+            indice.remove(ids)
+
+    salvar_manifesto(manifesto)
+    indice.save(index_path(PATH_VECTOR_DB))
+    print(f"Índice BM25 salvo com {len(indice.docs)} chunks.")
+    inalterados = len(arquivos) - atualizados
+    print(f"{atualizados} arquivos atualizados, {inalterados} inalterados, {len(removidos)} removidos.")
+
+    if hasattr(embeddings_model, "hits"):
+        print(f"Cache de embeddings: {embeddings_model.hits} reaproveitados, {embeddings_model.misses} calculados.")
+
+    # --- 5. Invalidar o cache de respostas RAG (os chunks mudaram) ---
+    if atualizados or removidos:
+        invalidate_index(PATH_VECTOR_DB)
 
     print("--- Ingestão Concluída com Sucesso! ---")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Ingestão incremental dos documentos no ChromaDB.")
+    parser.add_argument("--full", action="store_true", help="Limpa a coleção e reprocessa todos os arquivos.")
+    main(full=parser.parse_args().full)
@@ -0,0 +1,136 @@
+"""
+Migrações do banco da API (usuários, chats, mensagens e outbox do Jira).
+
+Uso (a partir de BACK-END/; o banco é o DATABASE_URL do .env, ou --url):
+    python app/migrate.py                      # cria tabelas e aplica migrações pendentes
+    python app/migrate.py status               # versões aplicadas e pendentes
+    python app/migrate.py check                # ida e volta (sync e async) numa transação descartada
+    python app/migrate.py copy --from sqlite:///./app.db --url postgresql://...  # copia os dados
+
+Em produção com vários workers, rode o upgrade uma vez no deploy e suba a API com
+DB_AUTO_MIGRATE=false. O `copy` exige as tabelas de destino vazias.
+"""
+import sys
+import uuid
+import asyncio
+import argparse
+from pathlib import Path
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+# Permite importar os módulos da raiz do back-end ao rodar `python app/migrate.py`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from database import (
+    DATABASE_URL, MIGRATIONS, Base, Chat, Message, SchemaVersion, User,
+    applied_migrations, create_async_db_engine, create_db_engine, migrate,
+)
+
+LOTE = 5000
+
+
+def mascarar(url: str) -> str:
+    """Esconde a senha da URL nas mensagens."""
+    if "@" not in url or "://" not in url:
+        return url
+    esquema, resto = url.split("://", 1)
+    credenciais, host = resto.rsplit("@", 1)
+    return f"{esquema}://{credenciais.split(':')[0]}:***@{host}"
+
+
+def cmd_upgrade(url: str):
+    aplicadas = migrate(create_db_engine(url))
+    if aplicadas:
+        print(f"Migrações aplicadas: {', '.join(map(str, aplicadas))}")
+    else:
+        print("Banco já está atualizado.")
+
+
+def cmd_status(url: str):
+    feitas = applied_migrations(create_db_engine(url))
+    for versao, descricao, _ in MIGRATIONS:
+        print(f"[{'x' if versao in feitas else ' '}] {versao:>3}  {descricao}")
+
+
+async def _verificar_async(url: str):
+    engine = create_async_db_engine(url)
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            user = User(name="migrate-check", email=f"check-{uuid.uuid4().hex}@local", password_hash="-")
+            db.add(user)
+            await db.flush()
+            chat = Chat(user_id=user.id, title="check")
+            db.add(chat)
+            await db.flush()
+            db.add_all([Message(chat_id=chat.id, sender="user", content=f"m{i}") for i in range(3)])
+            await db.flush()
+            total = await db.scalar(select(func.count()).select_from(Message).where(Message.chat_id == chat.id))
+            await db.rollback()
+        if total != 3:
+            raise RuntimeError(f"esperava 3 mensagens, encontrou {total}")
+    finally:
+        await engine.dispose()
+
+
+def cmd_check(url: str):
+    engine = create_db_engine(url)
+    migrate(engine)
+    with engine.connect() as conn:
+        trans = conn.begin()
+        resultado = conn.execute(User.__table__.insert().values(
+            name="migrate-check", email=f"check-{uuid.uuid4().hex}@local", password_hash="-"
+        ))
+        assert resultado.inserted_primary_key[0] is not None
+        trans.rollback()
+    print("Sync  OK:", engine.dialect.name, engine.pool.status())
+    asyncio.run(_verificar_async(url))
+    print("Async OK")
+
+
+def cmd_copy(origem_url: str, destino_url: str):
+    origem, destino = create_db_engine(origem_url), create_db_engine(destino_url)
+    migrate(origem)
+    migrate(destino)
+    tabelas = [t for t in Base.metadata.sorted_tables if t.name != SchemaVersion.__tablename__]
+
+    with origem.connect() as src, destino.begin() as dst:
+        for tabela in tabelas:
+            if dst.execute(select(func.count()).select_from(tabela)).scalar():
+                raise SystemExit(f"Tabela '{tabela.name}' do destino não está vazia.")
+        for tabela in tabelas:
+            total = 0
+            resultado = src.execution_options(stream_results=True).execute(select(tabela).order_by(*tabela.primary_key))
+            for linhas in resultado.mappings().partitions(LOTE):
+                dst.execute(tabela.insert(), [dict(linha) for linha in linhas])
+                total += len(linhas)
+            print(f"{tabela.name}: {total} linhas")
+            if destino.dialect.name == "postgresql" and "id" in tabela.c:
+                # As linhas vieram com id explícito: acerta a sequência para os próximos inserts
+                dst.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{tabela.name}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {tabela.name}), 0) + 1, false)"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("comando", nargs="?", default="upgrade", choices=["upgrade", "status", "check", "copy"])
+    parser.add_argument("--url", default=DATABASE_URL, help="banco alvo (padrão: DATABASE_URL)")
+    parser.add_argument("--from", dest="origem", help="banco de origem do copy")
+    args = parser.parse_args()
+
+    print(f"Banco: {mascarar(args.url)}")
+    if args.comando == "upgrade":
+        cmd_upgrade(args.url)
+    elif args.comando == "status":
+        cmd_status(args.url)
+    elif args.comando == "check":
+        cmd_check(args.url)
+    else:
+        if not args.origem:
+            parser.error("copy exige --from")
+        cmd_copy(args.origem, args.url)
+
+
+if __name__ == "__main__":
+    main()
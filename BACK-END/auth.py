@@ -0,0 +1,209 @@
+# auth.py
+"""
+Senhas (bcrypt) e tokens de sessão.
+
+Cada hash/verificação do bcrypt custa dezenas a centenas de ms de CPU. Eles rodam
+num executor próprio e limitado, e não no threadpool usado pelo LLM e pelo Jira.
+O executor usa threads por padrão (o bcrypt libera o GIL) ou processos, com
+PASSWORD_HASH_EXECUTOR=process. Além das PASSWORD_HASH_WORKERS vagas,
+PASSWORD_HASH_MAX_QUEUE pedidos podem esperar; acima disso, `PasswordHasherBusy`
+(a API responde 429) em vez de acumular logins.
+
+Depois do login a API emite um token de sessão assinado (HMAC-SHA256) com o id do
+usuário e a expiração. Validar o token não consulta o banco.
+"""
+import os
+import hmac
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import logging
+import secrets
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import bcrypt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("assistente-rag")
+
+# Fator de custo do bcrypt (cada +1 dobra o tempo). Hashes antigos com outro custo
+# são refeitos no próximo login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Vagas do executor (0 = metade dos núcleos) e pedidos que podem esperar por elas
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "0"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+# "thread" ou "process"
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+# Segredo dos tokens de sessão: obrigatório e o mesmo em todos os workers/nós
+SESSION_SECRET = os.getenv("SESSION_SECRET")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+# ------------------ Senhas ------------------
+
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=rounds)).decode()
+
+
+def check_password(password: str, password_hash: str) -> bool:
+    return bcrypt.checkpw(password.encode(), password_hash.encode())
+
+
+def hash_rounds(password_hash: str) -> int:
+    """Custo gravado no hash ($2b$12$...)."""
+    return int(password_hash.split("$")[2])
+
+
+class PasswordHasherBusy(Exception):
+    """Fila do executor de senhas cheia: o cliente deve tentar de novo mais tarde."""
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_queue: int = PASSWORD_HASH_MAX_QUEUE,
+        kind: str = PASSWORD_HASH_EXECUTOR,
+        rounds: int = BCRYPT_ROUNDS,
+    ):
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.max_queue = max_queue
+        self.kind = kind
+        self.rounds = rounds
+        self._executor: Optional[Executor] = None
+        # Hash de referência para emails inexistentes: o login leva o mesmo tempo
+        self._hash_ficticio: Optional[str] = None
+        self.pending = 0
+        self.rejected = 0
+        self.completed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            logger.info("Executor de senhas: %d %s(s), bcrypt custo %d.", self.workers, self.kind, self.rounds)
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise PasswordHasherBusy(f"{self.pending} operações de senha pendentes")
+        self.pending += 1
+        inicio = time.perf_counter()
+        try:
+            resultado = await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        except BaseException:
+            # Falha ou cancelamento (ex.: hash inválido, executor encerrado) não conta como concluída
+            self.errors += 1
+            raise
+        else:
+            self.completed += 1
+            self.busy_seconds += time.perf_counter() - inicio
+            return resultado
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, self.rounds)
+
+    async def verify(self, password: str, password_hash: Optional[str]) -> bool:
+        """Confere a senha; sem hash (usuário inexistente) gasta o mesmo tempo e retorna False."""
+        if password_hash is None:
+            if self._hash_ficticio is None:
+                self._hash_ficticio = await self.hash(secrets.token_urlsafe(16))
+            await self._run(check_password, password, self._hash_ficticio)
+            return False
+        return await self._run(check_password, password, password_hash)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        return hash_rounds(password_hash) != self.rounds
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "rounds": self.rounds,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "errors": self.errors,
+            "avg_ms": round(self.busy_seconds / self.completed * 1000, 1) if self.completed else 0.0,
+        }
+
+
+# ------------------ Tokens de sessão ------------------
+
+# Valor de exemplo antigo do .env.example: público, não pode assinar tokens
+_SEGREDOS_INVALIDOS = {"", "GERE_UM_SEGREDO_ALEATORIO"}
+
+
+class SessionSecretMissing(EnvironmentError):
+    """SESSION_SECRET ausente ou de exemplo: a API não emite nem aceita tokens."""
+
+
+def _segredo() -> bytes:
+    if (SESSION_SECRET or "").strip() in _SEGREDOS_INVALIDOS:
+        raise SessionSecretMissing(
+            "SESSION_SECRET não configurado. Gere um com "
+            "`python -c \"import secrets; print(secrets.token_urlsafe(48))\"` e use o mesmo em todos os workers."
+        )
+    return SESSION_SECRET.encode()
+
+
+def check_session_secret():
+    """Chamado na inicialização da API: falha cedo se não houver segredo válido."""
+    _segredo()
+
+
+class InvalidSessionToken(Exception):
+    pass
+
+
+def _b64(dados: bytes) -> str:
+    return base64.urlsafe_b64encode(dados).rstrip(b"=").decode()
+
+
+def _unb64(texto: str) -> bytes:
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+def _assinar(payload: str) -> str:
+    return _b64(hmac.new(_segredo(), payload.encode(), hashlib.sha256).digest())
+
+
+def issue_session_token(user_id: int, name: str, email: str, ttl: int = SESSION_TTL_SECONDS) -> Tuple[str, int]:
+    """Retorna (token, expiração em epoch)."""
+    expira = int(time.time()) + ttl
+    payload = _b64(json.dumps(
+        {"sub": user_id, "name": name, "email": email, "exp": expira}, separators=(",", ":")
+    ).encode())
+    return f"{payload}.{_assinar(payload)}", expira
+
+
+def verify_session_token(token: str) -> dict:
+    """Retorna as claims do token ({"sub", "name", "email", "exp"}) ou levanta InvalidSessionToken."""
+    payload, _, assinatura = token.partition(".")
+    if not assinatura or not hmac.compare_digest(assinatura, _assinar(payload)):
+        raise InvalidSessionToken("assinatura inválida")
+    try:
+        claims = json.loads(_unb64(payload))
+    except ValueError:
+        raise InvalidSessionToken("token malformado")
+    if claims.get("exp", 0) < time.time():
+        raise InvalidSessionToken("token expirado")
+    return claims
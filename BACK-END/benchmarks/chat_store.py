@@ -0,0 +1,195 @@
+# benchmarks/chat_store.py
+"""
+Latência do histórico de chats (GET /chats, GET /chats/{id}/messages e
+POST /chat_message) com o banco cheio.
+
+Uso (a partir de BACK-END/):
+    python benchmarks/chat_store.py                      # 1M mensagens, com índices e WAL
+    python benchmarks/chat_store.py --sem-indices        # mesmo banco, sem os índices
+    SQLITE_JOURNAL_MODE=DELETE python benchmarks/chat_store.py --escritores 4
+
+Popula um banco SQLite separado (não mexe no app.db) com --usuarios usuários,
+--chats chats por usuário e --mensagens mensagens no total, e chama as rotas de
+chat_api.py montadas num app próprio (httpx + ASGITransport), com get_db apontando
+para esse banco; o main.py (LLM, Jira, app.db) não é importado. Cada requisição
+leva o token de sessão do usuário, como o front-end. Com --escritores N, N clientes concorrentes gravam mensagens
+enquanto as leituras são medidas.
+O banco fica em disco e é reaproveitado nas execuções seguintes com os mesmos
+--usuarios/--chats/--mensagens; com outros valores, é esvaziado e populado de novo.
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# As rotas de chat exigem token de sessão: sem SESSION_SECRET no .env, usa um só desta execução
+os.environ.setdefault("SESSION_SECRET", os.urandom(32).hex())
+from auth import issue_session_token
+from database import Chat, Message, User, create_async_db_engine, create_db_engine, migrate
+import chat_api
+
+LOTE = 50_000
+
+
+def popular(engine, usuarios: int, chats_por_usuario: int, mensagens: int):
+    parametros = f"usuarios={usuarios} chats={chats_por_usuario} mensagens={mensagens}"
+    with engine.begin() as conn:
+        # Parâmetros do seed atual, para não medir um banco populado com outros valores
+        conn.execute(text("CREATE TABLE IF NOT EXISTS bench_seed (parametros TEXT NOT NULL)"))
+        anterior = conn.execute(text("SELECT parametros FROM bench_seed")).scalar()
+        if anterior == parametros:
+            return
+        if anterior is not None or conn.execute(select(func.count()).select_from(Message)).scalar():
+            print(f"Banco populado com outros parâmetros ({anterior or 'desconhecidos'}); populando de novo")
+            for tabela in (Message.__table__, Chat.__table__, User.__table__):
+                conn.execute(tabela.delete())
+            conn.execute(text("DELETE FROM bench_seed"))
+    print(f"Populando {usuarios} usuários, {usuarios * chats_por_usuario} chats e {mensagens} mensagens...")
+    inicio = time.perf_counter()
+    base = datetime(2024, 1, 1)
+    total_chats = usuarios * chats_por_usuario
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": u, "name": f"Usuário {u}", "email": f"u{u}@exemplo.com", "password_hash": "x"}
+            for u in range(1, usuarios + 1)
+        ])
+        conn.execute(Chat.__table__.insert(), [
+            {"id": c, "user_id": (c - 1) // chats_por_usuario + 1, "title": f"Chat {c}",
+             "created_at": base + timedelta(minutes=c)}
+            for c in range(1, total_chats + 1)
+        ])
+        # Mensagens intercaladas entre os chats, como no uso real
+        for inicio_lote in range(0, mensagens, LOTE):
+            conn.execute(Message.__table__.insert(), [
+                {"chat_id": i % total_chats + 1, "sender": "user" if i % 2 else "assistant",
+                 "content": f"Mensagem {i} " + "requisito " * 20, "created_at": base + timedelta(seconds=i)}
+                for i in range(inicio_lote, min(inicio_lote + LOTE, mensagens))
+            ])
+        conn.execute(text("INSERT INTO bench_seed (parametros) VALUES (:p)"), {"p": parametros})
+    print(f"Banco populado em {time.perf_counter() - inicio:.1f}s")
+
+
+def ajustar_indices(engine, com_indices: bool):
+    with engine.begin() as conn:
+        for tabela in (Chat.__table__, Message.__table__):
+            for index in tabela.indexes:
+                if com_indices:
+                    index.create(conn, checkfirst=True)
+                else:
+                    index.drop(conn, checkfirst=True)
+        conn.execute(text("ANALYZE"))
+
+
+def resumo(nome: str, latencias: list):
+    if not latencias:
+        return
+    print(
+        f"{nome:<26} n={len(latencias):>5}  p50={np.percentile(latencias, 50):8.2f}ms"
+        f"  p99={np.percentile(latencias, 99):8.2f}ms  máx={max(latencias):8.2f}ms"
+    )
+
+
+async def medir(args):
+    import httpx
+    from fastapi import FastAPI
+
+    engine = create_async_db_engine(f"sqlite:///{args.banco}")
+    Sessao = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def get_db():
+        async with Sessao() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(chat_api.router)
+    app.dependency_overrides[chat_api.get_db] = get_db
+    cliente = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    def sessao(user_id: int) -> dict:
+        token, _ = issue_session_token(user_id, f"Usuário {user_id}", f"u{user_id}@exemplo.com")
+        return {"Authorization": f"Bearer {token}"}
+
+    parar = asyncio.Event()
+    escritas = []
+
+    async def escritor(seed: int):
+        rnd = random.Random(seed)
+        while not parar.is_set():
+            chat_id = rnd.randint(1, args.usuarios * args.chats)
+            user_id = (chat_id - 1) // args.chats + 1
+            corpo = {"user_id": user_id, "chat_id": chat_id, "sender": "user", "content": "Nova mensagem de teste"}
+            cabecalhos = sessao(user_id)
+            inicio = time.perf_counter()
+            resposta = await cliente.post("/chat_message", json=corpo, headers=cabecalhos)
+            escritas.append((time.perf_counter() - inicio) * 1000)
+            resposta.raise_for_status()
+
+    tarefas = [asyncio.create_task(escritor(i)) for i in range(args.escritores)]
+
+    rnd = random.Random(42)
+    leituras, mensagens, gravacoes = [], [], []
+    for _ in range(args.requisicoes):
+        user_id = rnd.randint(1, args.usuarios)
+        cabecalhos = sessao(user_id)
+        inicio = time.perf_counter()
+        (await cliente.get("/chats", params={"user_id": user_id}, headers=cabecalhos)).raise_for_status()
+        leituras.append((time.perf_counter() - inicio) * 1000)
+
+        chat_id = (user_id - 1) * args.chats + rnd.randint(1, args.chats)
+        inicio = time.perf_counter()
+        (await cliente.get(
+            f"/chats/{chat_id}/messages", params={"user_id": user_id}, headers=cabecalhos
+        )).raise_for_status()
+        mensagens.append((time.perf_counter() - inicio) * 1000)
+
+        inicio = time.perf_counter()
+        (await cliente.post("/chat_message", json={
+            "user_id": user_id, "chat_id": chat_id, "sender": "assistant", "content": "Resposta do assistente"
+        }, headers=cabecalhos)).raise_for_status()
+        gravacoes.append((time.perf_counter() - inicio) * 1000)
+
+    parar.set()
+    await asyncio.gather(*tarefas)
+    await cliente.aclose()
+    await engine.dispose()
+
+    resumo("GET /chats", leituras)
+    resumo("GET /chats/{id}/messages", mensagens)
+    resumo("POST /chat_message", gravacoes)
+    resumo("POST (escritores)", escritas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--banco", default=str(Path(tempfile.gettempdir()) / "synapse_chat_bench.db"))
+    parser.add_argument("--usuarios", type=int, default=2000)
+    parser.add_argument("--chats", type=int, default=10, help="chats por usuário")
+    parser.add_argument("--mensagens", type=int, default=1_000_000)
+    parser.add_argument("--requisicoes", type=int, default=300)
+    parser.add_argument("--escritores", type=int, default=0)
+    parser.add_argument("--sem-indices", action="store_true")
+    args = parser.parse_args()
+
+    engine = create_db_engine(f"sqlite:///{args.banco}")
+    migrate(engine)
+    popular(engine, args.usuarios, args.chats, args.mensagens)
+    ajustar_indices(engine, not args.sem_indices)
+    with engine.connect() as conn:
+        modo = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+    print(f"Banco: {args.banco} | journal_mode={modo} | índices={'não' if args.sem_indices else 'sim'}")
+
+    asyncio.run(medir(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmarks/embeddings.py
+"""
+Paridade e micro-benchmark dos backends de embeddings (PyTorch x ONNX x ONNX int8).
+
+Uso (a partir de BACK-END/):
+    python benchmarks/embeddings.py
+    python benchmarks/embeddings.py --quantization avx512 --repeticoes 200
+
+Para cada backend mede a latência de embed_query (p50/p99), a vazão de
+embed_documents e a memória residente adicionada ao processo, e compara os vetores com os do
+PyTorch (similaridade de cosseno mínima/média). O cache persistente fica desligado.
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from embedding_cache import build_embeddings
+
+CONSULTAS = [
+    "Como um cliente, eu quero acompanhar meus pedidos em tempo real.",
+    "Sistema de vendas com controle de estoque e emissão de nota fiscal.",
+    "RNF: o tempo de resposta das telas deve ser inferior a 2 segundos.",
+    "Critérios de Aceite para o cadastro de usuários com validação de e-mail.",
+    "Aplicativo de agendamento de consultas para clínicas veterinárias.",
+]
+
+
+def carregar_corpus(limite: int) -> list[str]:
+    textos = []
+    for arquivo in sorted(Path("documentos").rglob("*.txt")):
+        conteudo = arquivo.read_text(encoding="utf-8")
+        textos.extend(conteudo[i:i + 1000] for i in range(0, len(conteudo), 800))
+    return (textos or CONSULTAS)[:limite]
+
+
+def memoria_mb() -> float:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    except ImportError:
+        return float("nan")
+
+
+def percentil(valores, p):
+    return float(np.percentile(valores, p))
+
+
+def medir(nome, embeddings, corpus, repeticoes, rss_antes):
+    embeddings.embed_query(CONSULTAS[0])  # aquecimento
+
+    latencias = []
+    for i in range(repeticoes):
+        inicio = time.perf_counter()
+        embeddings.embed_query(CONSULTAS[i % len(CONSULTAS)])
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    vetores = embeddings.embed_documents(corpus)
+    duracao = time.perf_counter() - inicio
+
+    print(
+        f"{nome:<18} query p50={percentil(latencias, 50):7.2f}ms p99={percentil(latencias, 99):7.2f}ms "
+        f"| docs {len(corpus) / duracao:8.1f}/s | RSS +{memoria_mb() - rss_antes:6.1f}MB"
+    )
+    return np.asarray(vetores, dtype=np.float32)
+
+
+def paridade(nome, referencia, vetores):
+    ref = referencia / np.linalg.norm(referencia, axis=1, keepdims=True)
+    vec = vetores / np.linalg.norm(vetores, axis=1, keepdims=True)
+    cos = (ref * vec).sum(axis=1)
+    print(f"{nome:<18} cosseno vs torch: mín={cos.min():.5f} média={cos.mean():.5f}")
+    return float(cos.min())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--quantization", default="avx2", help="Arquivo int8 do ONNX (avx2, avx512, avx512_vnni, arm64).")
+    parser.add_argument("--repeticoes", type=int, default=100)
+    parser.add_argument("--documentos", type=int, default=256)
+    parser.add_argument("--min-cosseno", type=float, default=0.98, help="Limite de paridade aceito.")
+    args = parser.parse_args()
+
+    corpus = carregar_corpus(args.documentos)
+    print(f"Corpus: {len(corpus)} trechos | {args.repeticoes} consultas por backend\n")
+
+    configs = [
+        ("torch", dict(backend="torch")),
+        ("onnx", dict(backend="onnx")),
+        (f"onnx-int8-{args.quantization}", dict(backend="onnx", quantization=args.quantization)),
+    ]
+    resultados = {}
+    for nome, kwargs in configs:
+        rss_antes = memoria_mb()
+        embeddings = build_embeddings(args.model, device="cpu", use_cache=False, **kwargs)
+        resultados[nome] = medir(nome, embeddings, corpus, args.repeticoes, rss_antes)
+
+    print()
+    falhas = [
+        nome for nome, vetores in resultados.items()
+        if nome != "torch" and paridade(nome, resultados["torch"], vetores) < args.min_cosseno
+    ]
+    if falhas:
+        print(f"\nParidade abaixo de {args.min_cosseno}: {', '.join(falhas)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
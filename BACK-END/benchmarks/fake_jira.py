@@ -0,0 +1,259 @@
+# benchmarks/fake_jira.py
+"""
+Servidor Jira falso (em memória) para testes locais e benchmarks.
+
+Implementa só o que a API usa: serverInfo, criação de issues (simples e bulk),
+busca por label, sprints (criar, consultar, iniciar, adicionar issues). Aplica um
+rate limit próprio (janela fixa de `burst` requisições a cada `burst / rate`
+segundos) e responde 429 com `Retry-After` e os headers `X-RateLimit-*` como o
+Jira Cloud, além de uma latência artificial.
+
+Uso (a partir de BACK-END/):
+    python benchmarks/fake_jira.py --port 8089 --rate 10 --latency-ms 80
+    JIRA_URL=http://127.0.0.1:8089 uvicorn main:app
+"""
+import re
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class FakeJiraState:
+    def __init__(self, rate: float, burst: int, latency_ms: float, project: str = "SYN", sprint_delay_ms: float = 0):
+        self.rate = rate
+        self.sprint_delay_ms = sprint_delay_ms
+        self.burst = burst
+        self.latency_ms = latency_ms
+        self.project = project
+        self.issues: dict = {}
+        self.sprints: dict = {}
+        self.requests = 0
+        self.rejected = 0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """Retorna (permitido, restante na janela, segundos até a próxima janela)."""
+        with self._lock:
+            self.requests += 1
+            if self.rate <= 0:
+                return True, self.burst, 1.0
+            janela = self.burst / self.rate
+            agora = time.monotonic()
+            if agora - self._window_start >= janela:
+                self._window_start, self._window_count = agora, 0
+            reset = janela - (agora - self._window_start)
+            if self._window_count < self.burst:
+                self._window_count += 1
+                return True, self.burst - self._window_count, reset
+            self.rejected += 1
+            return False, 0, reset
+
+    def new_issue(self, fields: dict) -> dict:
+        with self._lock:
+            numero = len(self.issues) + 1
+            key = f"{self.project}-{numero}"
+            self.issues[key] = {"id": str(10000 + numero), "key": key, "fields": fields}
+            return self.issues[key]
+
+    def visible_sprint(self, sprint_id: int):
+        sprint = self.sprints.get(sprint_id)
+        return sprint if sprint and time.monotonic() >= sprint["_visible_at"] else None
+
+    def new_sprint(self, payload: dict) -> dict:
+        with self._lock:
+            sprint_id = len(self.sprints) + 1
+            self.sprints[sprint_id] = {
+                "id": sprint_id,
+                "state": "future",
+                "name": payload.get("name"),
+                "originBoardId": payload.get("originBoardId"),
+                "startDate": payload.get("startDate"),
+                "endDate": payload.get("endDate"),
+                "issues": [],
+                # Consistência eventual: a sprint só aparece na API depois do atraso
+                "_visible_at": time.monotonic() + self.sprint_delay_ms / 1000,
+            }
+            return self.sprints[sprint_id]
+
+
+def _sprint_json(sprint: dict) -> dict:
+    return {k: v for k, v in sprint.items() if k not in ("issues", "_visible_at")}
+
+
+class FakeJiraHandler(BaseHTTPRequestHandler):
+    state: FakeJiraState = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    # ------------------ Infra ------------------
+
+    def _send(self, status: int, body=None, headers: dict = None):
+        data = b"" if body is None else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> dict:
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(tamanho) or b"{}") if tamanho else {}
+
+    def _url(self, path: str) -> str:
+        return f"http://{self.headers.get('Host')}{path}"
+
+    def _issue_json(self, issue: dict) -> dict:
+        return {"id": issue["id"], "key": issue["key"], "self": self._url(f"/rest/api/2/issue/{issue['id']}"),
+                "fields": issue["fields"]}
+
+    def _handle(self, method: str):
+        body = self._body() if method in ("POST", "PUT") else {}
+        permitido, restante, espera = self.state.admit()
+        reset = datetime.fromtimestamp(time.time() + espera, tz=timezone.utc).isoformat()
+        limites = {
+            "X-RateLimit-Limit": str(self.state.burst),
+            "X-RateLimit-Remaining": str(restante),
+            "X-RateLimit-Reset": reset,
+        }
+        if not permitido:
+            self._send(429, {"errorMessages": ["Rate limit exceeded."]},
+                       {**limites, "Retry-After": str(max(1, math.ceil(espera)))})
+            return
+        if self.state.latency_ms:
+            time.sleep(random.uniform(0.5, 1.5) * self.state.latency_ms / 1000)
+
+        url = urlparse(self.path)
+        rota = self._route(method, url.path, parse_qs(url.query), body)
+        if rota is None:
+            self._send(404, {"errorMessages": [f"Rota não implementada: {method} {url.path}"]}, limites)
+        else:
+            status, resposta = rota
+            self._send(status, resposta, limites)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    # ------------------ Rotas ------------------
+
+    def _route(self, method, path, query, body):
+        st = self.state
+        if method == "GET" and re.fullmatch(r"/rest/api/\d/serverInfo", path):
+            return 200, {"baseUrl": self._url(""), "version": "9.12.0", "versionNumbers": [9, 12, 0],
+                         "deploymentType": "Server", "serverTitle": "Fake Jira"}
+
+        if method == "GET" and re.fullmatch(r"/rest/api/\d/field", path):
+            return 200, [{"id": nome, "name": nome, "custom": False, "clauseNames": [nome]}
+                         for nome in ("summary", "description", "issuetype", "project", "labels")]
+
+        if method == "POST" and re.fullmatch(r"/rest/api/\d/issue", path):
+            issue = st.new_issue(body.get("fields", {}))
+            return 201, {"id": issue["id"], "key": issue["key"], "self": self._url(f"/rest/api/2/issue/{issue['id']}")}
+
+        if method == "POST" and re.fullmatch(r"/rest/api/\d/issue/bulk", path):
+            criadas, erros = [], []
+            for i, update in enumerate(body.get("issueUpdates", [])):
+                fields = update.get("fields", {})
+                if not fields.get("summary"):
+                    erros.append({"status": 400, "failedElementNumber": i,
+                                  "elementErrors": {"errors": {"summary": "You must specify a summary of the issue."}}})
+                    continue
+                issue = st.new_issue(fields)
+                criadas.append({"id": issue["id"], "key": issue["key"],
+                                "self": self._url(f"/rest/api/2/issue/{issue['id']}")})
+            return (201 if criadas else 400), {"issues": criadas, "errors": erros}
+
+        if m := re.fullmatch(r"/rest/api/\d/issue/([^/]+)", path):
+            issue = st.issues.get(m.group(1)) or next(
+                (i for i in st.issues.values() if i["id"] == m.group(1)), None)
+            return (200, self._issue_json(issue)) if issue else (404, {"errorMessages": ["Issue não encontrada."]})
+
+        if method == "GET" and re.fullmatch(r"/rest/api/\d/search(/jql)?", path):
+            jql = (query.get("jql") or [""])[0]
+            label = re.search(r'labels\s*=\s*"?([^"\s]+)"?', jql)
+            issues = [
+                self._issue_json(i) for i in st.issues.values()
+                if label is None or label.group(1) in (i["fields"].get("labels") or [])
+            ]
+            limite = int((query.get("maxResults") or ["50"])[0])
+            return 200, {"startAt": 0, "maxResults": limite, "total": len(issues), "issues": issues[:limite]}
+
+        if method == "POST" and path == "/rest/agile/1.0/sprint":
+            sprint = st.new_sprint(body)
+            return 201, _sprint_json(sprint)
+
+        if m := re.fullmatch(r"/rest/agile/1.0/sprint/(\d+)", path):
+            sprint = st.visible_sprint(int(m.group(1)))
+            if sprint is None:
+                return 404, {"errorMessages": ["Sprint não encontrada."]}
+            return 200, _sprint_json(sprint)
+
+        if method == "POST" and (m := re.fullmatch(r"/rest/agile/1.0/board/\d+/sprint/(\d+)/start", path)):
+            sprint = st.visible_sprint(int(m.group(1)))
+            if sprint is None:
+                return 404, {"errorMessages": ["Sprint não encontrada."]}
+            sprint["state"] = "active"
+            sprint["startDate"] = body.get("startDate") or sprint["startDate"]
+            return 200, _sprint_json(sprint)
+
+        if method == "POST" and (m := re.fullmatch(r"/rest/agile/1.0/sprint/(\d+)/issue", path)):
+            sprint = st.visible_sprint(int(m.group(1)))
+            if sprint is None:
+                return 404, {"errorMessages": ["Sprint não encontrada."]}
+            sprint["issues"].extend(body.get("issues", []))
+            return 204, None
+
+        return None
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # conexões encerradas pelo cliente (ex.: após um 429) não interessam aqui
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, rate: float = 10, burst: int = 20, latency_ms: float = 50,
+                 sprint_delay_ms: float = 0):
+    """Sobe o servidor em uma thread daemon e retorna (server, state, url)."""
+    state = FakeJiraState(rate, burst, latency_ms, sprint_delay_ms=sprint_delay_ms)
+    handler = type("Handler", (FakeJiraHandler,), {"state": state})
+    server = _Server((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--rate", type=float, default=10, help="Requisições/s aceitas (0 = sem limite).")
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--sprint-delay-ms", type=float, default=0, help="Atraso até a sprint criada ficar visível.")
+    args = parser.parse_args()
+
+    server, _, url = start_server(args.host, args.port, args.rate, args.burst, args.latency_ms, args.sprint_delay_ms)
+    print(f"Fake Jira em {url} ({args.rate} req/s, rajada {args.burst}, ~{args.latency_ms}ms)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
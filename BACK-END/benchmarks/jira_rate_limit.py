@@ -0,0 +1,75 @@
+# benchmarks/jira_rate_limit.py
+"""
+Benchmark do gateway do Jira contra o servidor falso (benchmarks/fake_jira.py).
+
+Uso (a partir de BACK-END/):
+    python benchmarks/jira_rate_limit.py
+    python benchmarks/jira_rate_limit.py --lotes 40 --concorrencia 8 --rate-servidor 5
+
+Cria `--lotes` lotes de `--issues` issues via bulk create com `--concorrencia`
+threads e mostra a vazão, quantos 429 o servidor devolveu e os histogramas de
+latência por endpoint. Roda uma vez com o limiter ajustado à taxa do servidor e
+outra com o limiter praticamente desligado, para comparar.
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from fake_jira import start_server
+from jira_gateway import JiraGateway
+
+
+def rodar(nome, url, state, rate, burst, args):
+    gateway = JiraGateway(server=url, username="bench", api_token="bench", rate=rate, burst=burst,
+                          pool_size=args.concorrencia)
+    rejeitadas_antes = state.rejected
+
+    def lote(n):
+        fields = [
+            {"project": {"key": "SYN"}, "summary": f"Issue {n}-{i}", "issuetype": {"name": "Task"}}
+            for i in range(args.issues)
+        ]
+        itens = gateway.client.create_issues(field_list=fields, prefetch=False)
+        return sum(1 for item in itens if item.get("status") == "Success")
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(args.concorrencia) as pool:
+        criadas = sum(pool.map(lote, range(args.lotes)))
+    duracao = time.perf_counter() - inicio
+
+    stats = gateway.stats()
+    print(f"\n== {nome} ==")
+    print(f"{criadas} issues em {duracao:.2f}s ({criadas / duracao:.1f} issues/s) | "
+          f"429 do servidor: {state.rejected - rejeitadas_antes} | limiter: {stats['rate_limiter']}")
+    for endpoint, hist in stats["endpoints"].items():
+        print(f"  {endpoint}: n={hist['count']} p50={hist['p50_ms']}ms p99={hist['p99_ms']}ms status={hist['status']}")
+        if args.histograma:
+            print("   ", json.dumps(hist["histogram"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lotes", type=int, default=30)
+    parser.add_argument("--issues", type=int, default=10, help="Issues por bulk create.")
+    parser.add_argument("--concorrencia", type=int, default=8)
+    parser.add_argument("--rate-servidor", type=float, default=5)
+    parser.add_argument("--burst-servidor", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--histograma", action="store_true", help="Mostra os buckets de latência.")
+    args = parser.parse_args()
+
+    server, state, url = start_server(rate=args.rate_servidor, burst=args.burst_servidor, latency_ms=args.latency_ms)
+    print(f"Fake Jira em {url}: {args.rate_servidor} req/s, rajada {args.burst_servidor}")
+    try:
+        rodar("limiter ajustado ao servidor", url, state, args.rate_servidor, args.burst_servidor, args)
+        rodar("limiter desligado (só Retry-After)", url, state, 1000, 1000, args)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
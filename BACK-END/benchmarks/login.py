@@ -0,0 +1,153 @@
+# benchmarks/login.py
+"""
+Vazão do POST /login (logins/s e logins/s por núcleo) com o bcrypt no executor dedicado.
+
+Uso (a partir de BACK-END/):
+    python benchmarks/login.py
+    python benchmarks/login.py --workers 1,2,4 --executor thread,process --rounds 10
+
+Para cada combinação de executor e número de workers, dispara --logins logins
+com --concorrencia pedidos simultâneos nas rotas de chat_api.py, montadas num app
+próprio (httpx + ASGITransport) sobre um banco SQLite separado; o main.py (LLM,
+Jira, app.db) não é importado. Ao mesmo tempo mede a latência de um /health/live
+trivial, que mostra se o event loop continua livre durante a rajada.
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# O /login emite tokens de sessão: sem SESSION_SECRET no .env, usa um só desta execução
+os.environ.setdefault("SESSION_SECRET", os.urandom(32).hex())
+import chat_api
+from auth import BCRYPT_ROUNDS, PasswordHasher, hash_password
+from database import User, create_async_db_engine, create_db_engine, migrate
+
+SENHA = "senha-de-teste"
+
+
+def popular(url: str, usuarios: int, rounds: int):
+    engine = create_db_engine(url)
+    migrate(engine)
+    with engine.begin() as conn:
+        # Insere só os usuários que faltam: uma execução com mais --usuarios completa o banco
+        existentes = set(conn.execute(select(User.email)).scalars())
+        faltando = [u for u in range(1, usuarios + 1) if f"u{u}@exemplo.com" not in existentes]
+        if not faltando:
+            return
+        # Mesmo hash para todos: o custo por login é o mesmo e o seed fica rápido
+        password_hash = hash_password(SENHA, rounds)
+        conn.execute(User.__table__.insert(), [
+            {"name": f"Usuário {u}", "email": f"u{u}@exemplo.com", "password_hash": password_hash}
+            for u in faltando
+        ])
+
+
+async def rodada(cliente, args, kind: str, workers: int) -> dict:
+    chat_api.password_hasher.shutdown()
+    chat_api.password_hasher = PasswordHasher(workers=workers, max_queue=args.concorrencia, kind=kind, rounds=args.rounds)
+    # Aquecimento (sobe os processos/threads do executor)
+    (await cliente.post("/login", json={"email": "u1@exemplo.com", "password": SENHA})).raise_for_status()
+
+    limite = asyncio.Semaphore(args.concorrencia)
+    rnd = random.Random(7)
+    latencias, pings = [], []
+    terminou = asyncio.Event()
+
+    async def logar():
+        async with limite:
+            corpo = {"email": f"u{rnd.randint(1, args.usuarios)}@exemplo.com", "password": SENHA}
+            inicio = time.perf_counter()
+            resposta = await cliente.post("/login", json=corpo)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            resposta.raise_for_status()
+
+    async def pingar():
+        while not terminou.is_set():
+            inicio = time.perf_counter()
+            await cliente.get("/health/live")
+            pings.append((time.perf_counter() - inicio) * 1000)
+            await asyncio.sleep(0.01)
+
+    pinger = asyncio.create_task(pingar())
+    inicio = time.perf_counter()
+    await asyncio.gather(*(logar() for _ in range(args.logins)))
+    duracao = time.perf_counter() - inicio
+    terminou.set()
+    await pinger
+
+    nucleos = min(workers, os.cpu_count() or 1)
+    return {
+        "executor": kind,
+        "workers": workers,
+        "logins_s": args.logins / duracao,
+        "por_nucleo": args.logins / duracao / nucleos,
+        "p50": np.percentile(latencias, 50),
+        "p99": np.percentile(latencias, 99),
+        "ping_p99": np.percentile(pings, 99) if pings else float("nan"),
+    }
+
+
+async def medir(args, url: str):
+    import httpx
+    from fastapi import FastAPI
+
+    engine = create_async_db_engine(url)
+    Sessao = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def get_db():
+        async with Sessao() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(chat_api.router)
+    app.dependency_overrides[chat_api.get_db] = get_db
+
+    @app.get("/health/live")
+    async def health_live():
+        return {"status": "ok"}
+
+    cliente = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    print(f"bcrypt custo {args.rounds} | {args.logins} logins, {args.concorrencia} simultâneos | {os.cpu_count()} núcleos")
+    print(f"{'executor':<9} {'workers':>7} {'logins/s':>9} {'/núcleo':>8} {'p50 ms':>8} {'p99 ms':>8} {'ping p99':>9}")
+    for kind in args.executor.split(","):
+        for workers in (int(w) for w in args.workers.split(",")):
+            r = await rodada(cliente, args, kind, workers)
+            print(
+                f"{r['executor']:<9} {r['workers']:>7} {r['logins_s']:>9.1f} {r['por_nucleo']:>8.1f}"
+                f" {r['p50']:>8.1f} {r['p99']:>8.1f} {r['ping_p99']:>9.1f}"
+            )
+
+    chat_api.password_hasher.shutdown()
+    await cliente.aclose()
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=BCRYPT_ROUNDS)
+    parser.add_argument("--usuarios", type=int, default=100)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concorrencia", type=int, default=32)
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}")
+    parser.add_argument("--executor", default="thread,process")
+    args = parser.parse_args()
+
+    # Um banco por custo: o login refaria os hashes se o custo mudasse
+    url = f"sqlite:///{Path(tempfile.gettempdir()) / f'synapse_login_bench_r{args.rounds}.db'}"
+    popular(url, args.usuarios, args.rounds)
+    asyncio.run(medir(args, url))
+
+
+if __name__ == "__main__":
+    main()
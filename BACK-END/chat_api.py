@@ -0,0 +1,275 @@
+# chat_api.py
+"""
+Rotas de usuários, sessão e histórico de chats (cadastro, login, /chats e mensagens).
+
+Ficam num APIRouter separado, incluído pelo main.py, porque só dependem do banco e do
+auth.py: os benchmarks montam essas mesmas rotas num app próprio, apontando `get_db`
+para outro banco, sem carregar LLM, Jira e modelos.
+"""
+import os
+import base64
+import logging
+from datetime import datetime
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import and_, or_, select, true
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from auth import InvalidSessionToken, PasswordHasher, PasswordHasherBusy, issue_session_token, verify_session_token
+from database import AsyncSessionLocal, Chat, Message, User
+
+load_dotenv()
+
+logger = logging.getLogger("assistente-rag")
+
+# Exige o token de sessão (Authorization: Bearer) nas rotas de chat. Com false (modo
+# aberto, só para desenvolvimento) o token é opcional e qualquer cliente lê e grava os
+# chats de qualquer user_id; quando enviado, ainda precisa ser válido e do mesmo user_id
+SESSION_REQUIRED = os.getenv("SESSION_REQUIRED", "true").lower() in ("1", "true", "yes")
+if not SESSION_REQUIRED:
+    logger.warning(
+        "SESSION_REQUIRED=false: rotas de chat SEM autenticação; qualquer cliente acessa os chats "
+        "de qualquer usuário pelo user_id. Não use em produção."
+    )
+# Tamanho padrão das páginas do histórico (GET /chats e /chats/{id}/messages)
+CHATS_PAGE_SIZE = int(os.getenv("CHATS_PAGE_SIZE", "20"))
+MESSAGES_PAGE_SIZE = int(os.getenv("MESSAGES_PAGE_SIZE", "50"))
+
+password_hasher = PasswordHasher()
+
+router = APIRouter()
+
+# ------------------ Pydantic Models ------------------
+
+class UserCreate(BaseModel):
+    name: str
+    email: str
+    password: str
+
+class UserLogin(BaseModel):
+    email: str
+    password: str
+
+class ChatMessageCreate(BaseModel):
+    user_id: int
+    content: str
+    sender: str = "user"
+    chat_id: Optional[int] = None
+
+# ------------------ DEPENDENCY ------------------
+
+async def get_db():
+    """Sessão assíncrona por requisição: não ocupa o threadpool usado pelo LLM e pelo Jira."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_session(authorization: Optional[str] = Header(None)) -> Optional[dict]:
+    """Claims do token de sessão (validado sem consultar o banco), ou None sem token."""
+    if not authorization:
+        if SESSION_REQUIRED:
+            raise HTTPException(status_code=401, detail="Sessão necessária", headers={"WWW-Authenticate": "Bearer"})
+        return None
+    esquema, _, token = authorization.partition(" ")
+    if esquema.lower() != "bearer":
+        raise HTTPException(status_code=401, detail="Use Authorization: Bearer <token>")
+    try:
+        return verify_session_token(token)
+    except InvalidSessionToken as e:
+        raise HTTPException(status_code=401, detail=f"Sessão inválida: {e}", headers={"WWW-Authenticate": "Bearer"})
+
+def checar_usuario(sessao: Optional[dict], user_id: int):
+    if sessao is not None and sessao["sub"] != user_id:
+        raise HTTPException(status_code=403, detail="Sessão de outro usuário")
+
+# ------------------ ROTAS DE USUÁRIO/SESSÃO ------------------
+
+@router.post("/cadastro")
+async def signup(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    if await db.scalar(select(User.id).where(User.email == user.email)):
+        raise HTTPException(status_code=400, detail="Email já cadastrado")
+    
+    try:
+        password_hash = await password_hasher.hash(user.password)
+    except PasswordHasherBusy as e:
+        raise HTTPException(status_code=429, detail=f"Servidor ocupado: {e}.", headers={"Retry-After": "1"})
+    new_user = User(name=user.name, email=user.email, password_hash=password_hash)
+    
+    db.add(new_user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Cadastro simultâneo com o mesmo email
+        raise HTTPException(status_code=400, detail="Email já cadastrado")
+    
+    return {"id": new_user.id, "name": new_user.name, "email": new_user.email}
+
+@router.post("/login")
+async def login(user: UserLogin, db: AsyncSession = Depends(get_db)):
+    db_user = await db.scalar(select(User).where(User.email == user.email))
+    try:
+        valida = await password_hasher.verify(user.password, db_user.password_hash if db_user else None)
+    except PasswordHasherBusy as e:
+        raise HTTPException(status_code=429, detail=f"Servidor ocupado: {e}.", headers={"Retry-After": "1"})
+    if not valida:
+        raise HTTPException(status_code=401, detail="Email ou senha inválidos")
+
+    if password_hasher.needs_rehash(db_user.password_hash):
+        # BCRYPT_ROUNDS mudou: regrava o hash com o custo atual (melhor esforço)
+        try:
+            db_user.password_hash = await password_hasher.hash(user.password)
+            await db.commit()
+        except PasswordHasherBusy:
+            pass
+
+    token, expira = issue_session_token(db_user.id, db_user.name, db_user.email)
+    return {"id": db_user.id, "name": db_user.name, "email": db_user.email, "token": token, "expires_at": expira}
+
+@router.get("/session")
+async def current_session(sessao: Optional[dict] = Depends(get_session)):
+    """Usuário do token de sessão, sem ir ao banco."""
+    if sessao is None:
+        raise HTTPException(status_code=401, detail="Sessão necessária", headers={"WWW-Authenticate": "Bearer"})
+    return {"id": sessao["sub"], "name": sessao["name"], "email": sessao["email"], "expires_at": sessao["exp"]}
+
+@router.get("/auth/stats")
+async def auth_stats():
+    """Vagas, fila, rejeições (429) e tempo médio do executor de senhas (bcrypt)."""
+    return password_hasher.stats()
+
+# ------------------ ROTAS DE CHAT/HISTÓRICO ------------------
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Cursor opaco da paginação por chave: (created_at, id) do último item da página."""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{row_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+def antes_do_cursor(coluna_data, coluna_id, cursor: Optional[str]):
+    """Filtro keyset para ordem decrescente de (data, id): só itens depois do cursor."""
+    if not cursor:
+        return true()
+    created_at, row_id = decode_cursor(cursor)
+    return or_(coluna_data < created_at, and_(coluna_data == created_at, coluna_id < row_id))
+
+def mensagem_dict(m: Message) -> dict:
+    return {"id": m.id, "sender": m.sender, "content": m.content, "created_at": m.created_at}
+
+@router.get("/chats")
+async def get_user_chats(
+    user_id: int,
+    limit: int = Query(CHATS_PAGE_SIZE, ge=1, le=100),
+    cursor: Optional[str] = None,
+    summary: bool = True,
+    db: AsyncSession = Depends(get_db),
+    sessao: Optional[dict] = Depends(get_session),
+):
+    """
+    Chats do usuário, do mais recente para o mais antigo, em páginas de `limit`.
+    Com `summary` (padrão), cada chat traz só a última mensagem; as mensagens
+    completas ficam em /chats/{chat_id}/messages. Uma única consulta por página,
+    independente do tamanho do histórico. `next_cursor` é nulo na última página.
+    """
+    checar_usuario(sessao, user_id)
+    consulta = select(Chat)
+    if summary:
+        ultima_id = (
+            select(Message.id)
+            .where(Message.chat_id == Chat.id)
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(1)
+            .correlate(Chat)
+            .scalar_subquery()
+        )
+        consulta = select(Chat, Message).outerjoin(Message, Message.id == ultima_id)
+    linhas = (await db.execute(
+        consulta
+        .where(Chat.user_id == user_id, antes_do_cursor(Chat.created_at, Chat.id, cursor))
+        .order_by(Chat.created_at.desc(), Chat.id.desc())
+        .limit(limit + 1)
+    )).all()
+
+    pagina = linhas[:limit]
+    chats = []
+    for linha in pagina:
+        chat = linha[0]
+        item = {"id": chat.id, "title": chat.title, "created_at": chat.created_at}
+        if summary:
+            item["last_message"] = mensagem_dict(linha[1]) if linha[1] else None
+        chats.append(item)
+    proximo = encode_cursor(pagina[-1][0].created_at, pagina[-1][0].id) if len(linhas) > limit else None
+    return {"chats": chats, "next_cursor": proximo}
+
+@router.get("/chats/{chat_id}/messages")
+async def get_chat_messages(
+    chat_id: int,
+    user_id: int,
+    limit: int = Query(MESSAGES_PAGE_SIZE, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    sessao: Optional[dict] = Depends(get_session),
+):
+    """
+    Mensagens de um chat em páginas de `limit`, começando pelas mais recentes.
+    Cada página vem em ordem cronológica; `next_cursor` busca as anteriores.
+    """
+    checar_usuario(sessao, user_id)
+    mensagens = (await db.scalars(
+        select(Message)
+        .join(Chat, Chat.id == Message.chat_id)
+        .where(
+            Message.chat_id == chat_id,
+            Chat.user_id == user_id,
+            antes_do_cursor(Message.created_at, Message.id, cursor),
+        )
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(limit + 1)
+    )).all()
+    if not mensagens and not cursor:
+        # Chat vazio ou de outro usuário
+        if not await db.scalar(select(Chat.id).where(Chat.id == chat_id, Chat.user_id == user_id)):
+            raise HTTPException(status_code=404, detail="Chat não encontrado")
+
+    pagina = mensagens[:limit]
+    proximo = encode_cursor(pagina[-1].created_at, pagina[-1].id) if len(mensagens) > limit else None
+    return {"messages": [mensagem_dict(m) for m in reversed(pagina)], "next_cursor": proximo}
+
+@router.post("/chat_message")
+async def add_chat_message(
+    message: ChatMessageCreate,
+    db: AsyncSession = Depends(get_db),
+    sessao: Optional[dict] = Depends(get_session),
+):
+    """
+    Cria/atualiza chat e salva mensagem.
+    - Se chat_id não informado, cria novo chat com título igual aos primeiros 50 caracteres da mensagem.
+    """
+    checar_usuario(sessao, message.user_id)
+    user_id = message.user_id
+    content = message.content
+    sender = message.sender
+    chat_id = message.chat_id
+
+    if chat_id:
+        chat = await db.scalar(select(Chat).where(Chat.id == chat_id, Chat.user_id == user_id))
+        if not chat:
+            raise HTTPException(status_code=404, detail="Chat não encontrado")
+    else:
+        chat = Chat(user_id=user_id, title=content[:50])
+        db.add(chat)
+        await db.flush()
+
+    # Chat novo e mensagem na mesma transação
+    msg = Message(chat_id=chat.id, sender=sender, content=content)
+    db.add(msg)
+    await db.commit()
+
+    return {"chat_id": chat.id, "message_id": msg.id, "sender": msg.sender, "content": msg.content}
@@ -0,0 +1,190 @@
+# context_budget.py
+"""
+Montagem do contexto RAG sob um orçamento de tokens.
+
+Entre o retriever e o prompt "stuff":
+1. junta chunks vizinhos do mesmo arquivo que se sobrepõem (chunk_overlap=200 do ingest);
+2. descarta quase-duplicatas (contenção de shingles de palavras);
+3. empacota os trechos por score até CONTEXT_TOKEN_BUDGET.
+
+Os tokens são estimados (~4 caracteres por token), o suficiente para comparar o
+contexto ingênuo com o empacotado e reportar a economia por requisição.
+"""
+import os
+import re
+import math
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.85"))
+
+# Menor sobreposição (em caracteres) considerada ao juntar chunks vizinhos
+MIN_OVERLAP_CHARS = 40
+SHINGLE_SIZE = 5
+
+SEPARADOR = "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text or "") / 4)
+
+
+@dataclass
+class Trecho:
+    text: str
+    score: float
+    source: str
+    ids: List[str] = field(default_factory=list)
+
+
+def _overlap(a: str, b: str) -> int:
+    """Tamanho do maior sufixo de `a` que é prefixo de `b` (0 se menor que MIN_OVERLAP_CHARS)."""
+    inicio = b[:MIN_OVERLAP_CHARS]
+    pos = a.find(inicio, max(0, len(a) - len(b)))
+    while pos != -1:
+        if b.startswith(a[pos:]):
+            return len(a) - pos
+        pos = a.find(inicio, pos + 1)
+    return 0
+
+
+def _shingles(text: str) -> set:
+    palavras = re.findall(r"\w+", text.lower())
+    if len(palavras) < SHINGLE_SIZE:
+        return {tuple(palavras)}
+    return {tuple(palavras[i:i + SHINGLE_SIZE]) for i in range(len(palavras) - SHINGLE_SIZE + 1)}
+
+
+def _contencao(a: set, b: set) -> float:
+    """Fração dos shingles do menor trecho presentes no outro (1.0 = um contém o outro)."""
+    return len(a & b) / min(len(a), len(b)) if a and b else 0.0
+
+
+def _merge_vizinhos(trechos: List[Trecho]) -> List[Trecho]:
+    resultado: List[Trecho] = []
+    for trecho in trechos:
+        for existente in resultado:
+            if existente.source != trecho.source:
+                continue
+            if trecho.text in existente.text:
+                pass
+            elif n := _overlap(existente.text, trecho.text):
+                existente.text += trecho.text[n:]
+            elif n := _overlap(trecho.text, existente.text):
+                existente.text = trecho.text + existente.text[n:]
+            else:
+                continue
+            existente.score = max(existente.score, trecho.score)
+            existente.ids.extend(trecho.ids)
+            break
+        else:
+            resultado.append(trecho)
+    return resultado
+
+
+def _dedup(trechos: List[Trecho], limiar: float) -> List[Trecho]:
+    mantidos: List[Tuple[Trecho, set]] = []
+    for trecho in sorted(trechos, key=lambda t: t.score, reverse=True):
+        sh = _shingles(trecho.text)
+        if any(_contencao(sh, outro) >= limiar for _, outro in mantidos):
+            continue
+        mantidos.append((trecho, sh))
+    return [t for t, _ in mantidos]
+
+
+def assemble_context(
+    docs: list,
+    budget_tokens: int = CONTEXT_TOKEN_BUDGET,
+    dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD,
+) -> Tuple[str, dict]:
+    """
+    Recebe os Documents na ordem do retriever e retorna (contexto, relatório). O score de
+    cada chunk vem de metadata["retrieval_score"] (retriever híbrido) ou da posição.
+    """
+    ingenuo = SEPARADOR.join(doc.page_content for doc in docs)
+    trechos = [
+        Trecho(
+            text=doc.page_content,
+            score=doc.metadata.get("retrieval_score", 1.0 / (rank + 1)),
+            source=str(doc.metadata.get("source", "")),
+            ids=[doc.id] if doc.id else [],
+        )
+        for rank, doc in enumerate(docs)
+    ]
+
+    trechos = _dedup(_merge_vizinhos(trechos), dedup_threshold)
+
+    usados: List[Trecho] = []
+    tokens_usados = 0
+    for trecho in trechos:  # já ordenados por score
+        custo = estimate_tokens(trecho.text) + (estimate_tokens(SEPARADOR) if usados else 0)
+        if usados and tokens_usados + custo > budget_tokens:
+            continue
+        usados.append(trecho)
+        tokens_usados += custo
+
+    contexto = SEPARADOR.join(t.text for t in usados)
+    tokens_ingenuos = estimate_tokens(ingenuo)
+    tokens_finais = estimate_tokens(contexto)
+    relatorio = {
+        "chunks_retrieved": len(docs),
+        "chunks_used": sum(len(t.ids) or 1 for t in usados),
+        "segments": len(usados),
+        "context_tokens": tokens_finais,
+        "naive_context_tokens": tokens_ingenuos,
+        "tokens_saved": max(0, tokens_ingenuos - tokens_finais),
+        "budget_tokens": budget_tokens,
+    }
+    return contexto, relatorio
+
+
+# ------------------ Histórico do /refine ------------------
+
+REFINE_HISTORY_TOKEN_LIMIT = int(os.getenv("REFINE_HISTORY_TOKEN_LIMIT", "3000"))
+# Instruções mais recentes mantidas na íntegra quando o limite é ultrapassado
+REFINE_HISTORY_KEEP_INSTRUCTIONS = int(os.getenv("REFINE_HISTORY_KEEP_INSTRUCTIONS", "4"))
+RESUMO_INSTRUCAO_CHARS = 160
+
+
+def compact_history(history: list, token_limit: int = REFINE_HISTORY_TOKEN_LIMIT) -> Tuple[str, dict]:
+    """
+    Compacta o histórico do refinamento. Cada resposta do assistente já é o JSON completo
+    das user stories, então só a última importa; das mensagens do usuário fica a trilha de
+    instruções. Se ainda assim o texto passar de `token_limit`, as instruções antigas
+    (exceto a solicitação original) são resumidas em uma linha cada.
+
+    `history` é uma lista de objetos com `role` e `content`. Retorna (texto, relatório).
+    """
+    completo = "\n".join(f"{m.role}: {m.content}" for m in history)
+    instrucoes = [m.content for m in history if m.role == "user"]
+    ultimo_estado = next((m.content for m in reversed(history) if m.role == "assistant"), None)
+
+    def formatar(trilha):
+        linhas = [f"user: {texto}" for texto in trilha]
+        if ultimo_estado is not None:
+            linhas.append(f"assistant (estado atual das user stories): {ultimo_estado}")
+        return "\n".join(linhas)
+
+    texto = formatar(instrucoes)
+    resumido = False
+    if estimate_tokens(texto) > token_limit and len(instrucoes) > REFINE_HISTORY_KEEP_INSTRUCTIONS + 1:
+        antigas = instrucoes[1:-REFINE_HISTORY_KEEP_INSTRUCTIONS]
+        resumo = "Instruções anteriores (resumidas): " + " | ".join(
+            t if len(t) <= RESUMO_INSTRUCAO_CHARS else t[:RESUMO_INSTRUCAO_CHARS] + "..."
+            for t in antigas
+        )
+        texto = formatar([instrucoes[0], resumo] + instrucoes[-REFINE_HISTORY_KEEP_INSTRUCTIONS:])
+        resumido = True
+
+    relatorio = {
+        "messages": len(history),
+        "history_tokens": estimate_tokens(texto),
+        "full_history_tokens": estimate_tokens(completo),
+        "summarized": resumido,
+    }
+    return texto, relatorio
@@ -0,0 +1,173 @@
+# embedding_cache.py
+"""
+Cache persistente de embeddings endereçado por conteúdo.
+
+Cada vetor é armazenado em SQLite (float32) sob a chave SHA-256 de
+"<modelo>\\0<texto>". Tanto o ingest.py quanto as consultas da API passam pelo
+`CachedEmbeddings`, que só executa o modelo para textos ainda não vistos.
+"""
+import os
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("assistente-rag")
+
+EMBEDDINGS_CACHE_ENABLED = os.getenv("EMBEDDINGS_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EMBEDDINGS_CACHE_PATH = os.getenv("EMBEDDINGS_CACHE_PATH", "embeddings_cache.db")
+
+# Backend de execução do modelo: "torch" (padrão) ou "onnx" (ONNX Runtime)
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "torch")
+# Quantização int8 dinâmica (apenas com backend "onnx"); vazio = float32
+EMBEDDINGS_ONNX_QUANTIZATION = os.getenv("EMBEDDINGS_ONNX_QUANTIZATION", "")
+
+# Arquivos int8 publicados no repositório dos modelos sentence-transformers
+ONNX_QUANTIZED_FILES = {
+    "avx2": "onnx/model_quint8_avx2.onnx",
+    "avx512": "onnx/model_qint8_avx512.onnx",
+    "avx512_vnni": "onnx/model_qint8_avx512_vnni.onnx",
+    "arm64": "onnx/model_qint8_arm64.onnx",
+}
+
+# Limite de parâmetros por consulta "IN (...)" do SQLite
+_SQLITE_BATCH = 500
+
+
+def content_hash(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """Armazenamento chave -> vetor float32 em SQLite."""
+
+    def __init__(self, path: str = EMBEDDINGS_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY,"
+                " dim INTEGER NOT NULL,"
+                " vector BLOB NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get_many(self, keys: List[str]) -> dict:
+        found = {}
+        with self._connect() as conn:
+            for i in range(0, len(keys), _SQLITE_BATCH):
+                batch = keys[i:i + _SQLITE_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, items: dict):
+        rows = [
+            (key, len(vec), np.asarray(vec, dtype=np.float32).tobytes())
+            for key, vec in items.items()
+        ]
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dim, vector) VALUES (?, ?, ?)", rows
+            )
+
+
+class CachedEmbeddings(Embeddings):
+    """Envolve um modelo de embeddings e consulta o EmbeddingStore antes de executá-lo."""
+
+    def __init__(self, underlying: Embeddings, model_name: str, store: Optional[EmbeddingStore] = None):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.store = store or EmbeddingStore()
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [content_hash(self.model_name, t) for t in texts]
+        cached = self.store.get_many(list(set(keys)))
+
+        # Textos repetidos no mesmo lote são embutidos uma única vez
+        pendentes = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in pendentes:
+                pendentes[key] = text
+        self.hits += len(texts) - len(pendentes)
+        self.misses += len(pendentes)
+
+        if pendentes:
+            vetores = self.underlying.embed_documents(list(pendentes.values()))
+            novos = dict(zip(pendentes.keys(), vetores))
+            self.store.put_many(novos)
+            cached.update(novos)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = content_hash(self.model_name, text)
+        cached = self.store.get_many([key])
+        if key in cached:
+            self.hits += 1
+            return cached[key]
+        self.misses += 1
+        vetor = self.underlying.embed_query(text)
+        self.store.put_many({key: vetor})
+        return vetor
+
+
+def build_embeddings(
+    model_name: str,
+    device: str = "cpu",
+    backend: str = EMBEDDINGS_BACKEND,
+    quantization: str = EMBEDDINGS_ONNX_QUANTIZATION,
+    use_cache: bool = EMBEDDINGS_CACHE_ENABLED,
+) -> Embeddings:
+    """
+    Cria o modelo de embeddings (HuggingFace/sentence-transformers) envolvido pelo cache
+    persistente. `backend` escolhe "torch" (padrão) ou "onnx" (ONNX Runtime); com
+    "onnx", `quantization` seleciona um dos modelos int8 dinâmicos publicados no repo
+    do modelo (avx2, avx512, avx512_vnni, arm64).
+    """
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    model_kwargs = {'device': device}
+    backend = backend.lower()
+    if backend == "onnx":
+        model_kwargs["backend"] = "onnx"
+        if quantization:
+            if quantization not in ONNX_QUANTIZED_FILES:
+                raise ValueError(
+                    f"EMBEDDINGS_ONNX_QUANTIZATION inválido: {quantization!r} "
+                    f"(opções: {', '.join(ONNX_QUANTIZED_FILES)})"
+                )
+            model_kwargs["model_kwargs"] = {"file_name": ONNX_QUANTIZED_FILES[quantization]}
+    elif backend != "torch":
+        raise ValueError(f"EMBEDDINGS_BACKEND inválido: {backend!r} (use 'torch' ou 'onnx').")
+
+    logger.info("Embeddings: modelo=%s backend=%s quantização=%s", model_name, backend, quantization or "-")
+    base = HuggingFaceEmbeddings(model_name=model_name, model_kwargs=model_kwargs)
+    if not use_cache:
+        return base
+    logger.info("Cache de embeddings ativo em %s", EMBEDDINGS_CACHE_PATH)
+    # Vetores int8/ONNX diferem ligeiramente dos do PyTorch: cada backend tem seu espaço de chaves
+    return CachedEmbeddings(base, embedding_model_id(model_name, backend, quantization))
+
+
+def embedding_model_id(model_name: str, backend: str, quantization: str = "") -> str:
+    if backend == "torch":
+        return model_name
+    return f"{model_name}|{backend}|{quantization or 'fp32'}"
@@ -0,0 +1,370 @@
+# jira_gateway.py
+"""
+Ponto único de acesso HTTP ao Jira.
+
+Um só cliente `JIRA` (mesmas credenciais para issues e sprints) com um pool de
+conexões dimensionado por JIRA_POOL_SIZE. Toda requisição passa pelo
+`RateLimitedAdapter` (adapter do requests montado na sessão do cliente), que:
+
+- consome um token de um token bucket antes de enviar (JIRA_RATE_LIMIT req/s,
+  rajada de JIRA_RATE_BURST);
+- adapta o ritmo às respostas: 429/503 com `Retry-After` pausam o bucket e reduzem
+  a taxa pela metade; `X-RateLimit-Remaining`/`X-RateLimit-Reset` ajustam a taxa ao
+  que resta na janela (e seguram os envios até o reset quando ela se esgota);
+  sem esses headers, a taxa volta aos poucos ao configurado;
+- repete a requisição após um 429 (até JIRA_RATE_LIMIT_RETRIES vezes);
+- registra um histograma de latência por endpoint (método + caminho normalizado).
+
+As chamadas REST da API Agile que o python-jira não cobre (criar/iniciar sprint)
+também ficam aqui, para que nenhum outro módulo use `_session` diretamente.
+"""
+import os
+import re
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Dict, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+load_dotenv()
+
+logger = logging.getLogger("assistente-rag")
+
+JIRA_URL = os.getenv("JIRA_URL")
+# O cliente de sprints usava EMAIL_JIRA; os dois apontam para o mesmo usuário
+JIRA_USERNAME = os.getenv("JIRA_USERNAME") or os.getenv("EMAIL_JIRA")
+JIRA_API_TOKEN = os.getenv("JIRA_API_TOKEN")
+
+JIRA_POOL_SIZE = int(os.getenv("JIRA_POOL_SIZE", "20"))
+JIRA_TIMEOUT = float(os.getenv("JIRA_TIMEOUT", "30"))
+JIRA_RATE_LIMIT = float(os.getenv("JIRA_RATE_LIMIT", "10"))
+JIRA_RATE_BURST = int(os.getenv("JIRA_RATE_BURST", "20"))
+JIRA_RATE_LIMIT_RETRIES = int(os.getenv("JIRA_RATE_LIMIT_RETRIES", "4"))
+
+# Limites (ms) dos buckets do histograma de latência
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+LATENCY_SAMPLES = 1000
+# Pausa usada quando um 429 vem sem Retry-After
+DEFAULT_RETRY_AFTER = 2.0
+MAX_RETRY_AFTER = 120.0
+
+
+# ------------------ Token bucket ------------------
+
+class TokenBucket:
+    """Token bucket thread-safe com taxa ajustável e pausa (Retry-After)."""
+
+    def __init__(self, rate: float, burst: int, min_rate: float = 0.2):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.throttled = 0
+        self.wait_total = 0.0
+
+    def _refill(self, agora: float):
+        self._tokens = min(self.burst, self._tokens + (agora - self._updated) * self.rate)
+        self._updated = agora
+
+    def acquire(self):
+        inicio = time.monotonic()
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._refill(agora)
+                if agora >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    self.wait_total += agora - inicio
+                    return
+                espera = max(self._paused_until - agora, (1 - self._tokens) / self.rate)
+            time.sleep(espera)
+
+    def pause(self, segundos: float):
+        """Retry-After: ninguém envia até lá, e a taxa cai pela metade."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + segundos)
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+            self.throttled += 1
+
+    def hold(self, segundos: float):
+        """Janela do X-RateLimit esgotada: espera o reset, sem reduzir a taxa."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + segundos)
+
+    def limit_to(self, rate: float):
+        """X-RateLimit: acompanha o que o restante da janela permite (sem passar do configurado)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, min(self.max_rate, rate))
+
+    def recover(self):
+        """Resposta normal: devolve a taxa ao máximo configurado aos poucos (+10%)."""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self._refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+    def as_dict(self) -> dict:
+        return {
+            "rate": round(self.rate, 3),
+            "max_rate": self.max_rate,
+            "burst": self.burst,
+            "throttled": self.throttled,
+            "wait_total_s": round(self.wait_total, 3),
+        }
+
+
+# ------------------ Histogramas de latência ------------------
+
+_ID_PATTERN = re.compile(r"/(\d+|[A-Z][A-Z0-9_]+-\d+)(?=/|$)")
+
+
+def endpoint_name(method: str, url: str) -> str:
+    """"POST https://x/rest/agile/1.0/sprint/12/issue" -> "POST /rest/agile/1.0/sprint/{id}/issue"."""
+    caminho = re.sub(r"^https?://[^/]+", "", url).split("?", 1)[0]
+    # A versão da API (/rest/api/2, /rest/agile/1.0) não é um ID
+    versao = re.match(r"/rest/\w+/[\d.]+", caminho)
+    prefixo = versao.group(0) if versao else ""
+    return f"{method} {prefixo}{_ID_PATTERN.sub('/{id}', caminho[len(prefixo):])}"
+
+
+class _LatencyHistogram:
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.statuses: Dict[str, int] = {}
+        self.samples = deque(maxlen=LATENCY_SAMPLES)
+
+    def observe(self, ms: float, status):
+        i = next((i for i, limite in enumerate(LATENCY_BUCKETS_MS) if ms <= limite), len(LATENCY_BUCKETS_MS))
+        self.buckets[i] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+        self.samples.append(ms)
+
+    def as_dict(self) -> dict:
+        amostras = list(self.samples)
+        rotulos = [f"<={limite}ms" for limite in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "p50_ms": round(float(np.percentile(amostras, 50)), 2) if amostras else 0.0,
+            "p99_ms": round(float(np.percentile(amostras, 99)), 2) if amostras else 0.0,
+            "status": dict(self.statuses),
+            "histogram": dict(zip(rotulos, self.buckets)),
+        }
+
+
+# ------------------ Adapter ------------------
+
+def parse_retry_after(valor: Optional[str]) -> Optional[float]:
+    """Retry-After em segundos ou data HTTP."""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _seconds_until_reset(valor: Optional[str]) -> Optional[float]:
+    """X-RateLimit-Reset: o Jira Cloud envia um timestamp ISO; aceita também epoch."""
+    if not valor:
+        return None
+    try:
+        numero = float(valor)
+        return max(0.0, numero - time.time()) if numero > 1e9 else max(0.0, numero)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, datetime.fromisoformat(valor.replace("Z", "+00:00")).timestamp() - time.time())
+    except ValueError:
+        return None
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTPAdapter com token bucket, tratamento de 429 e métricas por endpoint."""
+
+    def __init__(self, bucket: TokenBucket, retries_429: int = JIRA_RATE_LIMIT_RETRIES, **kwargs):
+        self.bucket = bucket
+        self.retries_429 = retries_429
+        self._histograms: Dict[str, _LatencyHistogram] = {}
+        self._hist_lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def _observe(self, endpoint: str, ms: float, status):
+        with self._hist_lock:
+            self._histograms.setdefault(endpoint, _LatencyHistogram()).observe(ms, status)
+
+    def _adapt(self, response):
+        headers = response.headers
+        if response.status_code in (429, 503):
+            espera = parse_retry_after(headers.get("Retry-After"))
+            espera = min(MAX_RETRY_AFTER, DEFAULT_RETRY_AFTER if espera is None else espera)
+            logger.warning("Jira respondeu %s; pausando envios por %.1fs.", response.status_code, espera)
+            self.bucket.pause(espera)
+            return True
+
+        restante = headers.get("X-RateLimit-Remaining")
+        reset = _seconds_until_reset(headers.get("X-RateLimit-Reset"))
+        if restante is not None and reset is not None:
+            try:
+                restante = float(restante)
+            except ValueError:
+                restante = None
+            if restante is not None and restante <= 0:
+                self.bucket.hold(min(MAX_RETRY_AFTER, reset))
+                return False
+            if restante is not None and reset > 0:
+                self.bucket.limit_to(restante / reset)
+                return False
+        self.bucket.recover()
+        return False
+
+    def send(self, request, **kwargs):
+        endpoint = endpoint_name(request.method, request.url)
+        tentativa = 0
+        while True:
+            self.bucket.acquire()
+            inicio = time.perf_counter()
+            try:
+                response = super().send(request, **kwargs)
+            except Exception:
+                self._observe(endpoint, (time.perf_counter() - inicio) * 1000, "error")
+                raise
+            self._observe(endpoint, (time.perf_counter() - inicio) * 1000, response.status_code)
+            limitado = self._adapt(response)
+            if not limitado or response.status_code != 429 or tentativa >= self.retries_429:
+                return response
+            tentativa += 1
+            response.close()
+
+    def stats(self) -> dict:
+        with self._hist_lock:
+            return {nome: hist.as_dict() for nome, hist in sorted(self._histograms.items())}
+
+
+# ------------------ Gateway ------------------
+
+class JiraGateway:
+    def __init__(
+        self,
+        server: str = JIRA_URL,
+        username: Optional[str] = JIRA_USERNAME,
+        api_token: Optional[str] = JIRA_API_TOKEN,
+        pool_size: int = JIRA_POOL_SIZE,
+        rate: float = JIRA_RATE_LIMIT,
+        burst: int = JIRA_RATE_BURST,
+        timeout: float = JIRA_TIMEOUT,
+    ):
+        self.server = (server or "").rstrip("/")
+        self.username = username
+        self.api_token = api_token
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate, burst)
+        self.adapter = RateLimitedAdapter(
+            self.bucket,
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            # Só repete falhas de conexão; 429 é tratado pelo próprio adapter
+            max_retries=Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.5),
+        )
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """Cliente python-jira, criado na primeira chamada (sem consultar o servidor)."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from jira import JIRA
+                    logger.info("Criando cliente JIRA (pool=%d, %.1f req/s).", self.pool_size, self.bucket.max_rate)
+                    client = JIRA(
+                        server=self.server,
+                        basic_auth=(self.username, self.api_token),
+                        get_server_info=False,
+                        max_retries=0,
+                        timeout=self.timeout,
+                    )
+                    client._session.mount("https://", self.adapter)
+                    client._session.mount("http://", self.adapter)
+                    self._client = client
+        return self._client
+
+    def _agile_get(self, path: str):
+        return self.client._session.get(f"{self.server}/rest/agile/1.0/{path}")
+
+    def _agile_post(self, path: str, payload: dict) -> dict:
+        response = self.client._session.post(f"{self.server}/rest/agile/1.0/{path}", json=payload)
+        response.raise_for_status()
+        return response.json() if response.content else {}
+
+    def create_sprint(self, name: str, board_id, start: datetime, end: datetime) -> dict:
+        return self._agile_post("sprint", {
+            "name": name,
+            "originBoardId": board_id,
+            "startDate": start.isoformat() + "Z",
+            "endDate": end.isoformat() + "Z",
+        })
+
+    def start_sprint(self, board_id, sprint_id, start_date: Optional[datetime] = None) -> dict:
+        payload = {}
+        if start_date:
+            payload["startDate"] = start_date.isoformat() + "Z"
+        return self._agile_post(f"board/{board_id}/sprint/{sprint_id}/start", payload)
+
+    def wait_for_sprint(self, sprint_id, timeout: float, interval: float = 0.1, max_interval: float = 0.5) -> dict:
+        """
+        Consulta a sprint até ela ficar visível na API Agile (logo após a criação o Jira
+        pode responder 404). Intervalo dobra a cada tentativa até `max_interval`;
+        levanta TimeoutError depois de `timeout` segundos.
+        """
+        prazo = time.monotonic() + timeout
+        while True:
+            try:
+                response = self._agile_get(f"sprint/{sprint_id}")
+                if response.status_code != 404:
+                    response.raise_for_status()
+                    return response.json()
+            except Exception as e:
+                # O ResilientSession do python-jira levanta JIRAError para 404
+                if getattr(e, "status_code", None) != 404:
+                    raise
+            if time.monotonic() + interval > prazo:
+                raise TimeoutError(f"Sprint {sprint_id} não ficou disponível em {timeout:.0f}s")
+            time.sleep(interval)
+            interval = min(max_interval, interval * 2)
+
+    def stats(self) -> dict:
+        return {
+            "server": self.server,
+            "pool_size": self.pool_size,
+            "rate_limiter": self.bucket.as_dict(),
+            "endpoints": self.adapter.stats(),
+        }
+
+
+@lru_cache(maxsize=1)
+def get_jira_gateway() -> JiraGateway:
+    return JiraGateway()
@@ -0,0 +1,323 @@
+# jira_outbox.py
+"""
+Outbox persistente para escritas no Jira.
+
+Os endpoints só gravam as issues na tabela `jira_outbox` (database.py) e respondem;
+um pool de workers assíncronos no próprio processo drena a fila em lotes, com
+backoff exponencial entre tentativas. Cada item tem uma chave de idempotência
+única, usada pelo handler para não duplicar issues ao repetir um item que pode já
+ter sido criado (ex.: processo caiu entre a criação e a gravação do status).
+
+A lógica de envio ao Jira fica no handler recebido pelo `OutboxWorkerPool`
+(definido em main.py), que processa uma lista de itens do mesmo lote e devolve um
+`ItemResult` para cada um. Erros do tipo `PermanentError` (ex.: Jira 400 por campo
+inválido) marcam o item como falho na hora, sem novas tentativas.
+
+Itens de lotes com sprint (`await_sprint`) só terminam depois de anexados a ela: a
+issue criada fica gravada em `issue_key` e o item continua pendente até a sprint do
+lote ser definida (`set_batch_sprint`) e o handler anexá-lo, com as mesmas
+retentativas da criação.
+"""
+import json
+import uuid
+import random
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, List, NamedTuple, Optional, Tuple
+
+from database import JiraOutbox
+
+logger = logging.getLogger("assistente-rag")
+
+PENDING, IN_PROGRESS, DONE, FAILED = "pending", "in_progress", "done", "failed"
+
+
+
+class PermanentError(str):
+    """Erro de item que não adianta repetir: o item vai direto para `failed`."""
+
+
+class ItemResult(NamedTuple):
+    """
+    Resultado do handler para um item. `key` é gravada mesmo com erro (a issue já
+    existe e não deve ser recriada). Sem erro e com `finished=False`, o item volta a
+    ficar pendente sem contar tentativa (ex.: aguardando a sprint do lote).
+    """
+    key: Optional[str]
+    error: Optional[str] = None
+    finished: bool = True
+
+
+OutboxHandler = Callable[[str, List[dict]], Awaitable[List[ItemResult]]]
+
+
+def new_batch_id(client_key: Optional[str] = None) -> str:
+    """ID do lote; derivado do header Idempotency-Key do cliente, se houver."""
+    if client_key:
+        return hashlib.sha256(client_key.encode("utf-8")).hexdigest()[:32]
+    return uuid.uuid4().hex
+
+
+def item_idempotency_key(batch_id: str, index: int) -> str:
+    return hashlib.sha256(f"{batch_id}:{index}".encode("utf-8")).hexdigest()
+
+
+def enqueue(db, batch_id: str, kind: str, items: List[dict], sprint_id=None, await_sprint: bool = False) -> int:
+    """
+    Grava os itens do lote. `items` é uma lista de {"ref_id", "fields"}. Reenvios do
+    mesmo lote (mesmo batch_id) não geram itens duplicados. Com `await_sprint`, a
+    sprint ainda está sendo criada e será informada depois em `set_batch_sprint`.
+    """
+    if db.query(JiraOutbox.id).filter(JiraOutbox.batch_id == batch_id).first():
+        return 0
+    for i, item in enumerate(items):
+        db.add(JiraOutbox(
+            batch_id=batch_id,
+            kind=kind,
+            idempotency_key=item_idempotency_key(batch_id, i),
+            ref_id=None if item.get("ref_id") is None else str(item["ref_id"]),
+            payload=json.dumps(
+                {"fields": item["fields"], "sprint_id": sprint_id, "sprint_ready": not await_sprint},
+                ensure_ascii=False,
+            ),
+            status=PENDING,
+            attempts=0,
+            next_attempt_at=datetime.utcnow(),
+        ))
+    db.commit()
+    return len(items)
+
+
+def set_batch_sprint(db, batch_id: str, sprint_id) -> None:
+    """
+    Grava a sprint do lote (conhecida só depois do enqueue; None = sem sprint, as issues
+    ficam no backlog) no payload de cada item e libera na hora os que aguardavam por ela.
+    """
+    agora = datetime.utcnow()
+    for row in db.query(JiraOutbox).filter(JiraOutbox.batch_id == batch_id):
+        payload = json.loads(row.payload)
+        payload["sprint_id"] = sprint_id
+        payload["sprint_ready"] = True
+        row.payload = json.dumps(payload, ensure_ascii=False)
+        if row.status == PENDING:
+            row.next_attempt_at = agora
+    db.commit()
+
+
+def batch_sprint(db, batch_id: str) -> Tuple[bool, Any]:
+    """(sprint já definida, sprint_id) do lote."""
+    row = db.query(JiraOutbox.payload).filter(JiraOutbox.batch_id == batch_id).first()
+    if row is None:
+        return True, None
+    payload = json.loads(row.payload)
+    return payload.get("sprint_ready", True), payload.get("sprint_id")
+
+
+def batch_status(db, batch_id: str) -> Optional[dict]:
+    rows = (
+        db.query(JiraOutbox)
+        .filter(JiraOutbox.batch_id == batch_id)
+        .order_by(JiraOutbox.id)
+        .all()
+    )
+    if not rows:
+        return None
+    contagem = {PENDING: 0, IN_PROGRESS: 0, DONE: 0, FAILED: 0}
+    for row in rows:
+        contagem[row.status] = contagem.get(row.status, 0) + 1
+    return {
+        "batch_id": batch_id,
+        "kind": rows[0].kind,
+        "sprint_id": json.loads(rows[0].payload).get("sprint_id"),
+        "total": len(rows),
+        "counts": contagem,
+        "finished": contagem[PENDING] == 0 and contagem[IN_PROGRESS] == 0,
+        "items": [
+            {
+                "ref_id": row.ref_id,
+                "title": json.loads(row.payload)["fields"].get("summary"),
+                "status": row.status,
+                "issue_key": row.issue_key,
+                "attempts": row.attempts,
+                "last_error": row.last_error,
+            }
+            for row in rows
+        ],
+    }
+
+
+class OutboxWorkerPool:
+    def __init__(
+        self,
+        session_factory,
+        handler: OutboxHandler,
+        workers: int = 2,
+        group_size: int = 50,
+        max_attempts: int = 8,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+        lease_seconds: float = 300.0,
+        poll_interval: float = 2.0,
+    ):
+        self.session_factory = session_factory
+        self.handler = handler
+        self.workers = workers
+        self.group_size = group_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wake = asyncio.Event()
+        self._claim_lock = asyncio.Lock()
+
+    # ------------------ Ciclo de vida ------------------
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run(i)) for i in range(self.workers)]
+            logger.info("Outbox do Jira: %d workers iniciados.", self.workers)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Acorda os workers logo após um enqueue (sem esperar o próximo poll)."""
+        self._wake.set()
+
+    async def wait_batch(self, batch_id: str, timeout: float) -> Optional[dict]:
+        """Aguarda o lote terminar (ou o timeout) e retorna o status atual."""
+        prazo = asyncio.get_running_loop().time() + timeout
+        while True:
+            status = await asyncio.to_thread(self._with_session, batch_status, batch_id)
+            if status is None or status["finished"] or asyncio.get_running_loop().time() >= prazo:
+                return status
+            await asyncio.sleep(0.25)
+
+    # ------------------ Workers ------------------
+
+    async def _run(self, n: int):
+        while True:
+            try:
+                async with self._claim_lock:
+                    grupo = await asyncio.to_thread(self._claim_group)
+                if not grupo:
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._process(grupo)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Erro no worker %d do outbox do Jira: %s", n, e)
+                await asyncio.sleep(self.poll_interval)
+
+    async def _process(self, grupo: List[dict]):
+        kind = grupo[0]["kind"]
+        try:
+            resultados = await self.handler(kind, grupo)
+        except Exception as e:
+            resultados = [ItemResult(item["issue_key"], str(e)) for item in grupo]
+        await asyncio.to_thread(self._complete, grupo, resultados)
+
+    def _with_session(self, func, *args):
+        db = self.session_factory()
+        try:
+            return func(db, *args)
+        finally:
+            db.close()
+
+    def _claim_group(self) -> List[dict]:
+        """
+        Reserva até `group_size` itens elegíveis do lote mais antigo. Itens em andamento
+        há mais de `lease_seconds` (processo caiu ou worker lento) voltam a ser elegíveis;
+        a tentativa interrompida conta em `attempts` e o item volta com `reclaimed`, para
+        o handler procurar a issue antes de recriá-la.
+        """
+        db = self.session_factory()
+        try:
+            agora = datetime.utcnow()
+            lease = agora - timedelta(seconds=self.lease_seconds)
+            elegivel = (
+                ((JiraOutbox.status == PENDING) & (JiraOutbox.next_attempt_at <= agora))
+                | ((JiraOutbox.status == IN_PROGRESS) & (JiraOutbox.updated_at <= lease))
+            )
+            primeiro = db.query(JiraOutbox).filter(elegivel).order_by(JiraOutbox.id).first()
+            if primeiro is None:
+                return []
+            candidatos = (
+                db.query(JiraOutbox)
+                .filter(elegivel, JiraOutbox.batch_id == primeiro.batch_id)
+                .order_by(JiraOutbox.id)
+                .limit(self.group_size)
+                .all()
+            )
+            grupo = []
+            for row in candidatos:
+                recuperado = row.status == IN_PROGRESS
+                tentativas = (row.attempts or 0) + (1 if recuperado else 0)
+                # UPDATE condicional: só um worker/processo consegue reservar cada item
+                reservado = (
+                    db.query(JiraOutbox)
+                    .filter(JiraOutbox.id == row.id, JiraOutbox.status == row.status,
+                            JiraOutbox.updated_at == row.updated_at)
+                    .update({"status": IN_PROGRESS, "attempts": tentativas, "updated_at": agora},
+                            synchronize_session=False)
+                )
+                if reservado:
+                    if recuperado:
+                        logger.warning("Outbox do Jira: item %s recuperado após lease expirado.", row.ref_id)
+                    grupo.append({
+                        "id": row.id,
+                        "kind": row.kind,
+                        "batch_id": row.batch_id,
+                        "idempotency_key": row.idempotency_key,
+                        "ref_id": row.ref_id,
+                        "attempts": tentativas,
+                        "reclaimed": recuperado,
+                        "issue_key": row.issue_key,
+                        "created_at": row.created_at,
+                        "payload": json.loads(row.payload),
+                    })
+            db.commit()
+            return grupo
+        finally:
+            db.close()
+
+    def _complete(self, grupo: List[dict], resultados):
+        db = self.session_factory()
+        try:
+            agora = datetime.utcnow()
+            for item, (key, erro, concluido) in zip(grupo, resultados):
+                row = db.get(JiraOutbox, item["id"])
+                if key:
+                    row.issue_key = key
+                if erro is None and not concluido:
+                    # Etapa feita, mas o item ainda não terminou (ex.: aguardando a sprint)
+                    row.status, row.last_error = PENDING, None
+                    row.next_attempt_at = agora + timedelta(seconds=self.poll_interval)
+                    row.updated_at = agora
+                    continue
+                row.attempts = (row.attempts or 0) + 1
+                if erro is None:
+                    row.status, row.last_error = DONE, None
+                elif isinstance(erro, PermanentError) or row.attempts >= self.max_attempts:
+                    row.status, row.last_error = FAILED, erro
+                    logger.error("Outbox do Jira: item %s falhou após %d tentativa(s): %s", row.ref_id, row.attempts, erro)
+                else:
+                    atraso = min(self.backoff_max, self.backoff_base * 2 ** (row.attempts - 1))
+                    row.status, row.last_error = PENDING, erro
+                    row.next_attempt_at = agora + timedelta(seconds=atraso * random.uniform(0.8, 1.2))
+                row.updated_at = agora
+            db.commit()
+        finally:
+            db.close()
@@ -0,0 +1,175 @@
+# lexical_index.py
+"""
+Índice invertido BM25 dos chunks do VectorDB e retriever híbrido (BM25 + denso).
+
+O índice é mantido pelo ingest.py junto com o Chroma (mesmos IDs de chunk) e salvo em
+`<chroma_db>/bm25_index.json`. Na API, o `HybridRetriever` funde o ranking lexical com
+o da busca por similaridade via Reciprocal Rank Fusion (RRF), o que favorece termos
+exatos dos templates ("RNF", "Critérios de Aceite", "Como um") sem perder recall.
+"""
+import os
+import re
+import math
+import json
+import heapq
+import logging
+import threading
+import unicodedata
+from collections import Counter
+from typing import List, Optional
+
+from pydantic import PrivateAttr
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+
+logger = logging.getLogger("assistente-rag")
+
+INDEX_FILE = "bm25_index.json"
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def index_path(path_vector_db: str) -> str:
+    return os.path.join(path_vector_db, INDEX_FILE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Minúsculas, sem acentos ("Critérios" == "criterios"), só tokens alfanuméricos."""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r"\w+", text)
+
+
+class LexicalIndex:
+    def __init__(self):
+        # id -> {"text", "metadata", "len"}
+        self.docs: dict = {}
+        # termo -> {id: frequência}
+        self.postings: dict = {}
+        self._total_len = 0
+
+    # ------------------ Manutenção (ingest.py) ------------------
+
+    def add(self, ids: List[str], texts: List[str], metadatas: Optional[List[dict]] = None):
+        metadatas = metadatas or [{} for _ in ids]
+        for doc_id, text, metadata in zip(ids, texts, metadatas):
+            if doc_id in self.docs:
+                self.remove([doc_id])
+            termos = Counter(tokenize(text))
+            for termo, tf in termos.items():
+                self.postings.setdefault(termo, {})[doc_id] = tf
+            tamanho = sum(termos.values())
+            self.docs[doc_id] = {"text": text, "metadata": metadata or {}, "len": tamanho}
+            self._total_len += tamanho
+
+    def remove(self, ids: List[str]):
+        for doc_id in ids:
+            doc = self.docs.pop(doc_id, None)
+            if doc is None:
+                continue
+            self._total_len -= doc["len"]
+            for termo in set(tokenize(doc["text"])):
+                lista = self.postings.get(termo)
+                if lista is not None:
+                    lista.pop(doc_id, None)
+                    if not lista:
+                        del self.postings[termo]
+
+    def save(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "docs": self.docs, "postings": self.postings}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls()
+        index.docs = data["docs"]
+        index.postings = data["postings"]
+        index._total_len = sum(doc["len"] for doc in index.docs.values())
+        return index
+
+    # ------------------ Consulta ------------------
+
+    def search(self, query: str, k: int) -> List[tuple]:
+        """Retorna [(id, score BM25)] dos k melhores chunks para a consulta."""
+        n = len(self.docs)
+        if not n:
+            return []
+        avgdl = self._total_len / n
+        scores: dict = {}
+        for termo in set(tokenize(query)):
+            lista = self.postings.get(termo)
+            if not lista:
+                continue
+            idf = math.log(1 + (n - len(lista) + 0.5) / (len(lista) + 0.5))
+            for doc_id, tf in lista.items():
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.docs[doc_id]["len"] / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def document(self, doc_id: str) -> Document:
+        doc = self.docs[doc_id]
+        return Document(id=doc_id, page_content=doc["text"], metadata=dict(doc["metadata"]))
+
+
+class HybridRetriever(BaseRetriever):
+    """Funde BM25 e busca densa do Chroma por Reciprocal Rank Fusion."""
+
+    vector_db: object
+    index_file: str
+    k: int = 6
+    fetch_k: int = 20
+    rrf_k: int = 60
+    lexical_weight: float = 1.0
+    dense_weight: float = 1.0
+
+    _index: Optional[LexicalIndex] = PrivateAttr(default=None)
+    _index_mtime: float = PrivateAttr(default=0.0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def _get_index(self) -> Optional[LexicalIndex]:
+        """Carrega o índice e o recarrega quando o ingest.py grava uma nova versão."""
+        try:
+            mtime = os.path.getmtime(self.index_file)
+        except OSError:
+            return None
+        with self._lock:
+            if self._index is None or mtime != self._index_mtime:
+                logger.info("Carregando índice BM25 de %s", self.index_file)
+                self._index = LexicalIndex.load(self.index_file)
+                self._index_mtime = mtime
+            return self._index
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        densos = self.vector_db.similarity_search(query, k=self.fetch_k)
+        index = self._get_index()
+        lexicos = index.search(query, self.fetch_k) if index else []
+
+        scores: dict = {}
+        documentos: dict = {}
+        for rank, doc in enumerate(densos):
+            doc_id = doc.id or doc.page_content
+            documentos[doc_id] = doc
+            scores[doc_id] = scores.get(doc_id, 0.0) + self.dense_weight / (self.rrf_k + rank + 1)
+        for rank, (doc_id, _) in enumerate(lexicos):
+            if doc_id not in documentos:
+                documentos[doc_id] = index.document(doc_id)
+            scores[doc_id] = scores.get(doc_id, 0.0) + self.lexical_weight / (self.rrf_k + rank + 1)
+
+        melhores = heapq.nlargest(self.k, scores.items(), key=lambda item: item[1])
+        resultado = []
+        for doc_id, score in melhores:
+            doc = documentos[doc_id]
+            resultado.append(Document(
+                id=doc.id,
+                page_content=doc.page_content,
+                metadata={**doc.metadata, "retrieval_score": score}
+            ))
+        return resultado
@@ -0,0 +1,194 @@
+# live_transcription.py
+"""
+Transcrição incremental do microfone (WebSocket /audio/live).
+
+O áudio chega em frames (PCM 16-bit little-endian ou pacotes Opus) e é convertido
+para float32 mono a 16 kHz. A cada LIVE_STEP_SECONDS de áudio novo, o
+`LiveTranscriber` olha a janela ainda não confirmada:
+
+- se o VAD encontra uma pausa (LIVE_SILENCE_MS) depois da última fala, transcreve
+  até o fim da fala e emite um segmento `final`; esse áudio sai da janela;
+- se a janela passa de LIVE_WINDOW_SECONDS sem pausa, confirma os segmentos do
+  Whisper exceto o último (que pode estar cortado) e desliza a janela até ele;
+- caso contrário, emite a hipótese atual da janela como `partial`.
+
+Cada passo usa uma vaga do `WhisperPool`; uma sessão nunca ocupa mais de uma.
+"""
+import os
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SAMPLE_RATE = 16000
+
+LIVE_STEP_SECONDS = float(os.getenv("LIVE_STEP_SECONDS", "1.0"))
+LIVE_WINDOW_SECONDS = float(os.getenv("LIVE_WINDOW_SECONDS", "15"))
+LIVE_SILENCE_MS = int(os.getenv("LIVE_SILENCE_MS", "700"))
+LIVE_MAX_SECONDS = float(os.getenv("LIVE_MAX_SECONDS", "7200"))
+
+# (áudio float32 16 kHz) -> lista de segmentos do faster-whisper
+TranscribeFn = Callable[[np.ndarray], Awaitable[list]]
+
+
+# ------------------ Decodificação dos frames ------------------
+
+class PCMDecoder:
+    """PCM 16-bit little-endian mono; reamostra para 16 kHz se preciso."""
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self._resto = b""
+
+    def decode(self, frame: bytes) -> np.ndarray:
+        dados = self._resto + frame
+        util = len(dados) - len(dados) % 2
+        self._resto = dados[util:]
+        audio = np.frombuffer(dados[:util], dtype="<i2").astype(np.float32) / 32768.0
+        if self.sample_rate != SAMPLE_RATE and len(audio):
+            n = int(round(len(audio) * SAMPLE_RATE / self.sample_rate))
+            audio = np.interp(
+                np.linspace(0, len(audio) - 1, n), np.arange(len(audio)), audio
+            ).astype(np.float32)
+        return audio
+
+
+class OpusDecoder:
+    """Um pacote Opus por mensagem (ex.: WebCodecs AudioEncoder), decodificado com o PyAV."""
+
+    def __init__(self, sample_rate: int = 48000):
+        import av
+
+        self._av = av
+        self._codec = av.CodecContext.create("opus", "r")
+        self._codec.sample_rate = sample_rate
+        self._resampler = av.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+
+    def decode(self, frame: bytes) -> np.ndarray:
+        partes = []
+        for quadro in self._codec.decode(self._av.Packet(frame)):
+            for saida in self._resampler.resample(quadro):
+                partes.append(saida.to_ndarray().reshape(-1))
+        if not partes:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(partes).astype(np.float32) / 32768.0
+
+
+def create_decoder(fmt: str, sample_rate: Optional[int] = None):
+    if fmt == "pcm":
+        return PCMDecoder(sample_rate or SAMPLE_RATE)
+    if fmt == "opus":
+        return OpusDecoder(sample_rate or 48000)
+    raise ValueError(f"Formato de áudio não suportado: {fmt} (use 'pcm' ou 'opus')")
+
+
+# ------------------ Janela deslizante ------------------
+
+def _texto(segmentos) -> str:
+    return " ".join(seg.text.strip() for seg in segmentos).strip()
+
+
+class LiveTranscriber:
+    def __init__(
+        self,
+        transcribe: TranscribeFn,
+        step_seconds: float = LIVE_STEP_SECONDS,
+        window_seconds: float = LIVE_WINDOW_SECONDS,
+        silence_ms: int = LIVE_SILENCE_MS,
+    ):
+        self.transcribe = transcribe
+        self.step = int(step_seconds * SAMPLE_RATE)
+        self.window = int(window_seconds * SAMPLE_RATE)
+        self.silence_ms = silence_ms
+        self.silence = int(silence_ms * SAMPLE_RATE / 1000)
+        self._buffer = np.zeros(0, dtype=np.float32)
+        # Posição (em amostras, desde o início da sessão) do começo da janela
+        self._offset = 0
+        self._novas = 0
+        self.total_samples = 0
+        self.finals: List[str] = []
+
+    def feed(self, audio: np.ndarray):
+        self._buffer = np.concatenate([self._buffer, audio])
+        self._novas += len(audio)
+        self.total_samples += len(audio)
+
+    @property
+    def ready(self) -> bool:
+        """Há áudio novo suficiente para um passo."""
+        return self._novas >= self.step
+
+    def _evento(self, tipo: str, texto: str, inicio: int, fim: int) -> dict:
+        return {
+            "type": tipo,
+            "text": texto,
+            "start": round((self._offset + inicio) / SAMPLE_RATE, 2),
+            "end": round((self._offset + fim) / SAMPLE_RATE, 2),
+        }
+
+    def _confirmar(self, texto: str, fim: int) -> Optional[dict]:
+        evento = self._evento("final", texto, 0, fim) if texto else None
+        if texto:
+            self.finals.append(texto)
+        self._buffer = self._buffer[fim:]
+        self._offset += fim
+        return evento
+
+    async def step_once(self) -> List[dict]:
+        """Processa a janela atual e retorna os eventos (`partial`/`final`) resultantes."""
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+        self._novas = 0
+        if not len(self._buffer):
+            return []
+        # O VAD é CPU (ONNX): roda em thread para não travar o event loop
+        falas = await asyncio.to_thread(
+            get_speech_timestamps, self._buffer, VadOptions(min_silence_duration_ms=self.silence_ms)
+        )
+        if not falas:
+            # Só silêncio: mantém um pouco de margem e descarta o resto
+            corte = max(0, len(self._buffer) - SAMPLE_RATE)
+            self._buffer = self._buffer[corte:]
+            self._offset += corte
+            return []
+
+        fim_fala = falas[-1]["end"]
+        if len(self._buffer) - fim_fala >= self.silence:
+            segmentos = await self.transcribe(self._buffer[:fim_fala])
+            evento = self._confirmar(_texto(segmentos), fim_fala)
+            return [evento] if evento else []
+
+        segmentos = await self.transcribe(self._buffer)
+        if len(self._buffer) >= self.window and len(segmentos) > 1:
+            corte = int(segmentos[-1].start * SAMPLE_RATE)
+            evento = self._confirmar(_texto(segmentos[:-1]), corte)
+            parcial = self._evento("partial", segmentos[-1].text.strip(), 0, len(self._buffer))
+            return [e for e in (evento, parcial) if e]
+        if len(self._buffer) >= self.window:
+            # Fala contínua sem fronteira de segmento: confirma a janela inteira
+            evento = self._confirmar(_texto(segmentos), len(self._buffer))
+            return [evento] if evento else []
+        return [self._evento("partial", _texto(segmentos), 0, len(self._buffer))]
+
+    async def flush(self) -> List[dict]:
+        """Fim da sessão: confirma o que restou na janela."""
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+        if not len(self._buffer):
+            return []
+        # Whisper alucina em silêncio puro: só transcreve se ainda houver fala
+        falas = await asyncio.to_thread(
+            get_speech_timestamps, self._buffer, VadOptions(min_silence_duration_ms=self.silence_ms)
+        )
+        if not falas:
+            return []
+        segmentos = await self.transcribe(self._buffer)
+        evento = self._confirmar(_texto(segmentos), len(self._buffer))
+        return [evento] if evento else []
+
+    @property
+    def transcript(self) -> str:
+        return " ".join(self.finals)
@@ -0,0 +1,225 @@
+# long_audio.py
+"""
+Transcrição de áudios longos (entrevistas de 30-60 min) em trechos paralelos.
+
+1. O VAD (Silero, o mesmo do faster-whisper) percorre o áudio decodificado em blocos
+   (16 kHz mono, PyAV) e marca os intervalos de fala; eles são agrupados em trechos de
+   até LONG_AUDIO_CHUNK_SECONDS, sempre cortando em silêncio. Os silêncios longos entre
+   trechos ficam de fora.
+2. O arquivo é decodificado de novo, em sequência, e cada trecho vai para uma vaga do
+   `WhisperPool` assim que seu áudio fica pronto. Só os trechos em transcrição ficam na
+   memória, nunca o áudio inteiro (~230 MB por hora em float32).
+3. Cada trecho é entregue assim que termina, fora de ordem, com o índice e os tempos
+   no áudio original.
+"""
+import os
+import asyncio
+import itertools
+from typing import AsyncIterator, BinaryIO, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SAMPLE_RATE = 16000
+
+LONG_AUDIO_CHUNK_SECONDS = float(os.getenv("LONG_AUDIO_CHUNK_SECONDS", "30"))
+LONG_AUDIO_MAX_SECONDS = float(os.getenv("LONG_AUDIO_MAX_SECONDS", "7200"))
+# Silêncio mínimo (ms) que separa dois intervalos de fala no VAD
+LONG_AUDIO_MIN_SILENCE_MS = int(os.getenv("LONG_AUDIO_MIN_SILENCE_MS", "500"))
+# Idioma fixo evita a detecção em cada trecho (ex.: "pt"); vazio = detectar
+WHISPER_LANGUAGE = os.getenv("WHISPER_LANGUAGE") or None
+# Tamanho dos blocos decodificados de cada vez no VAD (5 min = ~19 MB em float32)
+VAD_BLOCK_SECONDS = 300
+
+
+AudioSource = Union[str, BinaryIO]
+
+
+def iter_audio(source: AudioSource, block_seconds: float) -> Iterator[np.ndarray]:
+    """
+    Decodifica o arquivo (caminho ou arquivo aberto, lido desde o início) em blocos
+    consecutivos de `block_seconds` (o último pode ser menor), em float32 16 kHz mono,
+    como o `decode_audio` do faster-whisper.
+    """
+    import av
+
+    if hasattr(source, "seek"):
+        source.seek(0)
+    bloco = int(block_seconds * SAMPLE_RATE)
+    resampler = av.audio.resampler.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+    partes: List[np.ndarray] = []
+    acumulado = 0
+    with av.open(source, mode="r", metadata_errors="ignore") as container:
+        frames = container.decode(audio=0)
+        while True:
+            try:
+                frame = next(frames)
+            except StopIteration:
+                frame = None
+            except av.error.InvalidDataError:
+                continue
+            for saida in resampler.resample(frame):
+                amostras = saida.to_ndarray().reshape(-1).astype(np.float32) / 32768.0
+                partes.append(amostras)
+                acumulado += len(amostras)
+                while acumulado >= bloco:
+                    dados = np.concatenate(partes)
+                    yield dados[:bloco]
+                    partes, acumulado = [dados[bloco:]], len(dados) - bloco
+            if frame is None:
+                break
+    if acumulado:
+        yield np.concatenate(partes)
+
+
+def plan_chunks(
+    source: AudioSource,
+    chunk_seconds: float = LONG_AUDIO_CHUNK_SECONDS,
+    min_silence_ms: int = LONG_AUDIO_MIN_SILENCE_MS,
+) -> List[Tuple[int, int]]:
+    """Retorna [(início, fim)] em amostras, agrupando a fala em trechos de até `chunk_seconds`."""
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    opcoes = VadOptions(min_silence_duration_ms=min_silence_ms, speech_pad_ms=200, max_speech_duration_s=chunk_seconds)
+    limite = int(chunk_seconds * SAMPLE_RATE)
+    margem = opcoes.speech_pad_ms * SAMPLE_RATE // 1000
+    falas: List[dict] = []
+    deslocamento = 0
+    for bloco in iter_audio(source, VAD_BLOCK_SECONDS):
+        for n, fala in enumerate(get_speech_timestamps(bloco, opcoes)):
+            inicio, fim = fala["start"] + deslocamento, fala["end"] + deslocamento
+            # Fala cortada na fronteira entre blocos: junta as duas metades
+            if (n == 0 and falas and fala["start"] <= margem and falas[-1]["end"] >= deslocamento - margem
+                    and fim - falas[-1]["start"] <= limite):
+                falas[-1]["end"] = fim
+            else:
+                falas.append({"start": inicio, "end": fim})
+        deslocamento += len(bloco)
+
+    trechos: List[Tuple[int, int]] = []
+    inicio = fim = None
+    for fala in falas:
+        if inicio is not None and fala["end"] - inicio > limite:
+            trechos.append((inicio, fim))
+            inicio = None
+        if inicio is None:
+            inicio = fala["start"]
+        fim = fala["end"]
+    if inicio is not None:
+        trechos.append((inicio, fim))
+    return trechos
+
+
+def iter_chunks(source: AudioSource, trechos: List[Tuple[int, int]]) -> Iterator[Tuple[int, int, int, np.ndarray]]:
+    """
+    Decodifica o arquivo em sequência e entrega (índice, início, fim, áudio) de cada
+    trecho assim que ele está completo. Guarda só o áudio a partir do próximo trecho.
+    """
+    pendentes = iter(enumerate(trechos))
+    atual = next(pendentes, None)
+    buffer = np.zeros(0, dtype=np.float32)
+    inicio_buffer = 0
+    for bloco in itertools.chain(iter_audio(source, LONG_AUDIO_CHUNK_SECONDS), [None]):
+        if bloco is not None:
+            buffer = np.concatenate([buffer, bloco])
+        fim_buffer = inicio_buffer + len(buffer)
+        # No fim do arquivo, entrega o que houver (o VAD pode arredondar o último fim)
+        while atual is not None and (bloco is None or atual[1][1] <= fim_buffer):
+            i, (a, b) = atual
+            yield i, a, b, buffer[max(0, a - inicio_buffer):max(0, b - inicio_buffer)].copy()
+            atual = next(pendentes, None)
+        if atual is None:
+            return
+        descarte = min(max(0, atual[1][0] - inicio_buffer), len(buffer))
+        buffer, inicio_buffer = buffer[descarte:], inicio_buffer + descarte
+
+
+async def transcribe_chunks(
+    pool,
+    source: AudioSource,
+    trechos: List[Tuple[int, int]],
+    language: Optional[str] = WHISPER_LANGUAGE,
+) -> AsyncIterator[dict]:
+    """
+    Decodifica cada trecho do arquivo e o transcreve no pool, entregando
+    {"index", "start", "end", "text"} na ordem em que terminam. No máximo
+    `pool.pool_size` trechos deste áudio ficam pendentes (e na memória) por vez, para
+    não tomar a fila de outros pedidos.
+    """
+    limite = asyncio.Semaphore(pool.pool_size)
+    resultados: asyncio.Queue = asyncio.Queue()
+    tarefas: List[asyncio.Task] = []
+
+    async def transcrever(i: int, a: int, b: int, audio: np.ndarray):
+        try:
+            texto = ""
+            if len(audio):
+                segments, _ = await pool.transcribe(audio, queue_limit=False, vad_filter=False, language=language)
+                texto = " ".join(seg.text.strip() for seg in segments).strip()
+            await resultados.put({
+                "index": i,
+                "start": round(a / SAMPLE_RATE, 2),
+                "end": round(b / SAMPLE_RATE, 2),
+                "text": texto,
+            })
+        except Exception as e:
+            await resultados.put(e)
+        finally:
+            limite.release()
+
+    async def produzir():
+        # A decodificação roda em thread, um trecho por vez, só quando há vaga livre
+        audios = iter_chunks(source, trechos)
+        try:
+            while True:
+                await limite.acquire()
+                proximo = await asyncio.to_thread(next, audios, None)
+                if proximo is None:
+                    limite.release()
+                    return
+                tarefas.append(asyncio.create_task(transcrever(*proximo)))
+        except Exception as e:
+            await resultados.put(e)
+
+    produtor = asyncio.create_task(produzir())
+    try:
+        for _ in trechos:
+            resultado = await resultados.get()
+            if isinstance(resultado, Exception):
+                raise resultado
+            yield resultado
+    finally:
+        # Cliente desconectou ou houve erro: não deixa trechos rodando à toa
+        produtor.cancel()
+        for tarefa in tarefas:
+            tarefa.cancel()
+
+
+class TranscriptAssembler:
+    """Junta trechos que chegam fora de ordem; `prefix` é o texto contínuo já disponível."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.textos: dict = {}
+        self._prefixo = 0
+
+    def add(self, index: int, text: str) -> bool:
+        """Registra o trecho; True se o prefixo contínuo cresceu."""
+        self.textos[index] = text
+        anterior = self._prefixo
+        while self._prefixo in self.textos:
+            self._prefixo += 1
+        return self._prefixo > anterior
+
+    @property
+    def prefix(self) -> str:
+        return " ".join(t for t in (self.textos[i] for i in range(self._prefixo)) if t)
+
+    @property
+    def complete(self) -> bool:
+        return len(self.textos) == self.total
+
+    def text(self) -> str:
+        return " ".join(t for t in (self.textos[i] for i in sorted(self.textos)) if t)
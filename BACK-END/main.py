@@ -1,25 +1,36 @@
 # main.py
-import os, re, tempfile, json, subprocess, asyncio, traceback, logging, sys, uvicorn
-from typing import List, Tuple, Optional
+import os, re, json, hashlib, asyncio, traceback, logging, sys, uvicorn
+from typing import List, Tuple, Optional, Union
 from dotenv import load_dotenv
-from database import SessionLocal, init_db, User, Chat, Message
-from faster_whisper import WhisperModel
-from jira import JIRA, JIRAError
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
+from database import SessionLocal, async_engine, init_db
+from fastapi import FastAPI, HTTPException, UploadFile, File, Header, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, JSONResponse
 from io import BytesIO
 from fastapi.middleware.cors import CORSMiddleware
-from functools import lru_cache
 from pathlib import Path
 from datetime import datetime, timedelta
 from llm import get_llm
+from embedding_cache import build_embeddings
+from lexical_index import HybridRetriever, index_path
+from context_budget import assemble_context, compact_history, estimate_tokens
+from admission import AdmissionController, parse_limits
+from jira_gateway import get_jira_gateway
+from jira_outbox import (
+    ItemResult, OutboxWorkerPool, PermanentError, enqueue, batch_status, batch_sprint, set_batch_sprint, new_batch_id, item_idempotency_key
+)
+from rag_cache import RAGResponseCache, make_cache_key, RAG_CACHE_ENABLED
+from startup import StartupOrchestrator
+from whisper_pool import WhisperPool, WhisperPoolBusy
+from auth import check_session_secret
+from chat_api import router as chat_router, password_hasher
+from long_audio import (
+    SAMPLE_RATE, LONG_AUDIO_MAX_SECONDS, WHISPER_LANGUAGE, TranscriptAssembler, plan_chunks, transcribe_chunks
+)
+from live_transcription import LIVE_MAX_SECONDS, LiveTranscriber, create_decoder
 from sprint import replan_tasks_with_gemini, generate_tasks_with_gemini
 
-
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import A4
+# faster_whisper, reportlab, jira e langchain_chroma são importados só quando usados
 
 logger = logging.getLogger("assistente-rag")
 logger.setLevel(logging.INFO)
@@ -30,15 +41,9 @@ handler.setFormatter(formatter)
 if not logger.hasHandlers():
     logger.addHandler(handler)
 
-MAX_CONCURRENT_ISSUES = 5
-semaphore = asyncio.Semaphore(MAX_CONCURRENT_ISSUES)
 
 # --- Importações Langchain (conforme seu ambiente atual) ---
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
-from langchain_classic.chains import RetrievalQA
 
 # ------------------ Config & Logging ------------------
 logging.basicConfig(
@@ -64,16 +69,50 @@ PATH_VECTOR_DB = os.getenv("PATH_VECTOR_DB", "chroma_db")
 EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
 LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "gemini-flash-latest")
 RAG_RETRIEVER_K = int(os.getenv("RAG_RETRIEVER_K", "6"))
+RAG_QUERY_MAX_CHARS = int(os.getenv("RAG_QUERY_MAX_CHARS", "1000"))
+# "hybrid" (BM25 + denso, requer o índice gerado pelo ingest.py) ou "dense"
+RAG_RETRIEVER_MODE = os.getenv("RAG_RETRIEVER_MODE", "hybrid")
+RAG_HYBRID_FETCH_K = int(os.getenv("RAG_HYBRID_FETCH_K", "20"))
 MAX_AUDIO_SECONDS = float(os.getenv("MAX_AUDIO_SECONDS", "120.0"))
-WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "base")
+# Limite de tamanho dos uploads de áudio (verificado durante a cópia para o disco)
+AUDIO_UPLOAD_MAX_MB = float(os.getenv("AUDIO_UPLOAD_MAX_MB", "25"))
+LONG_AUDIO_UPLOAD_MAX_MB = float(os.getenv("LONG_AUDIO_UPLOAD_MAX_MB", "500"))
+# Folga para os cabeçalhos do multipart ao comparar o corpo com o limite do arquivo
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
 EMBEDDINGS_DEVICE = os.getenv("EMBEDDINGS_DEVICE", "cpu")
-WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "cpu")
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "torch")
+# Carrega o Whisper em segundo plano na inicialização (senão, no primeiro /audio_chat)
+WHISPER_PRELOAD = os.getenv("WHISPER_PRELOAD", "true").lower() in ("1", "true", "yes")
+# Inferência de teste em cada modelo depois de carregado
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() in ("1", "true", "yes")
+# Máximo de issues por requisição de bulk create (limite do Jira Cloud: 50)
+JIRA_BULK_CREATE_LIMIT = int(os.getenv("JIRA_BULK_CREATE_LIMIT", "50"))
+# Respostas 4xx do bulk create que não adianta repetir (401/403/408/409/429 são repetidas)
+JIRA_PERMANENT_STATUS = {400, 404, 405, 413, 422}
+# Requisições simultâneas ao Jira: limite global e limites por endpoint
+JIRA_MAX_CONCURRENCY = int(os.getenv("JIRA_MAX_CONCURRENCY", "5"))
+JIRA_ENDPOINT_LIMITS = parse_limits(
+    os.getenv("JIRA_ENDPOINT_LIMITS", "approve=4,sprint=2,sprint_issues=4,add_to_sprint=2")
+)
+# Outbox do Jira: workers, tentativas e quanto tempo o request espera o lote por padrão
+JIRA_OUTBOX_WORKERS = int(os.getenv("JIRA_OUTBOX_WORKERS", "2"))
+JIRA_OUTBOX_MAX_ATTEMPTS = int(os.getenv("JIRA_OUTBOX_MAX_ATTEMPTS", "8"))
+JIRA_OUTBOX_WAIT_SECONDS = float(os.getenv("JIRA_OUTBOX_WAIT_SECONDS", "20"))
+# Grava a chave de idempotência como label da issue para não duplicar em retentativas
+JIRA_IDEMPOTENCY_LABELS = os.getenv("JIRA_IDEMPOTENCY_LABELS", "true").lower() in ("1", "true", "yes")
+# Tempo máximo esperando a sprint recém-criada ficar disponível antes de iniciá-la
+JIRA_SPRINT_READY_TIMEOUT = float(os.getenv("JIRA_SPRINT_READY_TIMEOUT", "10"))
+# Quanto tempo as tasks criadas esperam a sprint do lote ser definida (o request pode
+# ter caído antes); depois disso ficam no backlog
+JIRA_OUTBOX_SPRINT_WAIT_SECONDS = float(os.getenv("JIRA_OUTBOX_SPRINT_WAIT_SECONDS", "300"))
 
 # --- Validação básica das credenciais obrigatórias ---
 if not GOOGLE_API_KEY:
     raise EnvironmentError("GOOGLE_API_KEY não encontrada no .env")
 if not all([JIRA_URL, JIRA_USERNAME, JIRA_API_TOKEN, JIRA_PROJECT_KEY]):
     raise EnvironmentError("Credenciais do JIRA não encontradas no .env")
+# Sem SESSION_SECRET válido os tokens de sessão seriam forjáveis ou só valeriam num worker
+check_session_secret()
 
 # --- Prompts ---
 PROMPT_ANALISTA_OCULTO_TEMPLATE = """
@@ -230,72 +269,86 @@ Gere um texto formal, objetivo e claro, sem listas genéricas. Organize com subt
 embeddings_model = None
 vector_db = None
 llm = None
-qa_chain = None
-whisper_model = None
+retriever = None
+rag_prompt = None
+whisper_pool = WhisperPool()
+rag_cache = RAGResponseCache(path_vector_db=PATH_VECTOR_DB) if RAG_CACHE_ENABLED else None
+# Toda chamada ao Jira passa por aqui (approve, criação/início de sprint, issues e add-to-sprint)
+jira_admission = AdmissionController(JIRA_MAX_CONCURRENCY, JIRA_ENDPOINT_LIMITS)
 
 # ------------------ Pydantic Models ------------------
-class UserCreate(BaseModel):
-    name: str
-    email: str
-    password: str
-
-class UserLogin(BaseModel):
-    email: str
-    password: str
-
-class ChatMessageCreate(BaseModel):
-    user_id: int
-    content: str
-    sender: str = "user"
-    chat_id: Optional[int] = None
-
 class DocumentRequest(BaseModel):
     client_request: str
     requirements: str
 
-class DocumentResponse(BaseModel):
-    file_name: str
-    file_path: str
-
 # ------------------ DEPENDENCY ------------------
 
 init_db()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # ------------------ Helpers & Utilities ------------------
 
 def safe_print_exception(prefix: str, exc: Exception):
     logger.error("%s: %s", prefix, exc)
     logger.debug(traceback.format_exc())
 
-@lru_cache(maxsize=1)
-def get_jira_client_cached() -> JIRA:
-    """Retorna um cliente JIRA cacheado."""
-    logger.info("Criando cliente JIRA (cacheado).")
-    return JIRA(server=JIRA_URL, basic_auth=(JIRA_USERNAME, JIRA_API_TOKEN), 
-                options={'max_retries': 3, 'pool_connections': 60, 'pool_maxsize': 60})
+def get_jira_client():
+    """Cliente JIRA compartilhado do gateway (pool de conexões e rate limit únicos)."""
+    return get_jira_gateway().client
 
-def create_jira_issue_sync(issue_dict: dict) -> Tuple[Optional[str], Optional[str]]:
+def erro_jira(e: Exception) -> Union[str, PermanentError]:
     """
-    Função síncrona que cria issue no Jira. Retorna (key, title) ou (None, None) em erro.
+    Mensagem de erro de uma chamada ao Jira para o outbox: `PermanentError` para os
+    status de JIRA_PERMANENT_STATUS; os demais (5xx, 429, rede) são repetidos com backoff.
+    """
+    status = getattr(e, "status_code", None)
+    erro = f"JIRAError status={status or ''}: {getattr(e, 'text', '') or e}"
+    return PermanentError(erro) if status in JIRA_PERMANENT_STATUS else erro
+
+def create_jira_issues_bulk_sync(issue_dicts: List[dict], jira_client=None) -> List[Tuple[Optional[str], Optional[Union[str, PermanentError]]]]:
+    """
+    Cria várias issues pelo endpoint de bulk create do Jira (`create_issues`), em lotes de
+    até JIRA_BULK_CREATE_LIMIT. Retorna, na mesma ordem da entrada, (key, None) para cada
+    issue criada ou (None, erro) para cada falha. Erros de validação do Jira voltam
+    como `PermanentError` (o outbox não tenta de novo).
     Executada em thread separado via asyncio.to_thread.
     """
-    try:
-        jira_client = get_jira_client_cached()
-        new_issue = jira_client.create_issue(fields=issue_dict)
-        return new_issue.key, issue_dict.get("summary", "")
-    except JIRAError as e:
-        logger.error("JIRAError ao criar issue: status=%s text=%s", getattr(e, "status_code", ""), getattr(e, "text", ""))
-        return None, None
-    except Exception as e:
-        safe_print_exception("Erro geral ao criar issue JIRA", e)
-        return None, None
+    from jira import JIRAError
+    jira_client = jira_client or get_jira_client()
+    resultados: List[Tuple[Optional[str], Optional[Union[str, PermanentError]]]] = []
+    for inicio in range(0, len(issue_dicts), JIRA_BULK_CREATE_LIMIT):
+        lote = issue_dicts[inicio:inicio + JIRA_BULK_CREATE_LIMIT]
+        try:
+            itens = jira_client.create_issues(field_list=lote, prefetch=False)
+        except JIRAError as e:
+            # O Jira responde 400 quando todos os itens do lote falham
+            erro = erro_jira(e)
+            logger.error("Falha no bulk create (%d issues): %s", len(lote), erro)
+            resultados.extend((None, erro) for _ in lote)
+            continue
+        except Exception as e:
+            safe_print_exception("Erro geral no bulk create JIRA", e)
+            resultados.extend((None, str(e)) for _ in lote)
+            continue
+        for item in itens:
+            if item.get("status") == "Success" and item.get("issue") is not None:
+                resultados.append((item["issue"].key, None))
+            else:
+                # Erro por item no bulk create é sempre de validação (campo inválido etc.)
+                resultados.append((None, PermanentError(item.get("error") or "Erro desconhecido")))
+    return resultados
+
+async def create_jira_issues_bulk(issue_dicts: List[dict], endpoint: str, jira_client=None) -> List[Tuple[Optional[str], Optional[Union[str, PermanentError]]]]:
+    """
+    Divide as issues em lotes de JIRA_BULK_CREATE_LIMIT e envia cada lote em paralelo,
+    respeitando o controle de admissão do `endpoint`. Mantém a ordem da entrada.
+    """
+    async def enviar_lote(lote):
+        async with jira_admission.slot(endpoint):
+            return await run_blocking_in_thread(create_jira_issues_bulk_sync, lote, jira_client)
+
+    lotes = [issue_dicts[i:i + JIRA_BULK_CREATE_LIMIT] for i in range(0, len(issue_dicts), JIRA_BULK_CREATE_LIMIT)]
+    resultados = await asyncio.gather(*(enviar_lote(lote) for lote in lotes))
+    return [item for lote in resultados for item in lote]
 
 def normalize_text_output(text: str) -> str:
     """
@@ -326,32 +379,148 @@ def run_blocking_in_thread(func, *args, **kwargs):
     """Helper para executar I/O/blocking em thread sem bloquear o loop principal."""
     return asyncio.to_thread(func, *args, **kwargs)
 
-def get_audio_duration(path: str) -> float:
-    """Retorna a duração em segundos usando ffprobe (síncrono)."""
-    cmd = [
-        "ffprobe",
-        "-v", "quiet",
-        "-print_format", "json",
-        "-show_format",
-        path
+# ------------------ Streaming (SSE) ------------------
+
+def sse_event(event: str, data) -> str:
+    """Formata um evento Server-Sent Events com payload JSON."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+def _chunk_text(chunk) -> str:
+    """Extrai o texto de um AIMessageChunk (content pode ser str ou lista de partes)."""
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(p.get("text", "") if isinstance(p, dict) else str(p) for p in content)
+    return str(content or "")
+
+def build_retrieval_query(*parts: str) -> str:
+    """
+    Monta a consulta de recuperação só com o texto do usuário (sem o template fixo de
+    instruções), limitada a RAG_QUERY_MAX_CHARS para não embutir entrevistas inteiras.
+    """
+    query = "\n".join(p.strip() for p in parts if p and p.strip())
+    return query[:RAG_QUERY_MAX_CHARS]
+
+async def retrieve_context(
+    query: str,
+    retrieval_query: Optional[str] = None,
+    info: Optional[dict] = None
+) -> Tuple[list, str]:
+    """
+    Recupera os chunks e monta o prompt "stuff" com RAG_TEMPLATE.
+    `retrieval_query` é o texto embutido no retriever; as instruções fixas de `query`
+    só entram na montagem do prompt. O contexto passa pelo budgeter (merge de vizinhos,
+    deduplicação e orçamento de tokens); o relatório vai para info["context"].
+    """
+    docs = await retriever.ainvoke(retrieval_query or query)
+    contexto, relatorio = assemble_context(docs)
+    logger.info(
+        "Contexto RAG: %d/%d chunks, %d tokens (economia de %d).",
+        relatorio["chunks_used"], relatorio["chunks_retrieved"],
+        relatorio["context_tokens"], relatorio["tokens_saved"]
+    )
+    prompt = rag_prompt.format(context=contexto, question=query)
+    if info is not None:
+        info["context"] = relatorio
+        info["prompt_tokens"] = estimate_tokens(prompt)
+    return docs, prompt
+
+def rag_cache_key(query: str, docs: list) -> str:
+    chunk_ids = [
+        doc.id or hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+        for doc in docs
     ]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    if result.returncode != 0:
-        raise Exception("Não foi possível ler informações do áudio via ffprobe.")
-    data = json.loads(result.stdout)
-    return float(data["format"]["duration"])
-
-def get_whisper():
-    """Inicializa e retorna (cache) o modelo Whisper local."""
-    global whisper_model
-    if whisper_model is None:
-        whisper_model = WhisperModel(
-            WHISPER_MODEL_SIZE,
-            device=WHISPER_DEVICE,
-            compute_type="float32"
-        )
-        logger.info("Whisper carregado: %s", WHISPER_MODEL_SIZE)
-    return whisper_model
+    return make_cache_key(
+        query,
+        getattr(llm, "model", LLM_MODEL_NAME),
+        getattr(llm, "temperature", None),
+        chunk_ids
+    )
+
+async def invoke_rag(query: str, retrieval_query: Optional[str] = None, info: Optional[dict] = None) -> str:
+    """
+    Fluxo RAG: recupera o contexto, consulta o cache de respostas e só
+    chama o LLM em caso de miss. Se `info` for passado, recebe o relatório de contexto.
+    """
+    docs, prompt = await retrieve_context(query, retrieval_query, info)
+    key = rag_cache_key(query, docs) if rag_cache else None
+    if key:
+        cached = await run_blocking_in_thread(rag_cache.get, key)
+        if cached is not None:
+            logger.info("Resposta RAG servida do cache.")
+            return cached
+    resposta = await run_blocking_in_thread(llm.invoke, prompt)
+    texto = _chunk_text(resposta)
+    if key:
+        await run_blocking_in_thread(rag_cache.set, key, texto)
+    return texto
+
+async def stream_rag_answer(query: str, retrieval_query: Optional[str] = None, info: Optional[dict] = None):
+    """
+    Equivalente em streaming de invoke_rag: repassa os tokens à medida que o LLM os
+    emite. Em caso de hit no cache, a resposta inteira é emitida de uma vez.
+    """
+    docs, prompt = await retrieve_context(query, retrieval_query, info)
+    key = rag_cache_key(query, docs) if rag_cache else None
+    if key:
+        cached = await run_blocking_in_thread(rag_cache.get, key)
+        if cached is not None:
+            logger.info("Resposta RAG (stream) servida do cache.")
+            yield cached
+            return
+    partes = []
+    async for chunk in llm.astream(prompt):
+        texto = _chunk_text(chunk)
+        if texto:
+            partes.append(texto)
+            yield texto
+    if key:
+        await run_blocking_in_thread(rag_cache.set, key, "".join(partes))
+
+def extrair_user_stories(text: str) -> List[dict]:
+    """Valida a saída do LLM e retorna a lista de user stories (vazia se o JSON for inválido)."""
+    data = extract_json(text or "")
+    if not isinstance(data, dict):
+        return []
+    stories = data.get("user_stories", [])
+    return stories if isinstance(stories, list) else []
+
+def sse_response(generator) -> StreamingResponse:
+    return StreamingResponse(
+        generator,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def get_audio_duration(source) -> float:
+    """
+    Duração em segundos lida no próprio processo com o PyAV (o decoder do faster-whisper):
+    primeiro pelos cabeçalhos do container/stream; se não houver, decodificando e
+    contando as amostras. `source` é um caminho ou um arquivo aberto.
+    """
+    import av
+
+    if hasattr(source, "seek"):
+        source.seek(0)
+    try:
+        with av.open(source, mode="r") as container:
+            if container.duration:
+                return container.duration / av.time_base
+            stream = next((st for st in container.streams if st.type == "audio"), None)
+            if stream is None:
+                raise ValueError("arquivo sem trilha de áudio")
+            if stream.duration and stream.time_base:
+                return float(stream.duration * stream.time_base)
+            amostras = sum(frame.samples for frame in container.decode(stream))
+            return amostras / stream.rate
+    except av.error.FFmpegError as e:
+        raise ValueError(f"Não foi possível ler informações do áudio: {e}") from e
+
+async def aguardar_whisper():
+    """Se o Whisper está carregando em segundo plano, espera; senão o pool carrega na primeira transcrição."""
+    if "whisper" in startup_orchestrator.components:
+        await startup_orchestrator.wait_for("whisper")
 
 # ------------------ Modelos Pydantic (mantidos como antes) ------------------
 
@@ -373,15 +542,22 @@ class ApproveRequest(BaseModel):
 class AnalysisResponse(BaseModel):
     generated_requirements: str
     history: List[ChatMessage]
+    context_report: Optional[dict] = None
+    prompt_tokens: Optional[int] = None
 
 class RefineResponse(BaseModel):
     refined_requirements: str
     history: List[ChatMessage]
+    context_report: Optional[dict] = None
+    history_report: Optional[dict] = None
+    prompt_tokens: Optional[int] = None
 
 class ApproveResponse(BaseModel):
     message: str
     created_tickets: List[dict]
     invalid_requirements: list[dict] | None = None
+    batch_id: Optional[str] = None
+    pending: int = 0
 
 # ------------------ FastAPI App & CORS ------------------
 
@@ -397,6 +573,44 @@ origins = [
     "http://localhost:3000",
 ]
 
+class UploadLimitMiddleware:
+    """
+    Recusa com 413 os uploads acima do limite da rota antes de o Starlette gravar o
+    corpo em disco: pelo Content-Length, quando informado, ou contando os bytes
+    recebidos (uploads chunked). `limits` mapeia caminho -> bytes.
+    """
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limite = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limite is None:
+            return await self.app(scope, receive, send)
+        detalhe = f"Arquivo maior que o limite de {limite / (1024 * 1024):.0f} MB."
+        tamanho = dict(scope["headers"]).get(b"content-length", b"")
+        if tamanho.isdigit() and int(tamanho) > limite + MULTIPART_OVERHEAD_BYTES:
+            return await JSONResponse({"detail": detalhe}, status_code=413)(scope, receive, send)
+
+        recebidos = 0
+
+        async def receive_limitado():
+            nonlocal recebidos
+            mensagem = await receive()
+            if mensagem["type"] == "http.request":
+                recebidos += len(mensagem.get("body", b""))
+                if recebidos > limite + MULTIPART_OVERHEAD_BYTES:
+                    raise HTTPException(status_code=413, detail=detalhe)
+            return mensagem
+
+        await self.app(scope, receive_limitado, send)
+
+app.add_middleware(UploadLimitMiddleware, limits={
+    "/audio_chat": int(AUDIO_UPLOAD_MAX_MB * 1024 * 1024),
+    "/audio_chat/long": int(LONG_AUDIO_UPLOAD_MAX_MB * 1024 * 1024),
+})
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -406,16 +620,6 @@ app.add_middleware(
 )
 
 
-# --- Função para extrair palavra-chave contextual ---
-def extrair_palavra_chave(texto: str) -> str:
-    """
-    Tenta capturar algo como:
-    - 'sistema de vendas' → 'vendas'
-    - 'aplicativo de pedidos' → 'pedidos'
-    """
-    match = re.search(r"\b(sistema|plataforma|app|aplicativo|dashboard)\s+de\s+(\w+)", texto, re.IGNORECASE)
-    return match.group(2).lower() if match else "projeto"
-
 # --- Função para gerar o PDF ---
 def clean_text_for_pdf(text: str) -> str:
     cleaned = text
@@ -451,6 +655,10 @@ def clean_text_for_pdf(text: str) -> str:
     return cleaned.strip()
 
 def gerar_pdf(conteudo: str, caminho: str):
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.pagesizes import A4
+
     styles = getSampleStyleSheet()
     doc = SimpleDocTemplate(caminho, pagesize=A4)
     story = []
@@ -467,17 +675,18 @@ def _validate_vector_db_path(path: str):
     if not Path(path).exists():
         raise FileNotFoundError(f"Diretório ChromaDB '{path}' não encontrado. Execute ingest.py primeiro.")
 
-def load_models_and_chain():
-    """
-    Carrega embeddings, vector DB, LLM e a cadeia RAG.
-    Executado na inicialização do app.
-    """
-    global embeddings_model, vector_db, llm, qa_chain
+def carregar_embeddings():
+    global embeddings_model
     logger.info("Carregando modelo de embeddings local...")
-    embeddings_model = HuggingFaceEmbeddings(
-        model_name=EMBEDDING_MODEL_NAME,
-        model_kwargs={'device': EMBEDDINGS_DEVICE}
-    )
+    embeddings_model = build_embeddings(EMBEDDING_MODEL_NAME, device=EMBEDDINGS_DEVICE, backend=EMBEDDINGS_BACKEND)
+
+def aquecer_embeddings():
+    # Direto no modelo: o cache de embeddings pularia a inferência
+    getattr(embeddings_model, "underlying", embeddings_model).embed_query("aquecimento do modelo")
+
+def carregar_vector_db():
+    global vector_db
+    from langchain_chroma import Chroma
 
     logger.info("Validando VectorDB em %s", PATH_VECTOR_DB)
     _validate_vector_db_path(PATH_VECTOR_DB)
@@ -488,85 +697,268 @@ def load_models_and_chain():
         embedding_function=embeddings_model
     )
 
-    logger.info("Inicializando LLM: %s", LLM_MODEL_NAME)
-    llm = get_llm() 
+def aquecer_vector_db():
+    vector_db.similarity_search("aquecimento", k=1)
 
-    retriever = vector_db.as_retriever(search_kwargs={"k": RAG_RETRIEVER_K})
+def carregar_llm():
+    global llm
+    logger.info("Inicializando LLM: %s", LLM_MODEL_NAME)
+    llm = get_llm()
+
+def montar_cadeia_rag():
+    """Retriever (híbrido ou denso) e prompt do RAG; depende do VectorDB e do LLM."""
+    global retriever, rag_prompt
+
+    if RAG_RETRIEVER_MODE == "hybrid" and Path(index_path(PATH_VECTOR_DB)).exists():
+        logger.info("Usando retriever híbrido (BM25 + denso).")
+        retriever = HybridRetriever(
+            vector_db=vector_db,
+            index_file=index_path(PATH_VECTOR_DB),
+            k=RAG_RETRIEVER_K,
+            fetch_k=RAG_HYBRID_FETCH_K
+        )
+    else:
+        if RAG_RETRIEVER_MODE == "hybrid":
+            logger.warning("Índice BM25 não encontrado; usando apenas busca densa. Execute ingest.py.")
+        retriever = vector_db.as_retriever(search_kwargs={"k": RAG_RETRIEVER_K})
     rag_prompt = PromptTemplate(template=RAG_TEMPLATE, input_variables=["context", "question"])
-    qa_chain = RetrievalQA.from_chain_type(
-        llm=llm,
-        chain_type="stuff",
-        retriever=retriever,
-        return_source_documents=False,
-        chain_type_kwargs={"prompt": rag_prompt}
-    )
     logger.info("Modelos e cadeia RAG carregados com sucesso!")
 
+def rag_pronto() -> bool:
+    """Retriever, prompt e LLM carregados (invoke_rag/stream_rag_answer podem rodar)."""
+    return retriever is not None and rag_prompt is not None and llm is not None
+
+def aquecer_cadeia_rag():
+    # Carrega o índice BM25 (retriever híbrido) e exercita a busca completa
+    retriever.invoke("aquecimento")
+
+startup_orchestrator = StartupOrchestrator(warmup=STARTUP_WARMUP)
+startup_orchestrator.register("embeddings", carregar_embeddings, aquecer_embeddings)
+startup_orchestrator.register("vector_db", carregar_vector_db, aquecer_vector_db, depends_on=["embeddings"])
+startup_orchestrator.register("llm", carregar_llm)
+startup_orchestrator.register("rag_chain", montar_cadeia_rag, aquecer_cadeia_rag, depends_on=["vector_db", "llm"])
+if WHISPER_PRELOAD:
+    startup_orchestrator.register("whisper", whisper_pool.load, whisper_pool.warmup, required=False)
+
 # ------------------ Rotas (mantidas) ------------------
 
 @app.on_event("startup")
 async def startup_event():
-    """Executa a carga de modelos na inicialização (bloqueante - sucinta)."""
-    try:
-        load_models_and_chain()
-    except Exception as e:
-        safe_print_exception("Erro ao iniciar models/chain", e)
-        # Não aborta o processo inteiro: mantem a app no ar para health check.
-        # Endpoints que dependem da cadeia irão checar qa_chain e retornar 503.
-        logger.warning("Inicialização incompleta; alguns endpoints podem retornar 503.")
+    """
+    Dispara a carga dos modelos em segundo plano e libera o servidor na hora.
+    Até a cadeia ficar pronta, os endpoints que dependem dela retornam 503.
+    """
+    startup_orchestrator.start()
+
+@app.get("/health/live")
+async def health_live():
+    """O processo está de pé (não depende dos modelos)."""
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def health_ready():
+    """Estado e tempos de carga/aquecimento de cada componente; 503 até os obrigatórios ficarem prontos."""
+    report = startup_orchestrator.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
 
 @app.get("/")
 async def read_root():
     return {"message": "API do Assistente RAG está online! Acesse /docs para interagir."}
 
+@app.get("/jira/admission/stats")
+async def jira_admission_stats():
+    """Fila, concorrência e tempo de espera das chamadas ao Jira por endpoint."""
+    return jira_admission.stats()
+
+@app.get("/jira/gateway/stats")
+async def jira_gateway_stats():
+    """Rate limiter e histogramas de latência das requisições HTTP ao Jira por endpoint."""
+    return get_jira_gateway().stats()
+
+@app.get("/whisper/stats")
+async def whisper_stats():
+    """Vagas, fila, rejeições (429) e tempo médio das transcrições do pool Whisper."""
+    return whisper_pool.stats()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Contadores de hit/miss do cache de respostas RAG."""
+    if not rag_cache:
+        return {"enabled": False}
+    return rag_cache.stats()
+
+def refine_retrieval_query(request: RefineRequest) -> str:
+    """Consulta de recuperação do refinamento: solicitação original do cliente + nova instrução."""
+    solicitacao_original = next((m.content for m in request.history if m.role == "user"), "")
+    return build_retrieval_query(solicitacao_original, request.instruction)
+
 @app.post("/start_analysis", response_model=AnalysisResponse)
 async def start_analysis(request: AnalysisRequest):
-    if not qa_chain:
+    if not rag_pronto():
         raise HTTPException(status_code=503, detail="Cadeia RAG não inicializada.")
     logger.info("Recebida solicitação inicial: %s", (request.client_request[:120] + '...') if len(request.client_request) > 120 else request.client_request)
 
     prompt_completo = PROMPT_ANALISTA_OCULTO_TEMPLATE.replace("{solicitacao_cliente}", request.client_request)
     try:
         # invoke pode ser custoso - manter chamado síncrono via to_thread se necessário
-        resposta_rag = await run_blocking_in_thread(qa_chain.invoke, {"query": prompt_completo})
-        requisitos_gerados = normalize_text_output(resposta_rag.get("result", ""))
+        info = {}
+        resposta_rag = await invoke_rag(prompt_completo, build_retrieval_query(request.client_request), info)
+        requisitos_gerados = normalize_text_output(resposta_rag)
         history = [
             ChatMessage(role="user", content=request.client_request),
             ChatMessage(role="assistant", content=requisitos_gerados)
         ]
         logger.info("Análise inicial concluída.")
-        return AnalysisResponse(generated_requirements=requisitos_gerados, history=history)
+        return AnalysisResponse(
+            generated_requirements=requisitos_gerados,
+            history=history,
+            context_report=info.get("context"),
+            prompt_tokens=info.get("prompt_tokens")
+        )
     except Exception as e:
         safe_print_exception("Erro durante /start_analysis", e)
         raise HTTPException(status_code=500, detail=f"Erro ao processar análise inicial: {str(e)}")
 
 @app.post("/refine", response_model=RefineResponse)
 async def refine_requirements(request: RefineRequest):
-    if not qa_chain:
+    if not rag_pronto():
         raise HTTPException(status_code=503, detail="Cadeia RAG não inicializada.")
     logger.info("Recebida instrução de refinamento: %s", request.instruction[:120])
 
-    historico_formatado = "\n".join([f"{msg.role}: {msg.content}" for msg in request.history])
+    historico_formatado, relatorio_historico = compact_history(request.history)
+    logger.info(
+        "Histórico compactado: %d -> %d tokens (resumido=%s).",
+        relatorio_historico["full_history_tokens"], relatorio_historico["history_tokens"],
+        relatorio_historico["summarized"]
+    )
     prompt_completo = (
     REFINEMENT_PROMPT_TEMPLATE
         .replace("{historico_formatado}", historico_formatado)
         .replace("{instruction}", request.instruction)
     )
     try:
-        resposta_rag = await run_blocking_in_thread(qa_chain.invoke, {"query": prompt_completo})
-        requisitos_refinados = normalize_text_output(resposta_rag.get("result", ""))
+        info = {}
+        resposta_rag = await invoke_rag(prompt_completo, refine_retrieval_query(request), info)
+        requisitos_refinados = normalize_text_output(resposta_rag)
         new_history = request.history + [
             ChatMessage(role="user", content=request.instruction),
             ChatMessage(role="assistant", content=requisitos_refinados)
         ]
         logger.info("Refinamento concluído.")
-        return RefineResponse(refined_requirements=requisitos_refinados, history=new_history)
+        return RefineResponse(
+            refined_requirements=requisitos_refinados,
+            history=new_history,
+            context_report=info.get("context"),
+            history_report=relatorio_historico,
+            prompt_tokens=info.get("prompt_tokens")
+        )
     except Exception as e:
         safe_print_exception("Erro durante /refine", e)
         raise HTTPException(status_code=500, detail=f"Erro ao processar refinamento: {str(e)}")
 
+@app.post("/start_analysis/stream")
+async def start_analysis_stream(request: AnalysisRequest):
+    """
+    Versão SSE de /start_analysis: emite eventos `token` conforme o LLM gera a resposta
+    e um evento final `done` com as user stories validadas e o histórico atualizado.
+    """
+    if not rag_pronto():
+        raise HTTPException(status_code=503, detail="Cadeia RAG não inicializada.")
+    logger.info("Recebida solicitação inicial (stream): %s", request.client_request[:120])
+
+    return sse_response(eventos_analise_inicial(request.client_request, "/start_analysis/stream"))
+
+async def analise_inicial_stream(client_request: str, origem: str):
+    """
+    Análise inicial em streaming como pares (evento, dados): `token`, `done` ou `error`.
+    Compartilhada pelos fluxos SSE e pelo WebSocket de transcrição ao vivo.
+    """
+    prompt_completo = PROMPT_ANALISTA_OCULTO_TEMPLATE.replace("{solicitacao_cliente}", client_request)
+    partes = []
+    info = {}
+    try:
+        async for token in stream_rag_answer(prompt_completo, build_retrieval_query(client_request), info):
+            partes.append(token)
+            yield "token", {"text": token}
+        requisitos_gerados = normalize_text_output("".join(partes))
+        history = [
+            ChatMessage(role="user", content=client_request),
+            ChatMessage(role="assistant", content=requisitos_gerados)
+        ]
+        yield "done", {
+            "generated_requirements": requisitos_gerados,
+            "user_stories": extrair_user_stories(requisitos_gerados),
+            "history": [m.model_dump() for m in history],
+            "context_report": info.get("context"),
+            "prompt_tokens": info.get("prompt_tokens")
+        }
+        logger.info("Análise inicial (%s) concluída.", origem)
+    except Exception as e:
+        safe_print_exception(f"Erro durante {origem}", e)
+        yield "error", {"detail": f"Erro ao processar análise inicial: {str(e)}"}
+
+async def eventos_analise_inicial(client_request: str, origem: str):
+    """Versão SSE de analise_inicial_stream."""
+    async for evento, dados in analise_inicial_stream(client_request, origem):
+        yield sse_event(evento, dados)
+
+@app.post("/refine/stream")
+async def refine_requirements_stream(request: RefineRequest):
+    """Versão SSE de /refine (mesmos eventos de /start_analysis/stream)."""
+    if not rag_pronto():
+        raise HTTPException(status_code=503, detail="Cadeia RAG não inicializada.")
+    logger.info("Recebida instrução de refinamento (stream): %s", request.instruction[:120])
+
+    historico_formatado, relatorio_historico = compact_history(request.history)
+    logger.info(
+        "Histórico compactado: %d -> %d tokens (resumido=%s).",
+        relatorio_historico["full_history_tokens"], relatorio_historico["history_tokens"],
+        relatorio_historico["summarized"]
+    )
+    prompt_completo = (
+        REFINEMENT_PROMPT_TEMPLATE
+        .replace("{historico_formatado}", historico_formatado)
+        .replace("{instruction}", request.instruction)
+    )
+
+    async def eventos():
+        partes = []
+        info = {}
+        try:
+            async for token in stream_rag_answer(prompt_completo, refine_retrieval_query(request), info):
+                partes.append(token)
+                yield sse_event("token", {"text": token})
+            requisitos_refinados = normalize_text_output("".join(partes))
+            new_history = request.history + [
+                ChatMessage(role="user", content=request.instruction),
+                ChatMessage(role="assistant", content=requisitos_refinados)
+            ]
+            yield sse_event("done", {
+                "refined_requirements": requisitos_refinados,
+                "user_stories": extrair_user_stories(requisitos_refinados),
+                "history": [m.model_dump() for m in new_history],
+                "context_report": info.get("context"),
+                "history_report": relatorio_historico,
+                "prompt_tokens": info.get("prompt_tokens")
+            })
+            logger.info("Refinamento (stream) concluído.")
+        except Exception as e:
+            safe_print_exception("Erro durante /refine/stream", e)
+            yield sse_event("error", {"detail": f"Erro ao processar refinamento: {str(e)}"})
+
+    return sse_response(eventos())
+
 @app.post("/approve", response_model=ApproveResponse)
-async def approve_and_send_to_jira(request: ApproveRequest):
+async def approve_and_send_to_jira(
+    request: ApproveRequest,
+    wait: bool = True,
+    idempotency_key: Optional[str] = Header(None)
+):
+    """
+    Grava as user stories no outbox do Jira e retorna. Com `wait=true` (padrão) aguarda
+    até JIRA_OUTBOX_WAIT_SECONDS pelo lote; o que não terminar segue em background e
+    pode ser acompanhado em /jira/outbox/{batch_id}.
+    """
     logger.info("Recebida solicitação de aprovação (aprovar->Jira).")
 
     # Extrair lista de user stories do JSON
@@ -578,10 +970,8 @@ async def approve_and_send_to_jira(request: ApproveRequest):
         )
 
     solicitacao_original = request.original_request
-    tickets_criados = []
-    erros = []
 
-    async def criar_um_ticket(story: dict):
+    def montar_issue(story: dict) -> dict:
         titulo = story.get("title", "Requisito sem título")
         desc = (
             f"Solicitação Original do Cliente:\n{{quote}}\n{solicitacao_original}\n{{quote}}\n\n"
@@ -593,35 +983,29 @@ async def approve_and_send_to_jira(request: ApproveRequest):
             f"Prioridade: {story.get('priority', '')}\n"
             f"Estimate: {story.get('estimate', '')}"
         )
-        issue_dict = {
+        return {
             'project': {'key': JIRA_PROJECT_KEY},
             'summary': titulo,
             'description': desc,
             'issuetype': {'name': 'Story'},
         }
-        key, created_title = await run_blocking_in_thread(create_jira_issue_sync, issue_dict)
-        return key, created_title
-
-    # Criação paralela de tickets
-    async def sem_task(story):
-        async with asyncio.Lock():
-            return await criar_um_ticket(story)
-
-    tasks = [sem_task(story) for story in lista_de_requisitos]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-
-    for res in results:
-        if isinstance(res, Exception):
-            safe_print_exception("Erro ao criar ticket (gather)", res)
-            erros.append(str(res))
-        elif res is None:
-            erros.append("User story vazia")
-        else:
-            key, title = res
-            if key:
-                tickets_criados.append({"key": key, "title": title})
-            else:
-                erros.append(f"Falha ao criar ticket para: {title if title else 'sem título'}")
+
+    batch_id = new_batch_id(idempotency_key)
+    itens = [
+        {"ref_id": story.get("id"), "fields": com_label_idempotencia(montar_issue(story), batch_id, i)}
+        for i, story in enumerate(lista_de_requisitos)
+    ]
+    status = await enfileirar_e_aguardar(batch_id, "approve", itens, wait)
+
+    tickets_criados = [
+        {"key": item["issue_key"], "title": item["title"], "story_id": item["ref_id"]}
+        for item in status["items"] if item["status"] == "done"
+    ]
+    erros = [
+        {"story_id": item["ref_id"], "title": item["title"], "error": item["last_error"]}
+        for item in status["items"] if item["status"] == "failed"
+    ]
+    pendentes = status["counts"]["pending"] + status["counts"]["in_progress"]
 
     msg = f"Processo concluído com {len(tickets_criados)} tickets criados."
     if erros:
@@ -629,131 +1013,220 @@ async def approve_and_send_to_jira(request: ApproveRequest):
         logger.warning(msg)
     else:
         logger.info(msg)
-
-    return ApproveResponse(message=msg, created_tickets=tickets_criados)
+    if pendentes:
+        msg += f" {pendentes} tickets ainda em processamento (lote {batch_id})."
+
+    return ApproveResponse(
+        message=msg,
+        created_tickets=tickets_criados,
+        invalid_requirements=erros or None,
+        batch_id=batch_id,
+        pending=pendentes
+    )
 
 @app.post("/audio_chat")
 async def audio_chat(file: UploadFile = File(...)):
     if not file:
         raise HTTPException(status_code=400, detail="Nenhum arquivo enviado.")
+    try:
+        whisper_pool.ensure_capacity()
+    except WhisperPoolBusy as e:
+        raise HTTPException(status_code=429, detail=f"Transcrição indisponível no momento: {e}.", headers={"Retry-After": "10"})
 
-    # Salvar temporariamente com suffix seguro
-    suffix = os.path.splitext(file.filename)[1] or ".wav"
-    tmp_file = None
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            content = await file.read()
-            tmp.write(content)
-            tmp_file = tmp.name
+        audio_file = arquivo_do_upload(file)
 
-        duration = await run_blocking_in_thread(get_audio_duration, tmp_file)
+        try:
+            duration = await run_blocking_in_thread(get_audio_duration, audio_file)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         if duration > MAX_AUDIO_SECONDS:
             raise HTTPException(status_code=400, detail=f"Áudio muito longo: {duration:.1f}s (máximo {MAX_AUDIO_SECONDS:.0f}s).")
 
-        wm = get_whisper()
-        # transcrição (pode ser custosa) — executar em thread
-        def _transcribe(path):
-            segments, info = wm.transcribe(path)
-            transcript = "".join(seg.text for seg in segments).strip()
-            return transcript
-        transcript = await run_blocking_in_thread(_transcribe, tmp_file)
-        if not qa_chain:
+        await aguardar_whisper()
+        # transcrição (pode ser custosa) — executada em thread, dentro de uma vaga do pool
+        try:
+            audio_file.seek(0)
+            segments, _ = await whisper_pool.transcribe(audio_file)
+        except WhisperPoolBusy as e:
+            raise HTTPException(status_code=429, detail=f"Transcrição indisponível no momento: {e}.", headers={"Retry-After": "10"})
+        transcript = "".join(seg.text for seg in segments).strip()
+        if not rag_pronto():
             raise HTTPException(status_code=503, detail="Cadeia RAG não inicializada.")
-        response = await run_blocking_in_thread(qa_chain.invoke, {"query": transcript})
-        llm_answer = normalize_text_output(response.get("result", ""))
+        info = {}
+        response = await invoke_rag(transcript, build_retrieval_query(transcript), info)
+        llm_answer = normalize_text_output(response)
         return {
             "duration_seconds": duration,
             "transcript": transcript,
-            "llm_response": llm_answer
+            "llm_response": llm_answer,
+            "context_report": info.get("context")
         }
     except HTTPException:
         raise
     except Exception as e:
         safe_print_exception("Erro durante /audio_chat", e)
         raise HTTPException(status_code=500, detail=f"Erro ao processar áudio: {str(e)}")
-    finally:
-        if tmp_file and os.path.exists(tmp_file):
-            try:
-                os.remove(tmp_file)
-            except Exception:
-                logger.debug("Falha ao remover arquivo temporário.")
 
-@app.post("/cadastro")
-def signup(user: UserCreate):
-    db = SessionLocal()
-    if db.query(User).filter(User.email == user.email).first():
-        raise HTTPException(status_code=400, detail="Email já cadastrado")
-    
-    new_user = User(
-        name=user.name,
-        email=user.email,
-        password_hash=User.hash_password(user.password)
-    )
-    
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    
-    return {"id": new_user.id, "name": new_user.name, "email": new_user.email}
+def arquivo_do_upload(file: UploadFile, max_mb: float = AUDIO_UPLOAD_MAX_MB):
+    """
+    Arquivo já gravado pelo Starlette (SpooledTemporaryFile), usado direto pelo PyAV e
+    pelo faster-whisper, sem nova cópia. O UploadLimitMiddleware já barrou corpos
+    grandes demais; aqui confere o tamanho exato do arquivo (413 acima de `max_mb`).
+    O FastAPI fecha o arquivo depois que a resposta termina de ser enviada.
+    """
+    if file.size is not None and file.size > max_mb * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"Arquivo maior que o limite de {max_mb:.0f} MB.")
+    file.file.seek(0)
+    return file.file
 
-@app.post("/login")
-def login(user: UserLogin, db: SessionLocal = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if not db_user or not db_user.verify_password(user.password):
-        raise HTTPException(status_code=401, detail="Email ou senha inválidos")
+@app.post("/audio_chat/long")
+async def audio_chat_long(file: UploadFile = File(...)):
+    """
+    Entrevistas longas (até LONG_AUDIO_MAX_SECONDS). Resposta SSE:
+    - `meta`: duração e número de trechos encontrados pelo VAD;
+    - `segment`: cada trecho transcrito, assim que termina (pode vir fora de ordem);
+    - `partial`: transcrição contínua disponível até o momento;
+    - `transcript`: transcrição completa;
+    - `token`/`done`: análise de requisitos sobre a transcrição (como /start_analysis/stream).
+    """
+    if not rag_pronto():
+        raise HTTPException(status_code=503, detail="Cadeia RAG não inicializada.")
+    try:
+        whisper_pool.ensure_capacity()
+    except WhisperPoolBusy as e:
+        raise HTTPException(status_code=429, detail=f"Transcrição indisponível no momento: {e}.", headers={"Retry-After": "10"})
 
-    # Podemos retornar token JWT mais tarde, mas por enquanto só id
-    return {"id": db_user.id, "name": db_user.name, "email": db_user.email}
+    audio_file = arquivo_do_upload(file, LONG_AUDIO_UPLOAD_MAX_MB)
+    try:
+        duration = await run_blocking_in_thread(get_audio_duration, audio_file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if duration > LONG_AUDIO_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"Áudio muito longo: {duration:.1f}s (máximo {LONG_AUDIO_MAX_SECONDS:.0f}s).")
 
-# ------------------ ROTAS DE CHAT/HISTÓRICO ------------------
+    async def eventos():
+        try:
+            await aguardar_whisper()
+            trechos = await run_blocking_in_thread(plan_chunks, audio_file)
+            logger.info("Áudio longo: %.1fs em %d trechos.", duration, len(trechos))
+            yield sse_event("meta", {"duration_seconds": duration, "chunks": len(trechos)})
+
+            montagem = TranscriptAssembler(len(trechos))
+            async for trecho in transcribe_chunks(whisper_pool, audio_file, trechos):
+                cresceu = montagem.add(trecho["index"], trecho["text"])
+                yield sse_event("segment", {**trecho, "completed": len(montagem.textos), "total": len(trechos)})
+                if cresceu:
+                    yield sse_event("partial", {"transcript": montagem.prefix})
+
+            transcript = montagem.text()
+            yield sse_event("transcript", {"transcript": transcript, "duration_seconds": duration})
+            if not transcript:
+                yield sse_event("error", {"detail": "Nenhuma fala detectada no áudio."})
+                return
+            async for evento in eventos_analise_inicial(transcript, "/audio_chat/long"):
+                yield evento
+        except Exception as e:
+            safe_print_exception("Erro durante /audio_chat/long", e)
+            yield sse_event("error", {"detail": f"Erro ao processar áudio: {str(e)}"})
 
-@app.get("/chats")
-def get_user_chats(user_id: int, db: SessionLocal = Depends(get_db)):
-    """
-    Retorna todos os chats do usuário com mensagens.
-    """
-    chats = db.query(Chat).filter(Chat.user_id == user_id).all()
-    result = []
-    for chat in chats:
-        result.append({
-            "id": chat.id,
-            "title": chat.title,
-            "created_at": chat.created_at,
-            "messages": [{"sender": m.sender, "content": m.content, "created_at": m.created_at} for m in chat.messages]
-        })
-    return result
-
-@app.post("/chat_message")
-def add_chat_message(message: ChatMessageCreate, db: SessionLocal = Depends(get_db)):
+    # O arquivo do upload é fechado pelo FastAPI quando a resposta termina, mesmo se o
+    # cliente desconectar antes de o gerador começar
+    return sse_response(eventos())
+
+@app.websocket("/audio/live")
+async def audio_live(websocket: WebSocket, format: str = "pcm", sample_rate: Optional[int] = None):
     """
-    Cria/atualiza chat e salva mensagem.
-    - Se chat_id não informado, cria novo chat com título igual aos primeiros 50 caracteres da mensagem.
+    Transcrição ao vivo do microfone. O cliente envia frames binários (`format=pcm`:
+    PCM 16-bit LE mono em `sample_rate`, padrão 16000; `format=opus`: um pacote Opus por
+    mensagem) e, ao fim da reunião, a mensagem de texto {"type": "stop"}.
+
+    O servidor envia JSON: `partial` e `final` (segmentos com início/fim em segundos),
+    `transcript` com o texto completo e, em seguida, os eventos da análise de requisitos
+    (`token`, `done`), como em /start_analysis/stream; então fecha a conexão.
     """
-    user_id = message.user_id
-    content = message.content
-    sender = message.sender
-    chat_id = message.chat_id
-
-    if chat_id:
-        chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == user_id).first()
-        if not chat:
-            raise HTTPException(status_code=404, detail="Chat não encontrado")
-    else:
-        chat = Chat(user_id=user_id, title=content[:50])
-        db.add(chat)
-        db.commit()
-        db.refresh(chat)
+    await websocket.accept()
+    try:
+        whisper_pool.ensure_capacity()
+        decoder = create_decoder(format, sample_rate)
+    except (WhisperPoolBusy, ValueError) as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1013 if isinstance(e, WhisperPoolBusy) else 1003)
+        return
+    await aguardar_whisper()
+
+    async def transcrever(audio):
+        segmentos, _ = await whisper_pool.transcribe(audio, queue_limit=False, vad_filter=False, language=WHISPER_LANGUAGE)
+        return segmentos
+
+    live = LiveTranscriber(transcrever)
+    novo_audio = asyncio.Event()
+    encerrar = False
+
+    async def processar():
+        # Um passo por vez: se a transcrição atrasar, os passos seguintes se juntam
+        while True:
+            await novo_audio.wait()
+            novo_audio.clear()
+            if live.ready:
+                for evento in await live.step_once():
+                    await websocket.send_json(evento)
+            if encerrar:
+                return
+
+    processamento = asyncio.create_task(processar())
+    try:
+        while True:
+            mensagem = await websocket.receive()
+            if mensagem["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(mensagem.get("code", 1000))
+            if mensagem.get("bytes"):
+                live.feed(decoder.decode(mensagem["bytes"]))
+                if live.total_samples > LIVE_MAX_SECONDS * SAMPLE_RATE:
+                    await websocket.send_json({"type": "error", "detail": "Sessão excedeu a duração máxima."})
+                    break
+                if live.ready:
+                    novo_audio.set()
+            elif mensagem.get("text") and json.loads(mensagem["text"]).get("type") == "stop":
+                break
+
+        encerrar = True
+        novo_audio.set()
+        await processamento
+        for evento in await live.flush():
+            await websocket.send_json(evento)
+
+        transcript = live.transcript
+        logger.info("Sessão ao vivo encerrada: %.1fs de áudio.", live.total_samples / SAMPLE_RATE)
+        await websocket.send_json({"type": "transcript", "text": transcript,
+                                   "duration_seconds": round(live.total_samples / SAMPLE_RATE, 2)})
+        if not transcript:
+            await websocket.send_json({"type": "error", "detail": "Nenhuma fala detectada."})
+        elif not rag_pronto():
+            await websocket.send_json({"type": "error", "detail": "Cadeia RAG não inicializada."})
+        else:
+            async for evento, dados in analise_inicial_stream(transcript, "/audio/live"):
+                await websocket.send_json({"type": evento, **dados})
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info("Cliente desconectou da transcrição ao vivo antes do fim.")
+    except Exception as e:
+        safe_print_exception("Erro durante /audio/live", e)
+        try:
+            await websocket.send_json({"type": "error", "detail": f"Erro na transcrição ao vivo: {str(e)}"})
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+    finally:
+        processamento.cancel()
 
-    msg = Message(chat_id=chat.id, sender=sender, content=content)
-    db.add(msg)
-    db.commit()
-    db.refresh(msg)
+# ------------------ USUÁRIOS, SESSÃO E HISTÓRICO (chat_api.py) ------------------
 
-    return {"chat_id": chat.id, "message_id": msg.id, "sender": msg.sender, "content": msg.content}
+app.include_router(chat_router)
 
 @app.post("/generate_pdf")
 async def generate_document(request: DocumentRequest):
-    if not qa_chain:
+    if not rag_pronto():
         raise HTTPException(status_code=503, detail="Cadeia RAG não inicializada.")
 
     logger.info("Recebida solicitação para gerar documentação técnica.")
@@ -764,8 +1237,13 @@ async def generate_document(request: DocumentRequest):
     )
 
     try:
-        resposta_rag = await run_blocking_in_thread(qa_chain.invoke, {"query": prompt_completo})
-        conteudo = resposta_rag.get("result", "").strip()
+        info = {}
+        resposta_rag = await invoke_rag(
+            prompt_completo,
+            build_retrieval_query(request.client_request),
+            info
+        )
+        conteudo = resposta_rag.strip()
 
         conteudo_limpo = clean_text_for_pdf(conteudo)
 
@@ -778,7 +1256,8 @@ async def generate_document(request: DocumentRequest):
             pdf_buffer,
             media_type="application/pdf",
             headers={
-                "Content-Disposition": "attachment; filename=documentacao_requisitos.pdf"
+                "Content-Disposition": "attachment; filename=documentacao_requisitos.pdf",
+                "X-Context-Tokens-Saved": str(info.get("context", {}).get("tokens_saved", 0))
             }
         )
 
@@ -788,8 +1267,6 @@ async def generate_document(request: DocumentRequest):
 
 #---------------------- PLANEJAMENTO DE SPRINT ---------------------    
 
-from sprint import replan_tasks_with_gemini, generate_tasks_with_gemini
-
 class SprintPlanResponse(BaseModel):
     sprint_name: str
     tasks: list[dict]
@@ -880,45 +1357,6 @@ async def replan_sprint(request: ReplanRequest):
         raise HTTPException(status_code=500, detail=f"Erro ao replanejar: {str(e)}")
 
 
-# --- FUNÇÕES DE SPRINT ---
-def create_sprint_rest(jira_client: JIRA, name: str, board_id: int, start: datetime, end: datetime):
-    url = f"{jira_client._options['server']}/rest/agile/1.0/sprint"
-    payload = {
-        "name": name,
-        "originBoardId": board_id,
-        "startDate": start.isoformat() + "Z",
-        "endDate": end.isoformat() + "Z"
-    }
-    response = jira_client._session.post(url, json=payload)
-    response.raise_for_status()
-    return response.json()
-
-def start_sprint_rest(jira_client: JIRA, board_id: int, sprint_id: int, start_date: datetime = None):
-    url = f"{jira_client._options['server']}/rest/agile/1.0/board/{board_id}/sprint/{sprint_id}/start"
-    payload = {}
-    if start_date:
-        payload["startDate"] = start_date.isoformat() + "Z"
-    response = jira_client._session.post(url, json=payload)
-    response.raise_for_status()
-    return response.json()
-
-def create_jira_issue_sync_debug(issue_dict):
-    """Cria uma issue no Jira e loga response resumido em caso de erro."""
-    try:
-        issue = jira_agile_client.create_issue(fields=issue_dict)
-        return issue.key
-    except Exception as e:
-        msg = getattr(e, "response", None)
-        if msg:
-            try:
-                resp_json = msg.json()
-                logger.error("Erro ao criar issue: %s. Response: %s", e, resp_json)
-            except Exception:
-                logger.error("Erro ao criar issue: %s. Response não pôde ser convertido em JSON", e)
-        else:
-            logger.error("Erro ao criar issue (sem response): %s", e)
-        raise e
-
 # --- MODELOS DE REQUEST/RESPONSE ---
 class SendSprintRequest(BaseModel):
     sprint_name: str
@@ -928,97 +1366,269 @@ class SendSprintRequest(BaseModel):
 class SendSprintResponse(BaseModel):
     sprint_id: Optional[int]
     created_issues: List[dict]
+    failed_issues: List[dict] = []
+    batch_id: Optional[str] = None
+    pending: int = 0
 
 
-EMAIL = os.getenv("EMAIL_JIRA")
-jira_agile_client = JIRA(
-    server=f"{JIRA_URL}",
-    basic_auth=(EMAIL, JIRA_API_TOKEN)
-)
-
 # --- FUNÇÃO ASYNC PRINCIPAL ---
 @app.post("/sprint/send_sprint_to_jira", response_model=SendSprintResponse)
-async def send_sprint_to_jira(request: SendSprintRequest):
+async def send_sprint_to_jira(
+    request: SendSprintRequest,
+    wait: bool = True,
+    idempotency_key: Optional[str] = Header(None)
+):
     logger.info("=== INÍCIO: Enviando sprint '%s' para Jira (%d tasks) ===", request.sprint_name, len(request.tasks))
 
+    batch_id = new_batch_id(idempotency_key)
+    existente = await run_blocking_in_thread(_outbox_status, batch_id) if idempotency_key else None
+    if existente:
+        # Reenvio do mesmo pedido: não cria outra sprint nem duplica as tasks
+        logger.info("Lote %s já registrado; retornando status atual.", batch_id)
+        return sprint_response_from_status(existente)
+
     start_date = datetime.utcnow()
     end_date = start_date + timedelta(days=14)
-    sprint_id = None
 
-    # 1️⃣ Criar sprint
-    try:
-        sprint_data = await asyncio.to_thread(
-            lambda: create_sprint_rest(jira_agile_client, request.sprint_name, JIRA_BOARD_ID, start_date, end_date)
+    def montar_issue(task: dict) -> dict:
+        title = task.get("description") or "Tarefa sem descrição"
+        desc = (
+            f"Sprint: {request.sprint_name}\n"
+            "--- TASK GERADA PELA IA ---\n"
+            f"Descrição: {task.get('description')}\n"
+            f"US ID: {task.get('us_id')}\n"
+            f"US Title: {task.get('us_title')}\n"
+            f"Estimativa: {task.get('estimate')}\n"
         )
+        return {
+            'project': {'key': JIRA_PROJECT_KEY},
+            'summary': title,
+            'description': desc,
+            'issuetype': {'name': 'Task'},
+        }
+
+    # 1️⃣ Enfileirar as issues primeiro: os workers já começam a criá-las enquanto a sprint é preparada
+    itens = [
+        {"ref_id": task.get("us_id"), "fields": com_label_idempotencia(montar_issue(task), batch_id, i)}
+        for i, task in enumerate(request.tasks)
+    ]
+    await enfileirar(batch_id, "sprint", itens, await_sprint=True)
+
+    # 2️⃣ Criar e iniciar a sprint (em paralelo com a criação das issues)
+    sprint_id = await preparar_sprint(request.sprint_name, start_date, end_date)
+
+    # 3️⃣ Grava a sprint no lote (None = backlog): os workers anexam cada task criada,
+    # com retentativa, e só então a marcam como concluída
+    await run_blocking_in_thread(_outbox_set_sprint, batch_id, sprint_id)
+    jira_outbox_pool.notify()
+
+    status = await aguardar_lote(batch_id, wait)
+
+    logger.info("=== FIM: Sprint '%s' enviada ao Jira. %d issues criadas ===",
+                request.sprint_name, status["counts"]["done"])
+
+    return sprint_response_from_status(status)
+
+async def preparar_sprint(nome: str, start_date: datetime, end_date: datetime) -> Optional[int]:
+    """
+    Cria a sprint, espera ela ficar disponível na API Agile (polling limitado a
+    JIRA_SPRINT_READY_TIMEOUT) e a inicia. Retorna o ID ou None (tarefas ficam no backlog).
+    """
+    gateway = get_jira_gateway()
+    try:
+        async with jira_admission.slot("sprint"):
+            sprint_data = await asyncio.to_thread(gateway.create_sprint, nome, JIRA_BOARD_ID, start_date, end_date)
         sprint_id = sprint_data.get("id")
         logger.info("Sprint criada com ID %s", sprint_id)
     except Exception as e:
         logger.warning("Não foi possível criar sprint: %s. Todas as tarefas irão para o backlog.", e)
+        return None
 
-    # 2️⃣ Aguardar e iniciar sprint
-    if sprint_id:
-        await asyncio.sleep(2)  # Delay curto para garantir que sprint esteja disponível
-        try:
-            await asyncio.to_thread(lambda: start_sprint_rest(jira_agile_client, JIRA_BOARD_ID, sprint_id, start_date))
-            logger.info("Sprint %s iniciada com sucesso.", sprint_id)
-        except Exception as e:
-            logger.warning("Não foi possível iniciar sprint %s: %s. As tarefas ficarão no backlog.", sprint_id, e)
-            sprint_id = None  # fallback para backlog
-
-    created = []
-    valid_keys = []
-
-    # 3️⃣ Criar issues com limite de concorrência
-    async def create_issue(task):
-        async with semaphore:
-            title = task.get("description") or "Tarefa sem descrição"
-            desc = (
-                f"Sprint: {request.sprint_name}\n"
-                "--- TASK GERADA PELA IA ---\n"
-                f"Descrição: {task.get('description')}\n"
-                f"US ID: {task.get('us_id')}\n"
-                f"US Title: {task.get('us_title')}\n"
-                f"Estimativa: {task.get('estimate')}\n"
-            )
-            issue_dict = {
-                'project': {'key': JIRA_PROJECT_KEY},
-                'summary': title,
-                'description': desc,
-                'issuetype': {'name': 'Task'},
-            }
+    try:
+        await asyncio.to_thread(gateway.wait_for_sprint, sprint_id, JIRA_SPRINT_READY_TIMEOUT)
+        async with jira_admission.slot("sprint"):
+            await asyncio.to_thread(gateway.start_sprint, JIRA_BOARD_ID, sprint_id, start_date)
+        logger.info("Sprint %s iniciada com sucesso.", sprint_id)
+        return sprint_id
+    except Exception as e:
+        logger.warning("Não foi possível iniciar sprint %s: %s. As tarefas ficarão no backlog.", sprint_id, e)
+        return None  # fallback para backlog
+
+def sprint_response_from_status(status: dict) -> SendSprintResponse:
+    return SendSprintResponse(
+        sprint_id=status.get("sprint_id"),
+        created_issues=[
+            {"key": item["issue_key"], "us_id": item["ref_id"]}
+            for item in status["items"] if item["status"] == "done"
+        ],
+        failed_issues=[
+            {"us_id": item["ref_id"], "title": item["title"], "error": item["last_error"]}
+            for item in status["items"] if item["status"] == "failed"
+        ],
+        batch_id=status["batch_id"],
+        pending=status["counts"]["pending"] + status["counts"]["in_progress"]
+    )
+
+# ------------------ OUTBOX DO JIRA ------------------
+
+def idempotency_label(batch_id: str, index: int) -> str:
+    return f"synapse-{item_idempotency_key(batch_id, index)[:24]}"
+
+def com_label_idempotencia(fields: dict, batch_id: str, index: int) -> dict:
+    if JIRA_IDEMPOTENCY_LABELS:
+        fields = {**fields, "labels": list(fields.get("labels", [])) + [idempotency_label(batch_id, index)]}
+    return fields
+
+def _outbox_status(batch_id: str) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        return batch_status(db, batch_id)
+    finally:
+        db.close()
+
+def _outbox_enqueue(batch_id: str, kind: str, itens: List[dict], sprint_id=None, await_sprint: bool = False) -> int:
+    db = SessionLocal()
+    try:
+        return enqueue(db, batch_id, kind, itens, sprint_id=sprint_id, await_sprint=await_sprint)
+    finally:
+        db.close()
+
+def _outbox_set_sprint(batch_id: str, sprint_id) -> None:
+    db = SessionLocal()
+    try:
+        set_batch_sprint(db, batch_id, sprint_id)
+    finally:
+        db.close()
+
+def _outbox_sprint(batch_id: str):
+    db = SessionLocal()
+    try:
+        return batch_sprint(db, batch_id)
+    finally:
+        db.close()
+
+async def enfileirar(batch_id: str, kind: str, itens: List[dict], sprint_id=None, await_sprint: bool = False):
+    """Grava o lote no outbox e acorda os workers."""
+    novos = await run_blocking_in_thread(_outbox_enqueue, batch_id, kind, itens, sprint_id, await_sprint)
+    logger.info("Outbox do Jira: lote %s com %d itens enfileirado (%d novos).", batch_id, len(itens), novos)
+    jira_outbox_pool.notify()
+
+async def aguardar_lote(batch_id: str, wait: bool) -> dict:
+    """Aguarda o lote (até JIRA_OUTBOX_WAIT_SECONDS) ou só retorna o status atual."""
+    if wait:
+        return await jira_outbox_pool.wait_batch(batch_id, JIRA_OUTBOX_WAIT_SECONDS)
+    return await run_blocking_in_thread(_outbox_status, batch_id)
+
+async def enfileirar_e_aguardar(batch_id: str, kind: str, itens: List[dict], wait: bool, sprint_id=None) -> dict:
+    """Grava o lote no outbox, acorda os workers e (opcionalmente) aguarda o resultado."""
+    await enfileirar(batch_id, kind, itens, sprint_id)
+    return await aguardar_lote(batch_id, wait)
+
+def find_issue_by_label_sync(label: str, jira_client=None) -> Optional[str]:
+    jira_client = jira_client or get_jira_client()
+    issues = jira_client.search_issues(f'labels = "{label}"', maxResults=1, fields="key")
+    return issues[0].key if issues else None
+
+async def processar_outbox_jira(kind: str, itens: List[dict]) -> List[ItemResult]:
+    """
+    Handler dos workers do outbox: cria as issues do grupo em lote e, para tasks de
+    sprint, adiciona as criadas à sprint. Itens que já tiveram tentativa anterior
+    (inclusive os recuperados após lease expirado) são procurados pelo label de
+    idempotência antes de serem recriados; itens com `issue_key` já gravada só passam
+    pela etapa da sprint. Uma task só termina depois de anexada (ou de o lote ficar sem
+    sprint); enquanto a sprint não é definida, volta como `finished=False`.
+    """
+    endpoint = "sprint_issues" if kind == "sprint" else "approve"
+    chaves: List[Optional[str]] = [item["issue_key"] for item in itens]
+    erros: List[Optional[str]] = [None] * len(itens)
+
+    if JIRA_IDEMPOTENCY_LABELS:
+        for i, item in enumerate(itens):
+            label = next((l for l in item["payload"]["fields"].get("labels", []) if l.startswith("synapse-")), None)
+            if chaves[i] is None and (item["attempts"] > 0 or item.get("reclaimed")) and label:
+                try:
+                    async with jira_admission.slot(endpoint):
+                        key = await run_blocking_in_thread(find_issue_by_label_sync, label)
+                    if key:
+                        logger.info("Outbox do Jira: issue %s já existia para %s.", key, label)
+                        chaves[i] = key
+                except Exception as e:
+                    logger.warning("Falha ao verificar idempotência de %s: %s", label, e)
+
+    pendentes = [i for i, key in enumerate(chaves) if key is None]
+    if pendentes:
+        criados = await create_jira_issues_bulk(
+            [itens[i]["payload"]["fields"] for i in pendentes], endpoint
+        )
+        for i, (key, erro) in zip(pendentes, criados):
+            chaves[i], erros[i] = key, erro
+
+    if kind != "sprint":
+        return [ItemResult(key, erro) for key, erro in zip(chaves, erros)]
+
+    # Lida do banco a cada passada: a sprint pode ter sido definida depois da reserva
+    pronta, sprint_id = await run_blocking_in_thread(_outbox_sprint, itens[0]["batch_id"])
+    if not pronta:
+        espera = datetime.utcnow() - min(item["created_at"] for item in itens)
+        if espera < timedelta(seconds=JIRA_OUTBOX_SPRINT_WAIT_SECONDS):
+            return [ItemResult(key, erro, finished=erro is not None) for key, erro in zip(chaves, erros)]
+        logger.warning("Lote %s sem sprint definida após %.0fs; as tarefas ficarão no backlog.",
+                       itens[0]["batch_id"], espera.total_seconds())
+
+    criadas = [i for i, key in enumerate(chaves) if key]
+    if sprint_id and criadas:
+        for inicio in range(0, len(criadas), JIRA_BULK_CREATE_LIMIT):
+            lote = criadas[inicio:inicio + JIRA_BULK_CREATE_LIMIT]
             try:
-                key = await asyncio.to_thread(lambda: create_jira_issue_sync_debug(issue_dict))
-                return key.strip() if key else None
+                async with jira_admission.slot("add_to_sprint"):
+                    await asyncio.to_thread(
+                        get_jira_client().add_issues_to_sprint, sprint_id, [chaves[i].strip() for i in lote]
+                    )
+                logger.info("%d issues adicionadas à sprint %s.", len(lote), sprint_id)
             except Exception as e:
-                logger.warning("Erro ao criar issue '%s': %s", title, e)
-                return None
+                # A issue já existe (a key fica gravada): o item volta para a fila do outbox
+                # só para anexar, com o mesmo backoff/limite de tentativas da criação
+                erro = erro_jira(e)
+                logger.warning("Erro ao adicionar issues à sprint %s: %s", sprint_id, erro)
+                for i in lote:
+                    erros[i] = type(erro)(f"Erro ao adicionar à sprint {sprint_id}: {erro}")
+
+    return [ItemResult(key, erro) for key, erro in zip(chaves, erros)]
+
+jira_outbox_pool = OutboxWorkerPool(
+    SessionLocal,
+    processar_outbox_jira,
+    workers=JIRA_OUTBOX_WORKERS,
+    group_size=JIRA_BULK_CREATE_LIMIT,
+    max_attempts=JIRA_OUTBOX_MAX_ATTEMPTS
+)
 
-    tasks_to_create = [create_issue(t) for t in request.tasks]
-    issue_keys = await asyncio.gather(*tasks_to_create)
-    valid_keys = [k for k in issue_keys if k]
+@app.get("/jira/outbox/{batch_id}")
+async def jira_outbox_status(batch_id: str):
+    """Progresso de um lote do outbox (por item: status, issue criada, tentativas e erro)."""
+    status = await run_blocking_in_thread(_outbox_status, batch_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Lote não encontrado.")
+    return status
 
-    for key in valid_keys:
-        created.append({"key": key})
+@app.on_event("startup")
+async def start_jira_outbox():
+    jira_outbox_pool.start()
 
-    # 4️⃣ Adicionar issues à sprint ativa
-    if sprint_id and valid_keys:
-        try:
-            await asyncio.to_thread(lambda: jira_agile_client.add_issues_to_sprint(sprint_id, valid_keys))
-            logger.info("Todas as issues válidas adicionadas à sprint %s.", sprint_id)
-        except Exception as e:
-            logger.warning("Erro ao adicionar issues à sprint: %s. As tarefas ficarão no backlog.", e)
+@app.on_event("shutdown")
+async def stop_jira_outbox():
+    await jira_outbox_pool.stop()
 
-    logger.info("=== FIM: Sprint '%s' enviada ao Jira. %d issues criadas ===",
-                request.sprint_name, len(valid_keys))
+@app.on_event("shutdown")
+async def close_database():
+    await async_engine.dispose()
+
+@app.on_event("shutdown")
+async def stop_password_hasher():
+    password_hasher.shutdown()
 
-    return SendSprintResponse(sprint_id=sprint_id, created_issues=created)
 # ------------------ Run (dev) ------------------
 
 if __name__ == "__main__":
     logger.info("Iniciando servidor Uvicorn em http://127.0.0.1:8000")
-    if qa_chain is None:
-        try:
-            load_models_and_chain()
-        except Exception as e:
-            safe_print_exception("Falha ao carregar modelos no __main__", e)
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
@@ -0,0 +1,219 @@
+# rag_cache.py
+"""
+Cache de respostas da cadeia RAG em dois níveis:
+
+1. LRU em memória com TTL (por processo);
+2. SQLite em disco (opcional), que sobrevive a reinícios da API.
+
+A chave é um hash da pergunta normalizada, do modelo/temperatura do LLM e dos IDs
+dos chunks recuperados. Quando o ingest.py reconstrói o VectorDB ele chama
+`invalidate_index(...)`, que limpa o nível em disco e incrementa a versão do índice;
+os processos da API detectam a nova versão e descartam o nível em memória.
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("assistente-rag")
+
+RAG_CACHE_ENABLED = os.getenv("RAG_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RAG_CACHE_MAX_ENTRIES = int(os.getenv("RAG_CACHE_MAX_ENTRIES", "512"))
+RAG_CACHE_TTL_SECONDS = float(os.getenv("RAG_CACHE_TTL_SECONDS", "3600"))
+# Caminho do nível em disco; vazio desativa o SQLite
+RAG_CACHE_SQLITE_PATH = os.getenv("RAG_CACHE_SQLITE_PATH", "rag_cache.db")
+
+INDEX_VERSION_FILE = "index_version"
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Remove espaços redundantes para que reenvios equivalentes gerem a mesma chave."""
+    return re.sub(r"\s+", " ", prompt or "").strip()
+
+
+def make_cache_key(prompt: str, model: str, temperature, chunk_ids: Iterable[str]) -> str:
+    payload = json.dumps({
+        "prompt": normalize_prompt(prompt),
+        "model": str(model),
+        "temperature": temperature,
+        "chunks": list(chunk_ids),
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def read_index_version(path_vector_db: str) -> str:
+    marker = Path(path_vector_db) / INDEX_VERSION_FILE
+    try:
+        return marker.read_text(encoding="utf-8").strip()
+    except OSError:
+        return ""
+
+
+class RAGResponseCache:
+    def __init__(
+        self,
+        max_entries: int = RAG_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = RAG_CACHE_TTL_SECONDS,
+        sqlite_path: Optional[str] = RAG_CACHE_SQLITE_PATH,
+        path_vector_db: Optional[str] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path or None
+        self.path_vector_db = path_vector_db
+        self._memory: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._index_version = read_index_version(path_vector_db) if path_vector_db else ""
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        if self.sqlite_path:
+            _init_sqlite(self.sqlite_path)
+
+    # ------------------ Nível em memória ------------------
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and (time.time() - created_at) > self.ttl_seconds
+
+    def _check_index_version(self):
+        """Descarta o nível em memória se o ingest.py publicou uma nova versão do índice."""
+        if not self.path_vector_db:
+            return
+        version = read_index_version(self.path_vector_db)
+        if version != self._index_version:
+            logger.info("VectorDB reconstruído (versão %s); limpando cache RAG em memória.", version or "?")
+            self._memory.clear()
+            self._index_version = version
+
+    def _remember(self, key: str, created_at: float, value: str):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    # ------------------ API pública ------------------
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            self._check_index_version()
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if not self._expired(created_at):
+                    self._memory.move_to_end(key)
+                    self.hits_memory += 1
+                    return value
+                del self._memory[key]
+
+        if self.sqlite_path:
+            try:
+                row = _sqlite_get(self.sqlite_path, key)
+                if row is not None:
+                    created_at, value = row
+                    if not self._expired(created_at):
+                        with self._lock:
+                            self._remember(key, created_at, value)
+                            self.hits_disk += 1
+                        return value
+                    _sqlite_delete(self.sqlite_path, key)
+            except sqlite3.Error as e:
+                # Banco travado/corrompido: trata como miss em vez de falhar a requisição
+                logger.warning("Falha ao ler cache RAG do disco: %s", e)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: str):
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, value)
+        if self.sqlite_path:
+            try:
+                _sqlite_set(self.sqlite_path, key, created_at, value)
+            except sqlite3.Error as e:
+                logger.warning("Falha ao gravar cache RAG em disco: %s", e)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.sqlite_path:
+            _sqlite_clear(self.sqlite_path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.hits_memory + self.hits_disk
+            total = hits + self.misses
+            return {
+                "enabled": RAG_CACHE_ENABLED,
+                "entries_memory": len(self._memory),
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "index_version": self._index_version,
+                "sqlite_path": self.sqlite_path,
+            }
+
+
+# ------------------ Nível em disco (SQLite) ------------------
+
+def _connect(path: str) -> sqlite3.Connection:
+    return sqlite3.connect(path, timeout=5)
+
+
+def _init_sqlite(path: str):
+    with _connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rag_cache ("
+            " key TEXT PRIMARY KEY,"
+            " created_at REAL NOT NULL,"
+            " value TEXT NOT NULL)"
+        )
+
+
+def _sqlite_get(path: str, key: str):
+    with _connect(path) as conn:
+        return conn.execute("SELECT created_at, value FROM rag_cache WHERE key = ?", (key,)).fetchone()
+
+
+def _sqlite_set(path: str, key: str, created_at: float, value: str):
+    with _connect(path) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO rag_cache (key, created_at, value) VALUES (?, ?, ?)",
+            (key, created_at, value),
+        )
+
+
+def _sqlite_delete(path: str, key: str):
+    with _connect(path) as conn:
+        conn.execute("DELETE FROM rag_cache WHERE key = ?", (key,))
+
+
+def _sqlite_clear(path: str):
+    with _connect(path) as conn:
+        conn.execute("DELETE FROM rag_cache")
+
+
+# ------------------ Hook de invalidação ------------------
+
+def invalidate_index(path_vector_db: str, sqlite_path: Optional[str] = RAG_CACHE_SQLITE_PATH):
+    """
+    Chamado pelo ingest.py após reconstruir o VectorDB: limpa o nível em disco e grava
+    uma nova versão do índice, que faz os processos da API limparem o nível em memória.
+    """
+    if sqlite_path and Path(sqlite_path).exists():
+        _sqlite_clear(sqlite_path)
+    Path(path_vector_db).mkdir(parents=True, exist_ok=True)
+    (Path(path_vector_db) / INDEX_VERSION_FILE).write_text(str(time.time_ns()), encoding="utf-8")
+    logger.info("Cache RAG invalidado para o VectorDB em %s", path_vector_db)
@@ -0,0 +1,124 @@
+# startup.py
+"""
+Orquestrador da inicialização da API.
+
+Cada componente (embeddings, Chroma, LLM, cadeia RAG, Whisper) é registrado com uma
+função de carga, um aquecimento opcional (inferência de teste) e suas dependências.
+`start()` dispara tudo em segundo plano: componentes independentes carregam em
+paralelo (em threads, fora do event loop) e cada um começa assim que as suas
+dependências ficam prontas. O servidor aceita requisições imediatamente;
+/health/ready informa o estado e os tempos de cada componente.
+"""
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger("assistente-rag")
+
+PENDING, LOADING, WARMING, READY, FAILED = "pending", "loading", "warming", "ready", "failed"
+
+
+@dataclass
+class Component:
+    name: str
+    loader: Callable[[], None]
+    warmup: Optional[Callable[[], None]] = None
+    depends_on: List[str] = field(default_factory=list)
+    # Componentes opcionais não bloqueiam o /health/ready (ex.: Whisper)
+    required: bool = True
+    status: str = PENDING
+    error: Optional[str] = None
+    load_ms: Optional[float] = None
+    warmup_ms: Optional[float] = None
+    event: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def as_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "required": self.required,
+            "load_ms": self.load_ms,
+            "warmup_ms": self.warmup_ms,
+            "error": self.error,
+        }
+
+
+class StartupOrchestrator:
+    def __init__(self, warmup: bool = True):
+        self.warmup = warmup
+        self.components: Dict[str, Component] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+
+    def register(self, name: str, loader, warmup=None, depends_on=None, required: bool = True):
+        self.components[name] = Component(name, loader, warmup, list(depends_on or []), required)
+
+    # ------------------ Execução ------------------
+
+    def start(self):
+        if self._task is None:
+            self._started_at = time.perf_counter()
+            self._task = asyncio.create_task(self._run_all())
+
+    async def _run_all(self):
+        await asyncio.gather(*(self._run(c) for c in self.components.values()))
+        self._finished_at = time.perf_counter()
+        falhas = [c.name for c in self.components.values() if c.status == FAILED]
+        logger.info(
+            "Inicialização concluída em %.1fs%s",
+            self._finished_at - self._started_at,
+            f" (falhas: {', '.join(falhas)})" if falhas else "",
+        )
+
+    async def _run(self, comp: Component):
+        try:
+            for dep in comp.depends_on:
+                await self.components[dep].event.wait()
+                if self.components[dep].status != READY:
+                    raise RuntimeError(f"dependência '{dep}' não carregou")
+
+            comp.status = LOADING
+            inicio = time.perf_counter()
+            await asyncio.to_thread(comp.loader)
+            comp.load_ms = round((time.perf_counter() - inicio) * 1000, 1)
+
+            if self.warmup and comp.warmup:
+                comp.status = WARMING
+                inicio = time.perf_counter()
+                await asyncio.to_thread(comp.warmup)
+                comp.warmup_ms = round((time.perf_counter() - inicio) * 1000, 1)
+
+            comp.status = READY
+            aquecimento = f", aquecimento {comp.warmup_ms:.0f}ms" if comp.warmup_ms is not None else ""
+            logger.info("Componente '%s' pronto (carga %.0fms%s).", comp.name, comp.load_ms, aquecimento)
+        except Exception as e:
+            comp.status, comp.error = FAILED, str(e)
+            logger.error("Falha ao inicializar '%s': %s", comp.name, e)
+        finally:
+            comp.event.set()
+
+    async def wait_for(self, name: str, timeout: Optional[float] = None) -> bool:
+        """Aguarda o componente terminar de carregar; True se ficou pronto."""
+        comp = self.components[name]
+        if self._task is None:
+            return comp.status == READY
+        try:
+            await asyncio.wait_for(comp.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return comp.status == READY
+
+    def is_ready(self, name: Optional[str] = None) -> bool:
+        if name is not None:
+            return self.components[name].status == READY
+        return all(c.status == READY for c in self.components.values() if c.required)
+
+    def report(self) -> dict:
+        agora = self._finished_at or time.perf_counter()
+        return {
+            "ready": self.is_ready(),
+            "elapsed_ms": round((agora - self._started_at) * 1000, 1) if self._started_at else None,
+            "components": {nome: c.as_dict() for nome, c in self.components.items()},
+        }
@@ -0,0 +1,191 @@
+# whisper_pool.py
+"""
+Pool de modelos Whisper (faster-whisper) para transcrições em paralelo.
+
+O pool tem WHISPER_POOL_SIZE vagas, ou seja, transcrições simultâneas. Elas são
+distribuídas entre WHISPER_MODEL_INSTANCES instâncias do `WhisperModel`. Cada
+instância é criada com `num_workers` suficiente para as suas vagas: o CTranslate2
+roda chamadas concorrentes da mesma instância em paralelo, sem duplicar o modelo
+inteiro por vaga. Com `compute_type` int8 (ou int8_float32), cada instância ocupa
+uma fração da memória do float32.
+
+Na frente do pool há uma fila limitada (WHISPER_MAX_QUEUE). Quando ela está cheia,
+`slot()` levanta `WhisperPoolBusy` e a API responde 429, em vez de acumular
+uploads esperando.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("assistente-rag")
+
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "base")
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "cpu")
+# int8 | int8_float32 | int8_float16 | float16 | float32
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+WHISPER_POOL_SIZE = int(os.getenv("WHISPER_POOL_SIZE", "2"))
+WHISPER_MODEL_INSTANCES = int(os.getenv("WHISPER_MODEL_INSTANCES", "1"))
+# Threads de CPU por transcrição (0 = divide os núcleos entre as vagas)
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0"))
+WHISPER_MAX_QUEUE = int(os.getenv("WHISPER_MAX_QUEUE", "8"))
+
+
+class WhisperPoolBusy(Exception):
+    """Fila do pool cheia: o cliente deve tentar de novo mais tarde."""
+
+
+class _Instancia:
+    def __init__(self, model, vagas: int):
+        self.model = model
+        self.vagas = vagas
+        self.em_uso = 0
+
+
+class WhisperPool:
+    def __init__(
+        self,
+        model_size: str = WHISPER_MODEL_SIZE,
+        device: str = WHISPER_DEVICE,
+        compute_type: str = WHISPER_COMPUTE_TYPE,
+        pool_size: int = WHISPER_POOL_SIZE,
+        instances: int = WHISPER_MODEL_INSTANCES,
+        cpu_threads: int = WHISPER_CPU_THREADS,
+        max_queue: int = WHISPER_MAX_QUEUE,
+    ):
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.pool_size = max(1, pool_size)
+        self.instances = max(1, min(instances, self.pool_size))
+        self.cpu_threads = cpu_threads or max(1, (os.cpu_count() or 1) // self.pool_size)
+        self.max_queue = max_queue
+        self._instancias: List[_Instancia] = []
+        self._load_lock = threading.Lock()
+        self._pick_lock = threading.Lock()
+        self._slots = asyncio.Semaphore(self.pool_size)
+        self.queued = 0
+        self.in_flight = 0
+        self.rejected = 0
+        self.completed = 0
+        self.busy_seconds = 0.0
+
+    # ------------------ Carga ------------------
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self._instancias)
+
+    def load(self):
+        """Cria as instâncias (idempotente e thread-safe)."""
+        with self._load_lock:
+            if self._instancias:
+                return
+            from faster_whisper import WhisperModel
+
+            base, extra = divmod(self.pool_size, self.instances)
+            instancias = []
+            for i in range(self.instances):
+                vagas = base + (1 if i < extra else 0)
+                model = WhisperModel(
+                    self.model_size,
+                    device=self.device,
+                    compute_type=self.compute_type,
+                    cpu_threads=self.cpu_threads,
+                    num_workers=vagas,
+                )
+                instancias.append(_Instancia(model, vagas))
+            self._instancias = instancias
+            logger.info(
+                "Whisper carregado: %s (%s, %s) | %d vagas em %d instância(s), %d threads de CPU por vaga",
+                self.model_size, self.device, self.compute_type, self.pool_size, self.instances, self.cpu_threads,
+            )
+
+    def warmup(self):
+        """Transcreve 1s de silêncio em cada instância (os segmentos são lazy)."""
+        import numpy as np
+        silencio = np.zeros(16000, dtype=np.float32)
+        for inst in self._instancias:
+            segments, _ = inst.model.transcribe(silencio)
+            list(segments)
+
+    # ------------------ Uso ------------------
+
+    def ensure_capacity(self):
+        """Checagem antecipada (ex.: antes de receber o upload): WhisperPoolBusy se a fila estiver cheia."""
+        if self._slots.locked() and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise WhisperPoolBusy(f"{self.queued} transcrições na fila")
+
+    @asynccontextmanager
+    async def slot(self, queue_limit: bool = True):
+        """
+        Reserva uma vaga; levanta WhisperPoolBusy se a fila já estiver cheia. Trabalhos
+        já admitidos (ex.: trechos de um áudio longo) usam `queue_limit=False`.
+        """
+        if queue_limit:
+            self.ensure_capacity()
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def _pegar_instancia(self) -> _Instancia:
+        with self._pick_lock:
+            inst = min(self._instancias, key=lambda i: i.em_uso / i.vagas)
+            inst.em_uso += 1
+            return inst
+
+    def transcribe_sync(self, audio, **kwargs):
+        """
+        Transcreve `audio` (caminho, arquivo aberto ou array float32 a 16 kHz) na instância
+        menos ocupada.
+        Retorna (lista de segmentos, info). Deve ser chamado dentro de `slot()`.
+        """
+        self.load()
+        inst = self._pegar_instancia()
+        inicio = time.perf_counter()
+        try:
+            segments, info = inst.model.transcribe(audio, **kwargs)
+            return list(segments), info
+        finally:
+            with self._pick_lock:
+                inst.em_uso -= 1
+                self.completed += 1
+                self.busy_seconds += time.perf_counter() - inicio
+
+    async def transcribe(self, audio, queue_limit: bool = True, **kwargs):
+        """Reserva uma vaga e transcreve em thread, sem bloquear o event loop."""
+        async with self.slot(queue_limit):
+            return await asyncio.to_thread(self.transcribe_sync, audio, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_size,
+            "device": self.device,
+            "compute_type": self.compute_type,
+            "loaded": self.loaded,
+            "pool_size": self.pool_size,
+            "instances": self.instances,
+            "cpu_threads": self.cpu_threads,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "avg_seconds": round(self.busy_seconds / self.completed, 3) if self.completed else 0.0,
+        }
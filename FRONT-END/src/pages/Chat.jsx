@@ -5,13 +5,35 @@ import ChatMessage from "../components/ChatMessage";
 import { UserContext } from "../context/UserContext";
 
 export default function Chat() {
-  const { user } = useContext(UserContext);
-  const userId = user?.id;
+  const { user, logout } = useContext(UserContext);
+  // Token de sessão emitido no /login (rotas de chat); vencido ou ausente, volta ao login
+  const sessionExpired = !user?.token || (user.expires_at && user.expires_at * 1000 <= Date.now());
+  const userId = sessionExpired ? null : user.id;
+  const authHeaders = sessionExpired ? {} : { Authorization: `Bearer ${user.token}` };
   const navigate = useNavigate();
 
+  const endSession = () => {
+    logout();
+    navigate("/login");
+  };
+
+  // fetch das rotas de chat: envia o token e trata 401 (sessão expirada/inválida) indo para o login
+  const chatFetch = async (url, options = {}) => {
+    const res = await fetch(url, { ...options, headers: { ...options.headers, ...authHeaders } });
+    if (res.status === 401) {
+      endSession();
+      throw new Error("Sessão expirada");
+    }
+    if (!res.ok) throw new Error(`Erro ${res.status} em ${url}`);
+    return res;
+  };
+
   const [chats, setChats] = useState([]);
   const [activeChat, setActiveChat] = useState(null);
   const [messages, setMessages] = useState([]);
+  // Cursores da paginação: null quando não há mais páginas
+  const [chatsCursor, setChatsCursor] = useState(null);
+  const [messagesCursor, setMessagesCursor] = useState(null);
   const [input, setInput] = useState("");
   const [pdfStatus, setPdfStatus] = useState("");
   const [recording, setRecording] = useState(false);
@@ -47,11 +69,12 @@ export default function Chat() {
     setPdfStatus("Gerando documentação...");
 
     try {
+      const history = await loadFullHistory();
       const res = await fetch("http://127.0.0.1:8000/generate_pdf", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
-          client_request: messages[0]?.content || "N/A",
+          client_request: history[0]?.content || "N/A",
           requirements: lastAssistantMsg.content
         }),
       });
@@ -75,25 +98,86 @@ export default function Chat() {
   };
 
   // ------------------ LOAD HISTÓRICO ------------------
+  // Uma página de mensagens (cronológica); `cursor` busca as anteriores
+  const fetchMessages = async (chatId, cursor = null, limit = null) => {
+    const params = new URLSearchParams({ user_id: userId });
+    if (cursor) params.set("cursor", cursor);
+    if (limit) params.set("limit", limit);
+    const res = await chatFetch(`http://127.0.0.1:8000/chats/${chatId}/messages?${params}`);
+    const data = await res.json();
+    return { messages: data.messages || [], nextCursor: data.next_cursor || null };
+  };
+
+  const openChat = async (chat) => {
+    const page = await fetchMessages(chat.id);
+    setMessages(page.messages);
+    setMessagesCursor(page.nextCursor);
+  };
+
+  const loadOlderMessages = async () => {
+    if (!activeChat?.id || !messagesCursor) return;
+    try {
+      const page = await fetchMessages(activeChat.id, messagesCursor);
+      setMessages(prev => [...page.messages, ...prev]);
+      setMessagesCursor(page.nextCursor);
+    } catch (err) {
+      console.error("Erro ao buscar mensagens anteriores:", err);
+    }
+  };
+
+  // Histórico completo do chat ativo (PDF e /refine): segue o cursor até o início
+  const loadFullHistory = async () => {
+    if (!activeChat?.id || !messagesCursor) return messages;
+    let cursor = messagesCursor;
+    let older = [];
+    while (cursor) {
+      const page = await fetchMessages(activeChat.id, cursor, 200);
+      older = [...page.messages, ...older];
+      cursor = page.nextCursor;
+    }
+    setMessages(prev => [...older, ...prev]);
+    setMessagesCursor(null);
+    return [...older, ...messages];
+  };
+
   const fetchChats = async () => {
     if (!userId) return;
 
     try {
-      const res = await fetch(`http://127.0.0.1:8000/chats?user_id=${userId}`);
+      const res = await chatFetch(`http://127.0.0.1:8000/chats?user_id=${userId}`);
       const data = await res.json();
-      setChats(data);
-      if (data.length > 0) {
-        setActiveChat(data[0]);
-        setMessages(data[0].messages);
+      setChats(data.chats);
+      setChatsCursor(data.next_cursor || null);
+      if (data.chats.length > 0) {
+        setActiveChat(data.chats[0]);
+        await openChat(data.chats[0]);
       } else {
         setActiveChat(null);
         setMessages([]);
+        setMessagesCursor(null);
       }
     } catch (err) {
       console.error("Erro ao buscar chats:", err);
     }
   };
 
+  const loadMoreChats = async () => {
+    if (!userId || !chatsCursor) return;
+    try {
+      const params = new URLSearchParams({ user_id: userId, cursor: chatsCursor });
+      const res = await chatFetch(`http://127.0.0.1:8000/chats?${params}`);
+      const data = await res.json();
+      setChats(prev => [...prev, ...data.chats]);
+      setChatsCursor(data.next_cursor || null);
+    } catch (err) {
+      console.error("Erro ao buscar mais chats:", err);
+    }
+  };
+
+  useEffect(() => {
+    if (user && sessionExpired) endSession();
+  }, [user, sessionExpired]);
+
   useEffect(() => {
     fetchChats();
   }, [userId]);
@@ -102,15 +186,20 @@ export default function Chat() {
     localStorage.setItem("sprintPlans_v1", JSON.stringify(sprintPlans));
   }, [sprintPlans]);
 
-  const selectChat = (chat) => {
+  const selectChat = async (chat) => {
     setActiveChat(chat);
-    setMessages(chat.messages);
     setPdfStatus("");
     setJiraStatus("");
+    try {
+      await openChat(chat);
+    } catch (err) {
+      console.error("Erro ao buscar mensagens:", err);
+    }
   };
 
   // ------------------ BUILD HISTORY ------------------
-  const buildHistory = () => messages.map(m => ({ role: m.sender, content: m.content }));
+  const buildHistory = async () =>
+    (await loadFullHistory()).map(m => ({ role: m.sender, content: m.content }));
 
   // ------------------ ENVIAR MENSAGEM ------------------
   const sendMessage = async () => {
@@ -126,7 +215,7 @@ export default function Chat() {
     try {
       let chatId = activeChat?.id;
       if (!chatId) {
-        const chatRes = await fetch("http://127.0.0.1:8000/chat_message", {
+        const chatRes = await chatFetch("http://127.0.0.1:8000/chat_message", {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({
@@ -140,7 +229,7 @@ export default function Chat() {
         chatId = chatData.chat_id;
         setActiveChat({ id: chatId, title: messageContent.substring(0, 50) });
       } else {
-        await fetch("http://127.0.0.1:8000/chat_message", {
+        await chatFetch("http://127.0.0.1:8000/chat_message", {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({
@@ -165,7 +254,7 @@ export default function Chat() {
         res = await fetch("http://127.0.0.1:8000/refine", {
           method: "POST",
           headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ instruction: messageContent, history: buildHistory() }),
+          body: JSON.stringify({ instruction: messageContent, history: await buildHistory() }),
         });
       }
 
@@ -177,7 +266,7 @@ export default function Chat() {
       setMessages(prev => [...prev, assistantMsg]);
 
       // salva no DB
-      await fetch("http://127.0.0.1:8000/chat_message", {
+      await chatFetch("http://127.0.0.1:8000/chat_message", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -363,7 +452,7 @@ export default function Chat() {
             <button
               onClick={async () => {
                 try {
-                  const res = await fetch("http://127.0.0.1:8000/chat_message", {
+                  const res = await chatFetch("http://127.0.0.1:8000/chat_message", {
                     method: "POST",
                     headers: { "Content-Type": "application/json" },
                     body: JSON.stringify({
@@ -378,6 +467,7 @@ export default function Chat() {
                   setChats(prev => [newChat, ...prev]);
                   setActiveChat(newChat);
                   setMessages([]);
+                  setMessagesCursor(null);
                 } catch (err) {
                   console.error("Erro ao criar novo chat:", err);
                 }
@@ -390,15 +480,25 @@ export default function Chat() {
 
           {userId ? (
             chats.length > 0 ? (
-              chats.map(chat => (
-                <div
-                  key={chat.id}
-                  className={`p-3 cursor-pointer hover:bg-gray-100 ${activeChat?.id === chat.id ? "bg-gray-200 font-semibold" : ""} text-gray-900`}
-                  onClick={() => selectChat(chat)}
-                >
-                  {chat.title}
-                </div>
-              ))
+              <>
+                {chats.map(chat => (
+                  <div
+                    key={chat.id}
+                    className={`p-3 cursor-pointer hover:bg-gray-100 ${activeChat?.id === chat.id ? "bg-gray-200 font-semibold" : ""} text-gray-900`}
+                    onClick={() => selectChat(chat)}
+                  >
+                    {chat.title}
+                  </div>
+                ))}
+                {chatsCursor && (
+                  <button
+                    onClick={loadMoreChats}
+                    className="w-full p-3 text-sm text-[#0057B8] hover:bg-gray-100"
+                  >
+                    Carregar mais chats
+                  </button>
+                )}
+              </>
             ) : (
               <p className="p-4 text-gray-700 text-sm">Você ainda não tem chats.</p>
             )
@@ -410,6 +510,14 @@ export default function Chat() {
         {/* --- CHAT PRINCIPAL --- */}
         <div className="flex-1 flex flex-col">
           <div className="flex-1 overflow-y-auto p-4 space-y-4">
+            {messagesCursor && (
+              <button
+                onClick={loadOlderMessages}
+                className="block mx-auto text-sm text-[#0057B8] hover:underline"
+              >
+                Carregar mensagens anteriores
+              </button>
+            )}
             {messages.map((m, i) => (
               <div key={i}>
                 <ChatMessage sender={m.sender} text={m.content} />